@@ -10,9 +10,11 @@ from utils.csvUtils import write_monte_carlo_output
 from controller.signals import Signals, ProcessingSignals
 from model.model import LeadLossModel
 from model.settings.type import SettingsType
+from process.cdc.state import NodeStore, RunGridChanged
+from process.cdc.transport import SharedRunBlock
 from process.processing import ProgressType
 from utils import config, resourceUtils, csvUtils
-from utils.asynchronous import AsyncTask
+from utils.asynchronous import WorkerPool
 from utils.settings import Settings
 from view.dialogs.help import LeadLossHelpDialog
 from view.view import LeadLossView
@@ -46,6 +48,8 @@ class LeadLossApplication:
         # Reroute exceptions to display a message box to the user
         sys.excepthook = self.exception_hook
 
+        # Started before the GUI so its processes do not inherit Qt state
+        self.workerPool = WorkerPool.shared()
         self.worker = None
         self.signals = Signals()
 
@@ -61,6 +65,7 @@ class LeadLossApplication:
         app = QApplication(sys.argv)
         app.setStyle(QStyleFactory.create('Fusion'))
         app.setWindowIcon(QIcon(self.get_icon()))
+        app.aboutToQuit.connect(self.workerPool.shutdown)
 
         self.model = LeadLossModel(self.signals)
         self.view = LeadLossView(self, self.get_title(), config.VERSION)
@@ -123,15 +128,24 @@ class LeadLossApplication:
 
         Settings.update(settings)
         for sample in samples:
-            sample.clearCalculation()
+            previous = sample.calculationSettings
+            if sample.optimalAge is not None and sample.monteCarloRuns and settings.keepsRunsOf(previous):
+                # Only catalogue, run-count or grid settings changed: the pipeline
+                # rebuilds from these runs, topping up or re-gridding them as needed
+                sample.clearCatalogue()
+                sample.sampledWith = previous
+            else:
+                sample.clearCalculation()
 
         clonedSamples = []
         for sample in samples:
             sample.startCalculation(settings)
             clonedSamples.append(sample.createProcessingCopy())
+            if settings.regridsRunsOf(sample.sampledWith):
+                # Re-gridded runs are sent back in full
+                sample.clearRuns()
 
-        self.worker = AsyncTask(self.processing_signals, self.model.getProcessingFunction(), clonedSamples)
-        self.worker.start()
+        self.worker = self.workerPool.submit(self.processing_signals, self.model.getProcessingFunction(), clonedSamples)
         self.signals.processingStarted.emit()
 
     def cancelProcessing(self):
@@ -178,8 +192,17 @@ class LeadLossApplication:
             return
 
         if kind == ProgressType.SAMPLING:
-            sampleName, run = progressArgs[2:]
-            self.model.addMonteCarloRun(sampleName, run)
+            sampleName, payload = progressArgs[2:]
+            if isinstance(payload, SharedRunBlock):
+                self.model.attachMonteCarloRuns(sampleName, payload)
+            elif isinstance(payload, NodeStore):
+                self.model.setNodeStore(sampleName, payload)
+            elif isinstance(payload, RunGridChanged):
+                # The runs follow again, re-evaluated on a new grid
+                self.model.clearMonteCarloRuns(sampleName, payload.rim_age_grid)
+            else:
+                # Coalesced progress delivers a list of runs / row ranges
+                self.model.addMonteCarloRuns(sampleName, payload if isinstance(payload, list) else [payload])
             return
 
         if kind == ProgressType.OPTIMAL:
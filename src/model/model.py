@@ -6,6 +6,7 @@ from collections import defaultdict
 from model.sample import Sample
 from model.spot import Spot
 from process import processing
+from process.cdc.transport import RunRows
 from utils import csvUtils
 
 
@@ -18,6 +19,8 @@ class LeadLossModel:
         self.headers = []
         self.samples = []
         self.samplesByName = {}
+        # shared-memory blocks the processing worker publishes runs through
+        self.runBlocksBySampleName = {}
 
         # legacy state used by getters/exports in tools
         self.rows = []
@@ -106,6 +109,7 @@ class LeadLossModel:
     def clearCalculation(self):
         for sample in self.samples:
             sample.clearCalculation()
+        self.runBlocksBySampleName.clear()
 
         self.lastUpdateTime = time.time()
 
@@ -126,6 +130,28 @@ class LeadLossModel:
         sample = self.samplesByName[sampleName]
         sample.addMonteCarloRun(run)
 
+    def attachMonteCarloRuns(self, sampleName, block):
+        self.runBlocksBySampleName[sampleName] = block
+
+    def addMonteCarloRuns(self, sampleName, payloads):
+        # Row ranges are built over views of the attached block; nothing is copied
+        sample = self.samplesByName[sampleName]
+        runs = []
+        for item in payloads:
+            if isinstance(item, RunRows):
+                runs.extend(self.runBlocksBySampleName[sampleName].runs(item, sample.calculationSettings))
+            else:
+                runs.append(item)
+        sample.addMonteCarloRuns(runs)
+
+    def setNodeStore(self, sampleName, store):
+        self.samplesByName[sampleName].node_store = store
+
+    def clearMonteCarloRuns(self, sampleName, rimAgeGrid):
+        sample = self.samplesByName[sampleName]
+        sample.clearRuns()
+        sample.rim_age_grid = rimAgeGrid
+
     def setOptimalAge(self, sampleName, args):
         sample = self.samplesByName[sampleName]
         sample.setOptimalAge(args)
@@ -4,10 +4,9 @@ from process.cdcConfig import (
     PER_RUN_MIN_WIDTH,
     PER_RUN_PROM_FRAC,
 )
-from process.ensemble import per_run_peaks
+from process.ensemble import per_run_peaks_batch
 import numpy as np
-import math
-from scipy.stats import ks_2samp as _ks2  # exact-parity fallback for KS
+from collections.abc import Mapping
 
 # ---------------------------
 # Per-node statistics record
@@ -32,6 +31,65 @@ def _find_optimal_index(values_to_compare) -> int:
         return 0
     return n - 1
 
+def heatmapColumns(ages, values, minAge, maxAge, resolution):
+    """
+    Heatmap columns of one run (`values` of shape (G,)) or of many runs sharing
+    the grid (shape (R × G)) over rim ages `ages` (YEARS).
+
+    Ages are binned into `resolution` equal columns over [minAge, maxAge]
+    (`maxAge` itself falls in the last column; ages outside are ignored).
+    Values are clipped to [0, 1]. An occupied column takes the mean of its
+    finite values (NaN if none); an empty column interpolates, by column
+    distance, between the value at the greatest age of the previous occupied
+    column and the value at the smallest age of the next one. Columns before
+    the first and after the last occupied column are left out, so the output
+    has one entry per column from the first to the last occupied one.
+    """
+    ages = np.asarray(ages, float)
+    values = np.asarray(values, float)
+    single = values.ndim == 1
+    values = np.atleast_2d(values)
+    values = np.where(np.isfinite(values), np.clip(values, 0.0, 1.0), np.nan)
+
+    ageInc = (maxAge - minAge) / resolution
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cols = np.where(ages == maxAge, resolution - 1, np.floor_divide(ages - minAge, ageInc))
+    keep = np.isfinite(cols) & (cols >= 0) & (cols < resolution)
+    ages, cols, values = ages[keep], cols[keep].astype(np.intp), values[:, keep]
+    if cols.size == 0:
+        out = np.empty((values.shape[0], 0), float)
+        return out[0] if single else out
+
+    occupied = np.bincount(cols, minlength=resolution) > 0
+    occupiedCols = np.flatnonzero(occupied)
+    first, last = occupiedCols[0], occupiedCols[-1]
+
+    # Mean of the finite values in each column.
+    onehot = (cols[:, None] == np.arange(resolution)[None, :]).astype(float)
+    finite = np.isfinite(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (np.where(finite, values, 0.0) @ onehot) / (finite @ onehot)
+
+    # Grid index of the smallest and greatest age in each column.
+    order = np.lexsort((ages, cols))
+    sortedCols = cols[order]
+    firstIdx = order[np.minimum(np.searchsorted(sortedCols, np.arange(resolution), "left"), cols.size - 1)]
+    lastIdx = order[np.maximum(np.searchsorted(sortedCols, np.arange(resolution), "right") - 1, 0)]
+
+    col = np.arange(first, last + 1)
+    prevCol = np.maximum.accumulate(np.where(occupied[col], col, -1))
+    nextCol = np.minimum.accumulate(np.where(occupied[col], col, resolution)[::-1])[::-1]
+    prevDiff = col - prevCol
+    nextDiff = nextCol - col
+    totalDiff = np.maximum(nextDiff + prevDiff, 1)
+    prevStat = values[:, lastIdx[prevCol]]
+    nextStat = values[:, firstIdx[nextCol]]
+    gaps = (nextDiff * prevStat + prevDiff * nextStat) / totalDiff
+
+    out = np.where(occupied[col], means[:, col], gaps)
+    return out[0] if single else out
+
+
 class _KSSurface:
     def __init__(self, ages_ma, dvals):
         import numpy as _np
@@ -47,50 +105,109 @@ class _KSSurface:
         raise ValueError(mode)
 
 
-class MonteCarloRunPbLossAgeStatistics:
+def _penalised_score(base, number_of_invalid_ages, number_of_ages, penalise_invalid_ages):
     """
-    Holds raw K–S result (D, p), invalid count, and the penalised dissimilarity:
+    Penalised dissimilarity for scalars or per-node arrays:
         score = base + (1 - base) * inv_frac
     where base = KS-D, inv_frac = (#invalid) / (#total discordant).
     (Algebraically identical to: 1 - (1 - D)*(1 - inv_frac))
     """
-    def __init__(self, concordant_ages, discordant_ages, dissimilarity_test, penalise_invalid_ages):
-        ca = np.asarray(concordant_ages or [], dtype=float)
-        da = np.asarray(discordant_ages or [], dtype=float)
+    base = np.asarray(base, float)
+    if not penalise_invalid_ages:
+        return base
+    if number_of_ages == 0:
+        inv_frac = 1.0
+    else:
+        number_of_valid_ages = number_of_ages - np.asarray(number_of_invalid_ages)
+        inv_frac = 1.0 - number_of_valid_ages / float(number_of_ages)
+    return base + (1.0 - base) * inv_frac
+
+
+class MonteCarloRunPbLossAgeStatistics:
+    """
+    Read-only view of one grid node of a run: raw K–S result (D, p), invalid
+    count and the penalised dissimilarity `score` (see `_penalised_score`).
 
-        self.valid_concordant_ages = ca[np.isfinite(ca)].tolist()
-        self.valid_discordant_ages = da[np.isfinite(da)].tolist()
+    The concordant and reconstructed discordant ages are not stored per node;
+    they are recomputed from the run on first access.
+    """
+    __slots__ = ("_run", "_index")
 
-        self.number_of_ages = int(da.size)
-        self.number_of_invalid_ages = int(da.size - len(self.valid_discordant_ages))
+    def __init__(self, run, index):
+        self._run = run
+        self._index = int(index)
 
-        # Old behavior: if no valid discordants, force KS=(1.0, 0.0-equivalent)
-        if len(self.valid_discordant_ages) == 0:
-            ks_d, ks_p = 1.0, 0.0
-        else:
-            # Try the provided test; if that fails, use scipy’s ks_2samp for parity
-            try:
-                ks_d, ks_p = dissimilarity_test.perform(
-                    self.valid_concordant_ages, self.valid_discordant_ages
-                )
-            except Exception:
-                ks_d, ks_p = _ks2(
-                    self.valid_concordant_ages, self.valid_discordant_ages, alternative="two-sided"
-                )
-        self.test_statistics = (float(ks_d), float(ks_p))
-        base = float(dissimilarity_test.getComparisonValue(self.test_statistics))
-
-        if penalise_invalid_ages:
-            inv_frac = 1.0 if self.number_of_ages == 0 else (
-                1.0 - len(self.valid_discordant_ages) / float(self.number_of_ages)
-            )
-            self.score = base + (1.0 - base) * float(inv_frac)
-        else:
-            self.score = base
+    @property
+    def pb_loss_age(self):
+        return float(self._run.rim_ages[self._index])
+
+    @property
+    def test_statistics(self):
+        return (float(self._run.d_values[self._index]), float(self._run.p_values[self._index]))
+
+    @property
+    def score(self):
+        return float(self._run.scores[self._index])
+
+    @property
+    def number_of_ages(self):
+        return int(self._run.discordant_uPb.size)
+
+    @property
+    def number_of_invalid_ages(self):
+        return int(self._run.invalid_counts[self._index])
+
+    @property
+    def valid_concordant_ages(self):
+        return list(self._run.concordant_ages)
+
+    @property
+    def valid_discordant_ages(self):
+        ages = self._run.reconstructedAges(self.pb_loss_age)
+        return ages[np.isfinite(ages)].tolist()
+
+
+class _StatisticsByPbLossAge(Mapping):
+    """Lazy read-only mapping of rim age (YEARS) -> per-node statistics for one run."""
+    __slots__ = ("_run",)
+
+    def __init__(self, run):
+        self._run = run
+
+    def __getitem__(self, age):
+        index = self._run._indexOfAge(age)
+        if index is None:
+            raise KeyError(age)
+        return MonteCarloRunPbLossAgeStatistics(self._run, index)
+
+    def __iter__(self):
+        return iter(self._run.rim_ages.tolist())
+
+    def __len__(self):
+        return int(self._run.rim_ages.size)
+
+    def __contains__(self, age):
+        return self._run._indexOfAge(age) is not None
 
 
 class MonteCarloRun:
-    """One Monte Carlo realisation over the Pb-loss age grid."""
+    """
+    One Monte Carlo realisation over the Pb-loss age grid.
+
+    Per-node results are held as contiguous arrays over the sorted grid
+    (`rim_ages`, `d_values`, `p_values`, `scores`, `invalid_counts`); the
+    legacy `*statistics_by_pb_loss_age` dicts are lazy read-only views.
+    """
+    __slots__ = (
+        "run_number", "sample_name", "settings",
+        "concordant_uPb", "concordant_pbPb", "discordant_uPb", "discordant_pbPb",
+        "concordant_ages", "_sorted_concordant_ages",
+        "rim_ages", "d_values", "p_values", "scores", "invalid_counts",
+        "optimal_pb_loss_age", "optimal_uPb", "optimal_pbPb", "_optimal_index",
+        "heatmapColumnData", "lead_loss_ages", "_heatmap_view_which",
+        "_peaks_ma_raw", "_peaks_ma_pen", "ks_surface",
+        "_age_index",
+    )
 
     def __init__(self,
                  run_number,
@@ -99,7 +216,8 @@ class MonteCarloRun:
                  concordant_pbPb,
                  discordant_uPb,
                  discordant_pbPb,
-                 settings=None):
+                 settings=None,
+                 concordant_ages=None):
 
         self.run_number   = run_number
         self.sample_name  = sample_name
@@ -111,153 +229,200 @@ class MonteCarloRun:
         self.discordant_uPb  = np.asarray(discordant_uPb, float)
         self.discordant_pbPb = np.asarray(discordant_pbPb, float)
 
-        # (optional short aliases)
-        self.con_u = self.concordant_uPb
-        self.con_p = self.concordant_pbPb
-        self.dis_u = self.discordant_uPb
-        self.dis_p = self.discordant_pbPb
-
-        # Cache concordant ages (YEARS) for this run
-        self.concordant_ages = []
-        for u, p in zip(self.concordant_uPb, self.concordant_pbPb):
-            try:
-                t = calculations.concordant_age(float(u), float(p))
-                if isinstance(t, (int, float)) and math.isfinite(t):
-                    self.concordant_ages.append(float(t))
-            except Exception:
-                pass
-
-        self.statistics_by_pb_loss_age = {}  # key: age (YEARS) -> MonteCarloRunPbLossAgeStatistics
-        self._raw_statistics_by_pb_loss_age = {}  # key: age (YEARS) -> MonteCarloRunPbLossAgeStatistics
+        # Cache concordant ages (YEARS) for this run; the pipeline passes them in
+        # when it has solved all runs at once.
+        if concordant_ages is None:
+            concordant_ages = calculations.concordant_ages(self.concordant_uPb, self.concordant_pbPb)
+        concordant_ages = np.asarray(concordant_ages, float)
+        self.concordant_ages = concordant_ages[np.isfinite(concordant_ages)]
+        # Sorted once per run for the batched dissimilarity test.
+        self._sorted_concordant_ages = np.sort(self.concordant_ages)
+
+        # Per-node results over the grid, sorted by age (YEARS)
+        self.rim_ages       = np.array([], float)
+        self.d_values       = np.array([], float)
+        self.p_values       = np.array([], float)
+        self.scores         = np.array([], float)
+        self.invalid_counts = np.array([], np.int32)
+        self._age_index     = None
+
         self.optimal_pb_loss_age = None
         self.optimal_uPb = None
         self.optimal_pbPb = None
-        self.optimal_statistic = None
+        self._optimal_index = None
 
         self.heatmapColumnData = None
         self.lead_loss_ages = []
 
-        self._all_statistics_by_pb_loss_age = {}
         self._heatmap_view_which = None
 
-        # --- per-run peak attributes (RAW & PEN) ---
-        self.peaks_ma_raw = None
-        self.peaks_ma_pen = None
-        self.peaks_ma     = None   # legacy alias (RAW by default)
+        # --- per-run peaks (RAW & PEN), detected on first use unless set ---
+        self._peaks_ma_raw = None
+        self._peaks_ma_pen = None
 
         # legacy surface shim (penalised dissimilarity)
         self.ks_surface = None
 
+    def __getstate__(self):
+        # The age index is a cache and is rebuilt on demand.
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_age_index" and hasattr(self, name)}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._age_index = None
+
+    # ---- legacy views -------------------------------------------------------
+
+    # (optional short aliases)
+    con_u = property(lambda self: self.concordant_uPb)
+    con_p = property(lambda self: self.concordant_pbPb)
+    dis_u = property(lambda self: self.discordant_uPb)
+    dis_p = property(lambda self: self.discordant_pbPb)
+
+    @property
+    def peaks_ma_raw(self):
+        if self._peaks_ma_raw is None:
+            self._detectPeaks()
+        return self._peaks_ma_raw
+
+    @peaks_ma_raw.setter
+    def peaks_ma_raw(self, value):
+        self._peaks_ma_raw = value
+
+    @property
+    def peaks_ma_pen(self):
+        if self._peaks_ma_pen is None:
+            self._detectPeaks()
+        return self._peaks_ma_pen
+
+    @peaks_ma_pen.setter
+    def peaks_ma_pen(self, value):
+        self._peaks_ma_pen = value
+
+    # Legacy alias (RAW)
+    peaks_ma = property(lambda self: self.peaks_ma_raw)
+
+    @property
+    def statistics_by_pb_loss_age(self):
+        """key: age (YEARS) -> MonteCarloRunPbLossAgeStatistics"""
+        return _StatisticsByPbLossAge(self)
+
+    # Raw and penalised values live on the same per-node record.
+    _raw_statistics_by_pb_loss_age = statistics_by_pb_loss_age
+    _all_statistics_by_pb_loss_age = statistics_by_pb_loss_age
+
+    @property
+    def optimal_statistic(self):
+        if self._optimal_index is None:
+            return None
+        return MonteCarloRunPbLossAgeStatistics(self, self._optimal_index)
+
+    def _indexOfAge(self, age):
+        if self._age_index is None:
+            self._age_index = {a: i for i, a in enumerate(self.rim_ages.tolist())}
+        try:
+            return self._age_index.get(float(age))
+        except (TypeError, ValueError):
+            return None
+
+    def reconstructedAges(self, leadLossAge):
+        """Upper-intercept ages (YEARS, NaN if none) of every discordant point for one rim age."""
+        return calculations.discordant_ages([float(leadLossAge)], self.discordant_uPb, self.discordant_pbPb)[0]
+
     # ---- main per-node evaluation -------------------------------------------
 
     def samplePbLossAge(self, leadLossAge, dissimilarity_test, penalise_invalid_ages):
         """Evaluate this run at a given lower intercept age (YEARS)."""
-        xL = calculations.u238pb206_from_age(float(leadLossAge))
-        yL = calculations.pb207pb206_from_age(float(leadLossAge))
-
-        # Project all discordant points once for the current lower-intercept age.
-        all_ui = np.empty_like(self.discordant_uPb, dtype=float)
-        for i, (du, dp) in enumerate(zip(self.discordant_uPb, self.discordant_pbPb)):
-            ui = calculations.discordant_age(xL, yL, float(du), float(dp))
-            all_ui[i] = np.nan if ui is None else float(ui)
-
-        # Store one statistics object per age using all discordant analyses.
-        st_all = MonteCarloRunPbLossAgeStatistics(
-            self.concordant_ages, all_ui.tolist(), dissimilarity_test, penalise_invalid_ages
-        )
-        self._all_statistics_by_pb_loss_age[leadLossAge] = st_all
-        self.statistics_by_pb_loss_age[leadLossAge] = st_all
-        self._raw_statistics_by_pb_loss_age[leadLossAge] = st_all
+        self.samplePbLossAges([leadLossAge], dissimilarity_test, penalise_invalid_ages)
+
+    def samplePbLossAges(self, leadLossAges, dissimilarity_test, penalise_invalid_ages):
+        """Evaluate this run at every lower intercept age (YEARS) of the grid."""
+        ages = np.asarray(leadLossAges, float).ravel()
+
+        # Project all discordant points onto every lower-intercept age in one pass.
+        all_ui = calculations.discordant_ages(ages, self.discordant_uPb, self.discordant_pbPb)
+
+        # Compare every node's reconstructed ages against the concordant ages at once.
+        dvals, pvals, valid_counts = dissimilarity_test.performBatch(self._sorted_concordant_ages, all_ui)
+        invalid = self.discordant_uPb.size - np.asarray(valid_counts)
+        base = dissimilarity_test.getComparisonValue((dvals, pvals))
+        scores = _penalised_score(base, invalid, self.discordant_uPb.size, penalise_invalid_ages)
+
+        # Merge into the grid arrays; re-sampled ages replace their old values.
+        keep = ~np.isin(self.rim_ages, ages)
+        rim_ages = np.concatenate([self.rim_ages[keep], ages])
+        order = np.argsort(rim_ages, kind="stable")
+        self.rim_ages = rim_ages[order]
+        self.d_values = np.concatenate([self.d_values[keep], dvals])[order]
+        self.p_values = np.concatenate([self.p_values[keep], pvals])[order]
+        self.scores = np.concatenate([self.scores[keep], scores])[order]
+        self.invalid_counts = np.concatenate([self.invalid_counts[keep], invalid]).astype(np.int32)[order]
+        self._age_index = None
 
     def calculateOptimalAge(self):
         """
         Choose the node with the MINIMUM penalised dissimilarity (score = D*).
-        Also compute per-run peaks on RAW and PEN goodness surfaces.
+        Per-run peaks on the RAW and PEN goodness surfaces are detected on
+        first use (or set for the whole stack by `setPeaksForRuns`).
         Keep a small ks_surface shim for downstream code.
         """
-        if not self.statistics_by_pb_loss_age:
+        self._peaks_ma_raw = None
+        self._peaks_ma_pen = None
+        if self.rim_ages.size == 0:
             self.optimal_pb_loss_age = float("nan")
-            self.optimal_statistic = None
-            self.peaks_ma_raw = np.array([], float)
-            self.peaks_ma_pen = np.array([], float)
-            self.peaks_ma     = self.peaks_ma_raw
+            self._optimal_index = None
             return
 
-        # Sort by age (YEARS) and rebuild arrays
-        items = sorted(self.statistics_by_pb_loss_age.items(), key=lambda kv: kv[0])
-        ages_year = np.asarray([a for a, _ in items], float)
+        # Grid arrays are already sorted by age (YEARS)
+        ages_year = self.rim_ages
         age_ma    = ages_year / 1e6
-        D_pen     = np.asarray([st.score              for _, st in items], float)
-        D_raw = np.asarray(
-            [
-                self._raw_statistics_by_pb_loss_age.get(a, self.statistics_by_pb_loss_age[a]).test_statistics[0]
-                for a in ages_year
-            ],
-            float,
-        )
+        D_pen     = self.scores
+        D_raw     = self.d_values
 
         # Run-level optimum follows the active primary channel.
         prefer_pen = bool(getattr(self.settings, "penaliseInvalidAges", True))
         D_primary = D_pen if prefer_pen else D_raw
-        j = _find_optimal_index(D_primary)
+        j = _find_optimal_index(D_primary.tolist())
         best_age_y = float(ages_year[j])
 
         self.optimal_pb_loss_age = best_age_y
         self.optimal_uPb  = calculations.u238pb206_from_age(best_age_y)
         self.optimal_pbPb = calculations.pb207pb206_from_age(best_age_y)
-        if prefer_pen:
-            self.optimal_statistic = self.statistics_by_pb_loss_age[best_age_y]
-        else:
-            self.optimal_statistic = self._raw_statistics_by_pb_loss_age.get(
-                best_age_y,
-                self.statistics_by_pb_loss_age[best_age_y],
-            )
+        self._optimal_index = j
 
         # Legacy surface shim now follows active primary channel.
         self.ks_surface = _KSSurface(age_ma, D_primary)
 
-        # Keep legacy per-run peak arrays aligned with the configured ensemble gates.
-        S_raw = 1.0 - D_raw
-        S_pen = 1.0 - D_pen
-        try:
-            self.peaks_ma_raw = per_run_peaks(
-                age_ma, S_raw,
-                prom_frac=float(PER_RUN_PROM_FRAC),
-                min_dist=int(PER_RUN_MIN_DIST),
-                min_width_nodes=int(PER_RUN_MIN_WIDTH),
-                require_full_prom=False, max_keep=None, fallback_global_max=False
-            )
-            self.peaks_ma_pen = per_run_peaks(
-                age_ma, S_pen,
-                prom_frac=float(PER_RUN_PROM_FRAC),
-                min_dist=int(PER_RUN_MIN_DIST),
-                min_width_nodes=int(PER_RUN_MIN_WIDTH),
-                require_full_prom=False, max_keep=None, fallback_global_max=False
-            )
-        except TypeError:
-            # Legacy signature fallback uses the same configured prominence and distance.
-            self.peaks_ma_raw = per_run_peaks(
-                age_ma, S_raw,
-                prom_frac=float(PER_RUN_PROM_FRAC),
-                min_dist=int(PER_RUN_MIN_DIST),
-            )
-            self.peaks_ma_pen = per_run_peaks(
-                age_ma, S_pen,
-                prom_frac=float(PER_RUN_PROM_FRAC),
-                min_dist=int(PER_RUN_MIN_DIST),
-            )
-
-        # Legacy alias (RAW by default)
-        self.peaks_ma = self.peaks_ma_raw
+    def _detectPeaks(self):
+        """Per-run peaks on both goodness surfaces, under the configured ensemble gates."""
+        if self.rim_ages.size == 0:
+            self._peaks_ma_raw = np.array([], float)
+            self._peaks_ma_pen = np.array([], float)
+            return
+        peaks = per_run_peaks_batch(
+            self.rim_ages / 1e6,
+            np.vstack([1.0 - self.d_values, 1.0 - self.scores]),
+            prom_frac=float(PER_RUN_PROM_FRAC),
+            min_dist=int(PER_RUN_MIN_DIST),
+            min_width_nodes=int(PER_RUN_MIN_WIDTH),
+            require_full_prom=False,
+        )
+        self._peaks_ma_raw, self._peaks_ma_pen = peaks.as_list()
 
-    def createHeatmapData(self, minAge, maxAge, resolution):
-        """
-        Build a per-run column vector over the grid (length <= resolution) with
-        primary dissimilarity values, linearly interpolated across gaps.
+    @staticmethod
+    def setPeaksForRuns(runs, peaks_raw, peaks_pen):
+        """Attach per-run peaks detected for a whole run stack (row i belongs to runs[i])."""
+        for i, run in enumerate(runs):
+            run.peaks_ma_raw = peaks_raw.ages(i)
+            run.peaks_ma_pen = peaks_pen.ages(i)
 
-        Primary channel follows GUI intent:
+    def _heatmapValues(self):
+        """
+        Primary dissimilarity values for the heatmap, following GUI intent:
           - penaliseInvalidAges=True  -> use penalised score (D*)
           - penaliseInvalidAges=False -> use raw KS D
+        unless the pipeline pinned the view surface (`_heatmap_view_which`).
         """
         which = str(getattr(self, "_heatmap_view_which", "") or "").strip().lower()
         if which == "raw":
@@ -266,65 +431,35 @@ class MonteCarloRun:
             prefer_pen = True
         else:
             prefer_pen = bool(getattr(self.settings, "penaliseInvalidAges", True))
+        return self.scores if prefer_pen else self.d_values
 
-        stats_map = self.statistics_by_pb_loss_age if prefer_pen else self._raw_statistics_by_pb_loss_age
-        if not isinstance(stats_map, dict) or not stats_map:
-            stats_map = getattr(self, "_all_statistics_by_pb_loss_age", None)
-
-        if not isinstance(stats_map, dict) or not stats_map:
-            self.heatmapColumnData = []
-            return
-
-        def _value_at(age_key: float) -> float:
-            st = stats_map.get(float(age_key))
-            if st is None:
-                return float("nan")
-            if prefer_pen:
-                v = float(st.score)
-            else:
-                v = float(st.test_statistics[0])
-            if not np.isfinite(v):
-                return float("nan")
-            return float(np.clip(v, 0.0, 1.0))
-
-        runAges = sorted(list(stats_map.keys()))
-
-        ageInc = (maxAge - minAge) / resolution
-        if not runAges:
+    def createHeatmapData(self, minAge, maxAge, resolution):
+        """
+        Build a per-run column vector over the grid (length <= resolution) with
+        primary dissimilarity values, linearly interpolated across gaps.
+        """
+        if self.rim_ages.size == 0:
             self.heatmapColumnData = []
             return
-
-        colAges = [[] for _ in range(resolution)]
-        for age in runAges:
-            col = (resolution - 1) if age == maxAge else int((age - minAge) // ageInc)
-            colAges[col].append(age)
-
-        colData = []
-        for col in range(resolution):
-            prevNonEmptyCol = col
-            nextNonEmptyCol = col
-            while prevNonEmptyCol > 0 and len(colAges[prevNonEmptyCol]) == 0:
-                prevNonEmptyCol -= 1
-            while nextNonEmptyCol < resolution - 1 and len(colAges[nextNonEmptyCol]) == 0:
-                nextNonEmptyCol += 1
-            if len(colAges[prevNonEmptyCol]) == 0 or len(colAges[nextNonEmptyCol]) == 0:
-                continue
-
-            if prevNonEmptyCol != nextNonEmptyCol:
-                prevAge  = max(colAges[prevNonEmptyCol])
-                nextAge  = min(colAges[nextNonEmptyCol])
-                prevStat = _value_at(prevAge)
-                nextStat = _value_at(nextAge)
-                prevDiff = col - prevNonEmptyCol
-                nextDiff = nextNonEmptyCol - col
-                totalDiff = nextDiff + prevDiff
-                value = (nextDiff * prevStat + prevDiff * nextStat) / totalDiff
-            else:
-                vals = np.asarray([_value_at(a) for a in colAges[col]], float)
-                vals = vals[np.isfinite(vals)]
-                value = float(np.mean(vals)) if vals.size else float("nan")
-            colData.append(value)
-        self.heatmapColumnData = colData
+        self.heatmapColumnData = heatmapColumns(
+            self.rim_ages, self._heatmapValues(), minAge, maxAge, resolution
+        ).tolist()
+
+    @staticmethod
+    def createHeatmapDataForRuns(runs, minAge, maxAge, resolution):
+        """`createHeatmapData` for many runs, one (R × G) pass per shared grid."""
+        pending = [run for run in runs if run.rim_ages.size]
+        for run in runs:
+            if not run.rim_ages.size:
+                run.heatmapColumnData = []
+        while pending:
+            ages = pending[0].rim_ages
+            group = [run for run in pending if run.rim_ages is ages or np.array_equal(run.rim_ages, ages)]
+            grouped = {id(run) for run in group}
+            pending = [run for run in pending if id(run) not in grouped]
+            columns = heatmapColumns(ages, np.stack([run._heatmapValues() for run in group]), minAge, maxAge, resolution)
+            for run, row in zip(group, columns.tolist()):
+                run.heatmapColumnData = row
 
     def toList(self):
         # Convert to Ma in the exported row
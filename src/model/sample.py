@@ -25,6 +25,11 @@ class Sample:
         self.optimalAgeNumberOfInvalidPoints = None
         self.optimalAgeScore = None
         self.monteCarloRuns = []
+        self.run_stack = None  # RunStack filled by the sampling loop
+        self.rim_age_grid = None  # rim ages (YEARS) the runs were evaluated on, if not the settings grid
+        self.early_stopped_at = None  # number of runs drawn when early stopping ended sampling
+        self.sampledWith = None  # settings the retained runs were sampled under
+        self.node_store = None  # NodeStore of every rim age the runs were evaluated at
 
         # Goodness curve cache (for exporting curve values)
         self.summedKS_ages_Ma = None       # np.ndarray shape (n,)
@@ -86,6 +91,11 @@ class Sample:
     def clearCalculation(self):
         self.optimalAge = None
         self.monteCarloRuns = []
+        self.run_stack = None
+        self.rim_age_grid = None
+        self.early_stopped_at = None
+        self.sampledWith = None
+        self.node_store = None
         self.peak_catalogue = []
         self.rejected_peak_candidates = []
         for spot in self.spots:
@@ -97,6 +107,24 @@ class Sample:
         self.summedKS_ci_low_Ma = None
         self.summedKS_ci_high_Ma = None
 
+    def clearRuns(self):
+        """Drop the runs (they are being re-sent), keeping the classification."""
+        self.clearCatalogue()
+        self.monteCarloRuns = []
+        self.run_stack = None
+        self.signals.processingCleared.emit()
+
+    def clearCatalogue(self):
+        """Clear the summary and peak catalogue, keeping the classification and runs."""
+        self.optimalAge = None
+        self.peak_catalogue = []
+        self.rejected_peak_candidates = []
+        self.summedKS_ages_Ma = None
+        self.summedKS_goodness = None
+        self.summedKS_peaks_Ma = None
+        self.summedKS_ci_low_Ma = None
+        self.summedKS_ci_high_Ma = None
+
     def updateConcordance(self, concordancy, discordances, reverse_flags=None):
         for i, (spot, conc, disc) in enumerate(zip(self.validSpots, concordancy, discordances)):
             reverse = bool(reverse_flags[i]) if (reverse_flags is not None and i < len(reverse_flags)) else False
@@ -109,6 +137,13 @@ class Sample:
         if self.signals:
             self.signals.monteCarloRunAdded.emit()
 
+    def addMonteCarloRuns(self, runs):
+        if not runs:
+            return
+        self.monteCarloRuns.extend(runs)
+        if self.signals:
+            self.signals.monteCarloRunAdded.emit()
+
     def setOptimalAge(self, args):
         self.optimalAge = args[0]
         self.optimalAgeLowerBound = args[1]
@@ -16,6 +16,17 @@ class DiscordanceClassificationMethod(Enum):
 class LeadLossCalculationSettings:
     KEY = SettingsType.CALCULATION
 
+    # Settings that change how results are obtained, never the results themselves
+    RUNTIME_FIELDS = frozenset({"useResultCache"})
+
+    # Settings read only when building the surfaces and catalogue from finished runs
+    CATALOGUE_FIELDS = frozenset({
+        "enable_ensemble_peak_picking",
+        "conservative_abstain_on_monotonic",
+        "merge_nearby_peaks",
+        "catalogue_surface",
+    })
+
     def __init__(self):
         # Discordance
         self.discordanceClassificationMethod = DiscordanceClassificationMethod.PERCENTAGE
@@ -26,9 +37,22 @@ class LeadLossCalculationSettings:
         self.minimumRimAge = 500 * 10**6
         self.maximumRimAge = 4500 * 10**6
         self.rimAgesSampled = 100
+        # Nested grid: round the node count up to 2^k + 1, so that every grid
+        # over the same range contains all nodes of the coarser ones
+        self.nestedRimAgeGrid = False
+        # Adaptive grid: refine around candidate optima/peaks of the coarse
+        # surface to this node spacing (YEARS)
+        self.adaptiveRimAgeGrid = False
+        self.adaptiveRimAgeStep = 2 * 10**6
 
         # MC
         self.monteCarloRuns = 50
+        # Stop before monteCarloRuns once the optimum, its bounds and the peak
+        # set have converged (checkpoints and tolerances in process.cdcConfig)
+        self.earlyStopping = False
+        # Restore samples processed before with identical spots and settings
+        # from the on-disk result cache instead of sampling them again
+        self.useResultCache = True
 
         # Comparison
         self.dissimilarityTest = DissimilarityTest.KOLMOGOROV_SMIRNOV
@@ -43,12 +67,63 @@ class LeadLossCalculationSettings:
         self.conservative_abstain_on_monotonic = True
         self.merge_nearby_peaks = False
 
+    # Settings that only choose the rim-age grid the runs are evaluated on
+    GRID_FIELDS = frozenset({
+        "minimumRimAge", "maximumRimAge", "rimAgesSampled", "nestedRimAgeGrid",
+        "adaptiveRimAgeGrid", "adaptiveRimAgeStep",
+    })
+
+    def rimAgeCount(self):
+        n = int(self.rimAgesSampled)
+        if getattr(self, "nestedRimAgeGrid", False) and n > 2:
+            n = 2 ** int(np.ceil(np.log2(n - 1))) + 1
+        return n
+
     def rimAges(self):
-        return np.linspace(start=self.minimumRimAge, stop=self.maximumRimAge, num=self.rimAgesSampled)
+        return np.linspace(start=self.minimumRimAge, stop=self.maximumRimAge, num=self.rimAgeCount())
 
     def getNearestSampledAge(self, targetAge):
         return min(self.rimAges(), key=lambda v: abs(v - targetAge))
 
+    def changedFields(self, other):
+        """Names of the settings whose values differ from `other`'s."""
+        names = (set(vars(LeadLossCalculationSettings())) | self.CATALOGUE_FIELDS) - self.RUNTIME_FIELDS
+        return {name for name in names if getattr(self, name, None) != getattr(other, name, None)}
+
+    def reusesRunsOf(self, previous):
+        """
+        True if runs sampled under `previous` are valid under these settings,
+        i.e. only catalogue-stage settings changed.
+        """
+        if previous is None:
+            return False
+        return self.changedFields(previous) <= self.CATALOGUE_FIELDS
+
+    def extendsRunsOf(self, previous):
+        """
+        True if runs sampled under `previous` are the first runs these settings
+        would draw, i.e. only the run count (upwards) and catalogue-stage
+        settings changed. The missing runs can then be topped up.
+        """
+        if previous is None:
+            return False
+        changed = self.changedFields(previous) - self.CATALOGUE_FIELDS
+        return changed == {"monteCarloRuns"} and int(self.monteCarloRuns) > int(previous.monteCarloRuns)
+
+    def regridsRunsOf(self, previous):
+        """
+        True if runs sampled under `previous` only need re-evaluating on a new
+        rim-age grid (nodes already evaluated are reused).
+        """
+        if previous is None:
+            return False
+        changed = self.changedFields(previous) - self.CATALOGUE_FIELDS
+        return bool(changed) and changed <= self.GRID_FIELDS
+
+    def keepsRunsOf(self, previous):
+        """True if runs sampled under `previous` can be kept: reused as is, topped up or re-gridded."""
+        return self.reusesRunsOf(previous) or self.extendsRunsOf(previous) or self.regridsRunsOf(previous)
+
     def validate(self):
         if self.discordanceClassificationMethod == DiscordanceClassificationMethod.PERCENTAGE:
             if self.discordancePercentageCutoff is None:
@@ -67,6 +142,8 @@ class LeadLossCalculationSettings:
             return "Please enter a number of samples"
         if int(self.rimAgesSampled) < 2:
             return "The number of samples must be ≥ 2"
+        if getattr(self, "adaptiveRimAgeGrid", False) and not float(getattr(self, "adaptiveRimAgeStep", 0) or 0) > 0:
+            return "The adaptive grid spacing must be positive"
 
         if self.monteCarloRuns is None:
             return "Please enter a number of Monte Carlo runs"
@@ -0,0 +1,230 @@
+"""
+Content-addressed on-disk cache of processed samples.
+
+An entry is keyed by a hash of everything that determines a sample's
+results: its valid spot values and standard deviations, every calculation
+setting, the sampling seed and the code version. It holds the processed
+sample's state (runs, run stack, catalogue and summary) together with the
+signals the pipeline emitted, so a hit restores the sample and replays the
+same progress stream without sampling again.
+
+Entries are pickles under `<user data dir>/result_cache`. Reading an entry
+refreshes its modification time, and storing one evicts the least recently
+used entries beyond the size limit. The cache is skipped for settings with
+`useResultCache` off.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from enum import Enum
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from process.cdc.state import RESULT_STATE, NodeStore, ProgressType, RunGridChanged
+from process.cdc import transport
+from process.cdcConfig import (
+    CDC_RESULT_CACHE,
+    CDC_RESULT_CACHE_DIR,
+    CDC_RESULT_CACHE_MAX_MB,
+    CDC_WRITE_OUTPUTS,
+    KS_EXPORT_ROOT,
+)
+from utils import config
+
+# Bump when the entry layout changes.
+_FORMAT = 1
+
+# Attributes that do not affect results: set by the pipeline itself, or runtime settings.
+_RUNTIME_SETTINGS = frozenset({"timing_mode", "write_outputs", "useResultCache"})
+
+# Sources whose behaviour determines a sample's results.
+_SOURCE_ROOT = Path(__file__).resolve().parents[2]
+_SOURCE_DIRS = ("process", "model")
+
+
+@lru_cache(maxsize=1)
+def code_version() -> str:
+    """
+    Application version plus a digest of the processing sources, or for a
+    frozen (PyInstaller) build, which ships no .py files, of the executable's
+    size and modification time.
+    """
+    h = hashlib.sha256(config.VERSION.encode())
+    if getattr(sys, "frozen", False):
+        st = Path(sys.executable).stat()
+        h.update(f"|frozen|{st.st_size}|{st.st_mtime_ns}".encode())
+        return h.hexdigest()[:16]
+    for sub in _SOURCE_DIRS:
+        for path in sorted((_SOURCE_ROOT / sub).rglob("*.py")):
+            h.update(str(path.relative_to(_SOURCE_ROOT)).encode())
+            h.update(path.read_bytes())
+    return h.hexdigest()[:16]
+
+
+def _encode(value) -> str:
+    if isinstance(value, Enum):
+        return f"{type(value).__name__}.{value.name}"
+    return repr(value)
+
+
+def sample_key(sample, seed: int) -> str:
+    """Hex digest identifying `sample`'s results under its current calculation settings."""
+    h = hashlib.sha256(f"v{_FORMAT}|{code_version()}|{int(seed)}".encode())
+    for spot in sample.validSpots:
+        h.update(repr((spot.uPbValue, spot.uPbStDev, spot.pbPbValue, spot.pbPbStDev)).encode())
+    settings = vars(sample.calculationSettings)
+    for name in sorted(settings):
+        if name not in _RUNTIME_SETTINGS:
+            h.update(f"|{name}={_encode(settings[name])}".encode())
+    return h.hexdigest()
+
+
+class CacheEntry:
+    """What a hit restores: the processed sample's state, its signals and the outcome."""
+
+    def __init__(self, state: dict, messages: List[Tuple[str, tuple]], result: Tuple[bool, Optional[str]]):
+        self.state = state
+        self.messages = messages
+        self.result = result
+
+
+class RecordingSignals:
+    """
+    Forwards every call to `signals` and records the ones a replay needs.
+
+    Run payloads are recorded as (fraction, start, stop) row ranges; a replay
+    resolves them against the restored sample's runs, so shared-memory
+    handles never reach the cache. Node stores are recorded as they are. Runs
+    sent again after a RunGridChanged replace the ones recorded before it.
+    """
+
+    def __init__(self, signals):
+        self._signals = signals
+        self.messages: List[Tuple[str, tuple]] = []
+        self._runs = 0
+
+    def __getattr__(self, name):
+        return getattr(self._signals, name)
+
+    def newTask(self, *args):
+        self.messages.append(("newTask", args))
+        self._signals.newTask(*args)
+
+    def progress(self, *args):
+        if len(args) > 3 and args[0] == ProgressType.SAMPLING and isinstance(args[3], RunGridChanged):
+            self.messages = [message for message in self.messages if message[0] != "runs"]
+            self._runs = 0
+            self.messages.append(("progress", args))
+        elif len(args) > 3 and args[0] == ProgressType.SAMPLING and not isinstance(args[3], NodeStore):
+            payload = args[3]
+            if isinstance(payload, transport.RunRows):
+                self.messages.append(("runs", (args[1], payload.start, payload.stop)))
+                self._runs = payload.stop
+            elif not isinstance(payload, transport.SharedRunBlockHandle):
+                self.messages.append(("runs", (args[1], self._runs, self._runs + 1)))
+                self._runs += 1
+        else:
+            self.messages.append(("progress", args))
+        self._signals.progress(*args)
+
+
+def replay(signals, sample, entry: CacheEntry):
+    """Restore `sample`'s results from `entry` and re-emit its signals; returns the cached outcome."""
+    for name in RESULT_STATE.intersection(entry.state):
+        setattr(sample, name, entry.state[name])
+    runs = list({id(run): run for run in sample.monteCarloRuns}.values())
+    sample_name = sample.name
+    for name, args in entry.messages:
+        if name == "runs":
+            fraction, start, stop = args
+            for run in runs[start:stop]:
+                signals.progress(ProgressType.SAMPLING, fraction, sample_name, run)
+        else:
+            getattr(signals, name)(*args)
+    return entry.result
+
+
+class ResultCache:
+    """Directory of pickled `CacheEntry` files with LRU size-based eviction."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.pkl"
+
+    def load(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        try:
+            with path.open("rb") as fh:
+                entry = pickle.load(fh)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Unreadable (e.g. truncated or from an incompatible build); drop it.
+            path.unlink(missing_ok=True)
+            return None
+        return entry if isinstance(entry, CacheEntry) else None
+
+    def store(self, key: str, sample, messages, result) -> None:
+        state = {k: v for k, v in vars(sample).items() if k in RESULT_STATE}
+        data = pickle.dumps(CacheEntry(state, messages, result), protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, self._path(key))
+        except OSError:
+            # A cache that cannot be written is just a cache miss next time.
+            Path(tmp).unlink(missing_ok=True)
+            return
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for path in self.root.glob("*.pkl"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+
+def default_cache(settings=None) -> Optional[ResultCache]:
+    """
+    The configured cache, or None when it is disabled (by CDC_RESULT_CACHE or
+    the settings' `useResultCache`). Diagnostic exports are written while
+    processing, so enabling them bypasses the cache.
+    """
+    if not CDC_RESULT_CACHE or CDC_WRITE_OUTPUTS or KS_EXPORT_ROOT is not None:
+        return None
+    if not getattr(settings, "useResultCache", True):
+        return None
+    if CDC_RESULT_CACHE_DIR is not None:
+        root = CDC_RESULT_CACHE_DIR
+    else:
+        from utils.app_paths import user_data_dir
+
+        root = user_data_dir() / "result_cache"
+    return ResultCache(root, CDC_RESULT_CACHE_MAX_MB * 2**20)
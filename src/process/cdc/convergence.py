@@ -0,0 +1,130 @@
+"""Sequential early stopping of the Monte Carlo sampling loop.
+
+Every `EARLY_STOP_CHECK_EVERY` runs the ensemble summary is rebuilt from the
+runs drawn so far: the optimal age, its 95% stability bounds and the peak
+set of the displayed catalogue surface. Sampling stops once that summary has
+moved less than the configured tolerances over `EARLY_STOP_PATIENCE`
+consecutive checkpoints.
+"""
+
+from __future__ import annotations
+
+from typing import List, NamedTuple, Tuple
+
+import numpy as np
+
+from process.cdcConfig import (
+    CATALOGUE_SURFACE,
+    EARLY_STOP_AGE_TOL_STEPS,
+    EARLY_STOP_BOUNDS_TOL_STEPS,
+    EARLY_STOP_CHECK_EVERY,
+    EARLY_STOP_MIN_RUNS,
+    EARLY_STOP_PATIENCE,
+    EARLY_STOP_PEAK_TOL_STEPS,
+    MERGE_NEARBY_PEAKS,
+)
+from process.cdc.state import RunStack
+from process.cdc.surfaces import (
+    _build_global_catalogue_rows,
+    _build_surface_states,
+    _compute_optimal_age,
+    _compute_optimal_age_ci,
+)
+from process.ensemble_internal.primitives import _step_from_grid
+
+
+class Checkpoint(NamedTuple):
+    """Ensemble summary after `n_runs` runs (ages in YEARS, peaks in Ma)."""
+
+    n_runs: int
+    optimal_age: float
+    lower95: float
+    upper95: float
+    peaks_ma: Tuple[float, ...]
+    stable: bool = False
+
+
+def _checkpoint(settings, stack: RunStack) -> Checkpoint:
+    """Summarise the filled rows of `stack` the way `_calculateOptimalAge` does."""
+    ages_y = np.asarray(stack.ages_y, float)
+    ages_ma = ages_y / 1e6
+    prefer_pen = bool(getattr(settings, "penaliseInvalidAges", False))
+    abstain_on_monotonic = bool(getattr(settings, "conservative_abstain_on_monotonic", True))
+
+    smf, raw, pen = _build_surface_states(settings, stack, ages_ma, abstain_on_monotonic)
+    lower95, upper95, _ = _compute_optimal_age_ci(raw, pen, prefer_pen, stack)
+    optimal_age, _, _ = _compute_optimal_age(raw, pen, prefer_pen, ages_y)
+
+    peaks: Tuple[float, ...] = ()
+    if bool(getattr(settings, "enable_ensemble_peak_picking", False)):
+        surface = str(getattr(settings, "catalogue_surface", CATALOGUE_SURFACE)).strip().upper()
+        surf = raw if surface == "RAW" else pen
+        rows = _build_global_catalogue_rows(
+            "",
+            "",
+            ages_ma,
+            surf.S_runs,
+            surf.Smed,
+            smf=smf,
+            merge_nearby=bool(getattr(settings, "merge_nearby_peaks", MERGE_NEARBY_PEAKS)),
+            pickable=surf.pickable,
+            optima_ma=surf.optima_ma,
+        )
+        peaks = tuple(sorted(float(row["age_ma"]) for row in rows))
+    return Checkpoint(len(stack), float(optimal_age), float(lower95), float(upper95), peaks)
+
+
+def _within(a: float, b: float, tol: float) -> bool:
+    if np.isnan(a) and np.isnan(b):
+        return True
+    return bool(abs(a - b) <= tol)
+
+
+def _agrees(prev: Checkpoint, cur: Checkpoint, step_y: float) -> bool:
+    """True if `cur` is within tolerance of `prev` on every summary statistic."""
+    if not _within(prev.optimal_age, cur.optimal_age, EARLY_STOP_AGE_TOL_STEPS * step_y):
+        return False
+    bounds_tol = EARLY_STOP_BOUNDS_TOL_STEPS * step_y
+    if not (_within(prev.lower95, cur.lower95, bounds_tol) and _within(prev.upper95, cur.upper95, bounds_tol)):
+        return False
+    if len(prev.peaks_ma) != len(cur.peaks_ma):
+        return False
+    peak_tol_ma = EARLY_STOP_PEAK_TOL_STEPS * step_y / 1e6
+    return all(_within(a, b, peak_tol_ma) for a, b in zip(prev.peaks_ma, cur.peaks_ma))
+
+
+class ConvergenceMonitor:
+    """Decides, checkpoint by checkpoint, whether sampling can stop."""
+
+    def __init__(
+        self,
+        settings,
+        check_every: int = EARLY_STOP_CHECK_EVERY,
+        min_runs: int = EARLY_STOP_MIN_RUNS,
+        patience: int = EARLY_STOP_PATIENCE,
+    ):
+        self.settings = settings
+        self.check_every = max(int(check_every), 1)
+        self.min_runs = max(int(min_runs), 1)
+        self.patience = max(int(patience), 1)
+        self.trace: List[Checkpoint] = []
+        self._stable = 0
+
+    def due(self, n_runs: int) -> bool:
+        return n_runs % self.check_every == 0
+
+    def update(self, stack: RunStack) -> bool:
+        """Record a checkpoint for the filled rows of `stack`; True once sampling may stop."""
+        cur = _checkpoint(self.settings, stack)
+        stable = bool(self.trace) and _agrees(self.trace[-1], cur, _step_from_grid(stack.ages_y))
+        self._stable = self._stable + 1 if stable else 0
+        self.trace.append(cur._replace(stable=stable))
+        return self._stable >= self.patience and cur.n_runs >= self.min_runs
+
+    def trace_text(self) -> str:
+        """Compact runlog form: `n:optimum[lower,upper]#peaks` (Ma), `*` marking stable checkpoints."""
+        return " ".join(
+            f"{c.n_runs}:{c.optimal_age / 1e6:.2f}[{c.lower95 / 1e6:.2f},{c.upper95 / 1e6:.2f}]"
+            f"#{len(c.peaks_ma)}{'*' if c.stable else ''}"
+            for c in self.trace
+        )
@@ -0,0 +1,98 @@
+"""Adaptive (coarse-to-fine) rim-age grid for CDC sampling.
+
+Runs are first evaluated on the user's coarse grid. Candidate optima and
+peaks of the coarse ensemble surface are then located, and only the coarse
+intervals around them are refined to the target spacing. The union of coarse
+and refined nodes is a non-uniform grid that the surface and catalogue stages
+consume like any other.
+"""
+
+from __future__ import annotations
+
+import warnings
+
+import numpy as np
+from scipy.signal import find_peaks
+
+from process.cdcConfig import (
+    ADAPTIVE_GRID_HALF_WIDTH_NODES,
+    ADAPTIVE_GRID_MAX_NODES,
+    PER_RUN_PROM_FRAC,
+)
+
+
+def _candidate_indices(stack, prefer_pen: bool) -> np.ndarray:
+    """Coarse-node indices of every run optimum (both surfaces) and of the median-curve peaks."""
+    centres = set()
+    for which in ("raw", "pen"):
+        idx = stack.optimal_indices(which)
+        centres.update(idx[idx >= 0].tolist())
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        S_med = np.nanmedian(stack.goodness("pen" if prefer_pen else "raw"), axis=0)
+    if np.isfinite(S_med).any():
+        S_med = np.where(np.isfinite(S_med), S_med, np.nanmin(S_med))
+        span = float(np.max(S_med) - np.min(S_med))
+        centres.add(int(np.argmax(S_med)))
+        if span > 0.0:
+            pk, _ = find_peaks(S_med, prominence=float(PER_RUN_PROM_FRAC) * span)
+            centres.update(pk.tolist())
+    return np.asarray(sorted(centres), int)
+
+
+def _refined_nodes(ages_y: np.ndarray, intervals, step_y: float) -> np.ndarray:
+    nodes = []
+    for lo, hi in intervals:
+        a, b = float(ages_y[lo]), float(ages_y[hi])
+        if np.max(np.diff(ages_y[lo:hi + 1])) <= step_y:
+            continue
+        n = int(np.ceil((b - a) / step_y))
+        nodes.append(np.linspace(a, b, n + 1))
+    if not nodes:
+        return np.array([], float)
+    fine = np.unique(np.concatenate(nodes))
+    # Drop nodes that coincide with the coarse grid.
+    pos = np.clip(np.searchsorted(ages_y, fine), 1, ages_y.size - 1)
+    nearest = np.minimum(np.abs(fine - ages_y[pos - 1]), np.abs(fine - ages_y[pos]))
+    return fine[nearest > 1e-6 * step_y]
+
+
+def _refinement_ages(
+    stack,
+    prefer_pen: bool,
+    target_step_y: float,
+    half_width_nodes: int = ADAPTIVE_GRID_HALF_WIDTH_NODES,
+    max_nodes: int = ADAPTIVE_GRID_MAX_NODES,
+) -> np.ndarray:
+    """
+    Rim ages (YEARS) to add to the coarse grid of `stack`.
+
+    Each candidate is widened to +/- `half_width_nodes` coarse nodes,
+    overlapping intervals are merged, and each interval is filled at
+    `target_step_y`. If that would add more than `max_nodes` nodes, the step
+    is widened until it does not.
+    """
+    ages_y = np.asarray(stack.ages_y, float)
+    n = ages_y.size
+    if n < 3 or len(stack) == 0 or not (target_step_y > 0.0):
+        return np.array([], float)
+
+    centres = _candidate_indices(stack, prefer_pen)
+    if centres.size == 0:
+        return np.array([], float)
+
+    h = max(int(half_width_nodes), 1)
+    intervals = []
+    for lo, hi in zip(np.clip(centres - h, 0, n - 1), np.clip(centres + h, 0, n - 1)):
+        if intervals and lo <= intervals[-1][1]:
+            intervals[-1][1] = max(intervals[-1][1], int(hi))
+        else:
+            intervals.append([int(lo), int(hi)])
+
+    step_y = float(target_step_y)
+    fine = _refined_nodes(ages_y, intervals, step_y)
+    while fine.size > max(int(max_nodes), 0):
+        step_y *= max(fine.size / max(int(max_nodes), 1), 1.1)
+        fine = _refined_nodes(ages_y, intervals, step_y)
+    return fine
@@ -12,6 +12,7 @@ from __future__ import annotations
 
 import numpy as np
 
+from model.monteCarloRun import MonteCarloRun
 from process.cdc.boundary import (
     _apply_boundary_dominance_guard,
     _inject_recent_boundary_mode,
@@ -101,7 +102,9 @@ def _apply_guards_and_fallbacks(
 
     for run in runs:
         run._heatmap_view_which = view_which
-        run.createHeatmapData(settings.minimumRimAge, settings.maximumRimAge, config.HEATMAP_RESOLUTION)
+    MonteCarloRun.createHeatmapDataForRuns(
+        runs, settings.minimumRimAge, settings.maximumRimAge, config.HEATMAP_RESOLUTION
+    )
 
     if rejected_rows:
         used = [False] * len(rows_for_ui)
@@ -2,15 +2,24 @@
 
 from __future__ import annotations
 
+import multiprocessing
+import os
 import platform
 import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from queue import Empty
 
 import numpy as np
 
 from model.monteCarloRun import MonteCarloRun
 from model.settings.calculation import DiscordanceClassificationMethod
 from process import calculations
-from process.cdc.state import ProgressType
+from process.cdc import cache, transport
+from process.cdc.convergence import ConvergenceMonitor
+from process.cdc.grid import _refinement_ages
+from process.cdc.state import RESULT_STATE, NodeStore, ProgressType, RunGridChanged, RunStack
 from process.cdc.surfaces import (
     _build_global_catalogue_rows,
     _build_surface_states,
@@ -18,6 +27,7 @@ from process.cdc.surfaces import (
     _compute_optimal_age,
     _compute_optimal_age_ci,
     _initialise_surface_view_state,
+    _surface_run_peaks,
 )
 from process.cdc.filtering import (
     _dedupe_rejected_rows,
@@ -27,12 +37,16 @@ from process.cdc.guards import _apply_guards_and_fallbacks
 from process.cdc.publish import (
     _publish_legacy_only,
     _publish_results,
+    finish_output_exports,
     reset_output_exports,
 )
 from process.cdcConfig import (
+    CDC_MC_WORKERS,
+    CDC_SAMPLE_WORKERS,
     CDC_WRITE_OUTPUTS,
     MERGE_NEARBY_PEAKS,
     FS_SUPPORT,
+    NODE_AGE_TOL_Y,
     TIMING_MODE,
 )
 from process.cdcDiagnostics import (
@@ -40,50 +54,195 @@ from process.cdcDiagnostics import (
     rss_mb as _rss_mb,
     write_runlog as _write_runlog,
 )
-from process.cdcTW import is_reverse_discordant as _is_reverse_discordant
+from process.cdcTW import reverse_discordant_flags as _reverse_discordant_flags
 from process.cdcUtils import infer_tier as _infer_tier, seed_from_name as _seed_from_name
 from utils import config
 
 TIME_PER_TASK = 0.0
+CLASSIFICATION_CHUNK = 4096
 
 
-def processSamples(signals, samples):
+def processSamples(signals, samples, workers=None):
     if CDC_WRITE_OUTPUTS:
         reset_output_exports()
 
-    for sample in samples:
-        completed, skip_reason = _processSample(signals, sample)
-        if not completed and skip_reason:
-            signals.skipped(sample.name, skip_reason)
+    workers = CDC_SAMPLE_WORKERS if workers is None else int(workers)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(samples))
 
+    if workers > 1:
+        _processSamplesConcurrently(signals, samples, workers)
+    else:
+        for sample in samples:
+            completed, skip_reason = _processSample(signals, sample)
+            if not completed and skip_reason:
+                signals.skipped(sample.name, skip_reason)
+
+    if CDC_WRITE_OUTPUTS:
+        finish_output_exports()
     signals.completed()
 
 
-def _processSample(signals, sample):
-    t0 = time.perf_counter()
+# Set in each sample worker process by _initSampleWorker.
+_sampleWorkerQueue = None
+_sampleWorkerHalt = None
+_sampleWorkerSharedRuns = False
+
+
+class _RelayedSignals:
+    """
+    Signals used inside a sample worker process.
+
+    Every call is queued, tagged with the sample's index, and replayed on the
+    caller's signals by the parent process.
+    """
+
+    def __init__(self, index, queue, halt, sharedRuns=False):
+        self._index = index
+        self._queue = queue
+        self._halt = halt
+        self.sharedRuns = sharedRuns
+
+    def _relay(self, name, args):
+        self._queue.put((self._index, name, args))
+
+    def newTask(self, *args):
+        self._relay("newTask", args)
+
+    def progress(self, *args):
+        self._relay("progress", args)
+
+    def cancelled(self, *args):
+        self._relay("cancelled", args)
+
+    def errored(self, *args):
+        self._relay("errored", args)
 
+    def skipped(self, *args):
+        self._relay("skipped", args)
+
+    def halt(self):
+        return self._halt.is_set()
+
+
+def _initSampleWorker(queue, halt, sharedRuns=False):
+    global _sampleWorkerQueue, _sampleWorkerHalt, _sampleWorkerSharedRuns
+    _sampleWorkerQueue, _sampleWorkerHalt, _sampleWorkerSharedRuns = queue, halt, sharedRuns
+
+
+def _processSampleInWorker(index, sample):
+    """Process one sample in a worker; returns (completed, skip_reason, sample)."""
     try:
-        completed, skip_reason = _calculateConcordantAges(signals, sample)
-        if not completed:
-            return False, skip_reason
+        completed, skip_reason = _processSample(
+            _RelayedSignals(index, _sampleWorkerQueue, _sampleWorkerHalt, _sampleWorkerSharedRuns), sample
+        )
+        return completed, skip_reason, sample
+    finally:
+        _sampleWorkerQueue.put((index, None, None))
 
-        completed, skip_reason = _performRimAgeSampling(signals, sample)
-        if not completed:
-            return False, skip_reason
 
-        return True, None
+def _estimatedSampleCost(sample):
+    settings = sample.calculationSettings
+    return len(sample.validSpots) * int(settings.monteCarloRuns) * settings.rimAgeCount()
+
+
+def _processSamplesConcurrently(signals, samples, workers):
+    """
+    Process samples on a pool of worker processes, largest estimated cost first.
+
+    Each sample's signals are replayed in input order, exactly as the serial
+    loop would emit them: the earliest unfinished sample streams live while
+    later samples are buffered until it completes. The results the pipeline set
+    on each processed sample are copied back onto the caller's sample objects.
+    """
+    queue = multiprocessing.Queue()
+    halt = multiprocessing.Event()
+    buffered = [[] for _ in samples]
+    finished = set()
+    futures = {}
+
+    order = sorted(range(len(samples)), key=lambda i: -_estimatedSampleCost(samples[i]))
+    transport.share_resource_tracker()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initSampleWorker,
+                             initargs=(queue, halt, bool(getattr(signals, "sharedRuns", False)))) as pool:
+        for i in order:
+            futures[i] = pool.submit(_processSampleInWorker, i, samples[i].createProcessingCopy())
+
+        head = 0
+        while head < len(samples):
+            if signals.halt():
+                halt.set()
+
+            try:
+                index, name, args = queue.get(timeout=0.05)
+            except Empty:
+                future = futures[head]
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+                continue
+
+            if name is None:
+                finished.add(index)
+            else:
+                buffered[index].append((name, args))
+
+            while head < len(samples):
+                for name, args in buffered[head]:
+                    getattr(signals, name)(*args)
+                buffered[head] = []
+                if head not in finished:
+                    break
+
+                completed, skip_reason, processed = futures.pop(head).result()
+                sample = samples[head]
+                # Results the pipeline stored on the sample itself; fields left unset
+                # in the worker are owned by the replayed signals.
+                for key in RESULT_STATE.intersection(vars(processed)):
+                    value = getattr(processed, key)
+                    if value is not None:
+                        setattr(sample, key, value)
+                if not completed and skip_reason:
+                    signals.skipped(sample.name, skip_reason)
+                head += 1
+
+
+def _processSample(signals, sample):
+    t0 = time.perf_counter()
+
+    try:
+        sampledWith = getattr(sample, "sampledWith", None)
+        if sample.monteCarloRuns and sample.calculationSettings.reusesRunsOf(sampledWith):
+            return _rebuildCatalogue(signals, sample)
+        if sample.monteCarloRuns and sample.calculationSettings.extendsRunsOf(sampledWith):
+            return _performRimAgeSampling(signals, sample, topUp=True)
+        if sample.monteCarloRuns and sample.calculationSettings.regridsRunsOf(sampledWith):
+            return _regridRuns(signals, sample)
+
+        resultCache = cache.default_cache(sample.calculationSettings)
+        if resultCache is not None:
+            key = cache.sample_key(sample, _seed_from_name(sample.name))
+            entry = resultCache.load(key)
+            if entry is not None:
+                sampleNameText = f" for '{sample.name}'" if sample.name else ""
+                signals.newTask("Restoring cached results" + sampleNameText + "...")
+                return cache.replay(signals, sample, entry)
+            signals = recorder = cache.RecordingSignals(signals)
+
+        completed, skip_reason = _processSampleUncached(signals, sample)
+        if resultCache is not None and not signals.halt():
+            resultCache.store(key, sample, recorder.messages, (completed, skip_reason))
+        return completed, skip_reason
 
     finally:
-        n_grid = len(sample.calculationSettings.rimAges())
-        R_runs = sample.calculationSettings.monteCarloRuns
         _write_runlog(
             dict(
                 method="CDC",
                 phase="e2e_runtime",
                 sample=sample.name,
                 tier=_infer_tier(sample.name),
-                R=R_runs,
-                n_grid=n_grid,
+                R=len(_retainedRuns(sample)) or sample.calculationSettings.monteCarloRuns,
+                n_grid=len(_rimAgeGrid(sample)),
                 elapsed_s=round(time.perf_counter() - t0, 3),
                 per_run_median_s="",
                 per_run_p95_s="",
@@ -94,6 +253,30 @@ def _processSample(signals, sample):
         )
 
 
+def _rebuildCatalogue(signals, sample):
+    """
+    Re-run only the surface and catalogue stages on the sample's retained runs,
+    for settings that differ from the sampling ones in catalogue fields alone.
+    """
+    sampleNameText = f" for '{sample.name}'" if sample.name else ""
+    signals.newTask("Rebuilding the peak catalogue" + sampleNameText + "...")
+    _calculateOptimalAge(signals, sample, 1.0)
+    sample.sampledWith = sample.calculationSettings
+    return True, None
+
+
+def _processSampleUncached(signals, sample):
+    completed, skip_reason = _calculateConcordantAges(signals, sample)
+    if not completed:
+        return False, skip_reason
+
+    completed, skip_reason = _performRimAgeSampling(signals, sample)
+    if not completed:
+        return False, skip_reason
+
+    return True, None
+
+
 def _calculateConcordantAges(signals, sample):
     """Classify each valid spot as concordant/discordant and flag reverse discordance."""
     sampleNameText = f" for '{sample.name}'" if sample.name else ""
@@ -103,34 +286,42 @@ def _calculateConcordantAges(signals, sample):
     n_spots = max(1, len(sample.validSpots))
     timePerRow = TIME_PER_TASK / n_spots
 
+    spots = sample.validSpots
+    uPb = np.array([s.uPbValue for s in spots], float)
+    uPbStDev = np.array([s.uPbStDev for s in spots], float)
+    pbPb = np.array([s.pbPbValue for s in spots], float)
+    pbPbStDev = np.array([s.pbPbStDev for s in spots], float)
+
     concordancy = []
     discordances = []
 
-    for i, spot in enumerate(sample.validSpots):
-        signals.progress(ProgressType.CONCORDANCE, i / n_spots)
-        time.sleep(timePerRow)
+    for start in range(0, len(spots), CLASSIFICATION_CHUNK):
+        stop = min(start + CLASSIFICATION_CHUNK, len(spots))
+        signals.progress(ProgressType.CONCORDANCE, start / n_spots)
+        time.sleep(timePerRow * (stop - start))
         if signals.halt():
             signals.cancelled()
             return False, "processing halted by user"
 
+        chunk = slice(start, stop)
         if settings.discordanceClassificationMethod == DiscordanceClassificationMethod.PERCENTAGE:
-            discordance = calculations.discordance(spot.uPbValue, spot.pbPbValue)
-            concordant = abs(discordance) < settings.discordancePercentageCutoff
+            discordance = calculations.discordances(uPb[chunk], pbPb[chunk])
+            concordant = np.abs(discordance) < settings.discordancePercentageCutoff
+            discordances.extend(float(d) for d in discordance)
         else:
-            discordance = None
-            concordant = calculations.isConcordantErrorEllipse(
-                spot.uPbValue,
-                spot.uPbStDev,
-                spot.pbPbValue,
-                spot.pbPbStDev,
+            concordant = calculations.areConcordantErrorEllipses(
+                uPb[chunk],
+                uPbStDev[chunk],
+                pbPb[chunk],
+                pbPbStDev[chunk],
                 settings.discordanceEllipseSigmas,
             )
+            discordances.extend([None] * (stop - start))
 
-        is_rev_geom = _is_reverse_discordant(spot.uPbValue, spot.pbPbValue)
-        spot.reverseDiscordant = bool(is_rev_geom and not concordant)
-
-        discordances.append(discordance)
-        concordancy.append(concordant)
+        is_rev_geom = _reverse_discordant_flags(uPb[chunk], pbPb[chunk])
+        for spot, conc, rev in zip(spots[chunk], concordant, is_rev_geom):
+            spot.reverseDiscordant = bool(rev and not conc)
+            concordancy.append(bool(conc))
 
     reverse_flags = [bool(s.reverseDiscordant) for s in sample.validSpots]
     sample.updateConcordance(concordancy, discordances, reverse_flags)
@@ -139,15 +330,116 @@ def _calculateConcordantAges(signals, sample):
 
 
 def _performSingleRun(settings, run):
-    for age in settings.rimAges():
-        run.samplePbLossAge(age, settings.dissimilarityTest, settings.penaliseInvalidAges)
+    run.samplePbLossAges(settings.rimAges(), settings.dissimilarityTest, settings.penaliseInvalidAges)
     run.calculateOptimalAge()
     run.createHeatmapData(settings.minimumRimAge, settings.maximumRimAge, config.HEATMAP_RESOLUTION)
 
 
-def _performRimAgeSampling(signals, sample):
-    """Run Monte Carlo sampling of Pb-loss ages for a single sample."""
-    sample.monteCarloRuns = []
+def _sampleRuns(settings, sample_name, first_run, concordantUPb, concordantPbPb, discordantUPb, discordantPbPb,
+                concordantAges):
+    """Create and evaluate a contiguous block of Monte Carlo runs; returns [(run, elapsed_s)]."""
+    out = []
+    for k in range(len(concordantUPb)):
+        t_run = time.perf_counter()
+        run = MonteCarloRun(
+            first_run + k,
+            sample_name,
+            concordantUPb[k],
+            concordantPbPb[k],
+            discordantUPb[k],
+            discordantPbPb[k],
+            settings=settings,
+            concordant_ages=concordantAges[k],
+        )
+        _performSingleRun(settings, run)
+        out.append((run, time.perf_counter() - t_run))
+    return out
+
+
+def _samplingWorkerCount(n_runs):
+    workers = int(CDC_MC_WORKERS)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, n_runs))
+
+
+def _iterSampledRuns(settings, sample_name, perturbed, workers, first_run=0):
+    """
+    Yield (run, elapsed_s) in run order, numbering runs from `first_run`.
+
+    With more than one worker, blocks of runs are evaluated on a process pool
+    and streamed back in order, keeping at most two blocks per worker in
+    flight. The perturbed values are drawn up front, so each run's result
+    does not depend on the worker count. Closing the generator cancels any
+    blocks that have not started.
+    """
+    n_runs = len(perturbed[0])
+    if workers <= 1:
+        for j in range(n_runs):
+            yield from _sampleRuns(settings, sample_name, first_run + j, *(v[j:j + 1] for v in perturbed))
+        return
+
+    chunk = max(1, n_runs // (4 * workers))
+    pending = deque()
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for start in range(0, n_runs, chunk):
+            stop = min(start + chunk, n_runs)
+            pending.append(pool.submit(
+                _sampleRuns, settings, sample_name, first_run + start, *(v[start:stop] for v in perturbed)
+            ))
+            while len(pending) > 2 * workers or (pending and pending[0].done()):
+                for run, elapsed in pending.popleft().result():
+                    run.settings = settings
+                    yield run, elapsed
+        while pending:
+            for run, elapsed in pending.popleft().result():
+                run.settings = settings
+                yield run, elapsed
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _perturbedValues(seed, first_run, n_runs, concordantSpots, discordantSpots):
+    """
+    Perturbed (U-Pb, Pb-Pb) values of the concordant and discordant spots for
+    runs first_run .. first_run + n_runs - 1, as (run × spot) arrays.
+
+    Every run draws from its own stream, spawned from the sample seed by run
+    index, so a run's values do not depend on how many runs are drawn.
+    """
+    spots = list(concordantSpots) + list(discordantSpots)
+    means = np.array([[s.uPbValue for s in spots], [s.pbPbValue for s in spots]], float)
+    stdevs = np.array([[s.uPbStDev for s in spots], [s.pbPbStDev for s in spots]], float)
+
+    draws = np.empty((n_runs,) + means.shape, float)
+    for k in range(n_runs):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(first_run + k,)))
+        draws[k] = rng.normal(means, stdevs)
+
+    nc = len(concordantSpots)
+    return draws[:, 0, :nc], draws[:, 1, :nc], draws[:, 0, nc:], draws[:, 1, nc:]
+
+
+def _retainedRuns(sample):
+    """The sample's runs in run order, each once."""
+    return list({id(run): run for run in sample.monteCarloRuns}.values())
+
+
+def _performRimAgeSampling(signals, sample, topUp=False):
+    """
+    Run Monte Carlo sampling of Pb-loss ages for a single sample.
+
+    With `topUp`, the sample's existing runs are kept as runs 0 .. n-1 and
+    only the runs from n up to the requested count are drawn and evaluated.
+    """
+    retained = _retainedRuns(sample) if topUp else []
+    sample.monteCarloRuns = list(retained)
+    sample.run_stack = None
+    sample.node_store = None
+    sample.rim_age_grid = None
+    sample.early_stopped_at = None
+    sample.sampledWith = None
     sample.peak_catalogue = []
     sample.rejected_peak_candidates = []
     sampleNameText = f" for '{sample.name}'" if sample.name else ""
@@ -172,46 +464,71 @@ def _performRimAgeSampling(signals, sample):
         return False, "fewer than 3 discordant spots"
 
     stabilitySamples = int(settings.monteCarloRuns)
-    rng = np.random.default_rng(_seed_from_name(sample.name))
+    firstRun = min(len(retained), stabilitySamples)
+    concordantUPbValues, concordantPbPbValues, discordantUPbValues, discordantPbPbValues = _perturbedValues(
+        _seed_from_name(sample.name), firstRun, stabilitySamples - firstRun, concordantSpots, discordantSpots
+    )
+
+    runBlock = _openRunStack(
+        signals, sample, settings.rimAges(), stabilitySamples, len(concordantSpots), len(discordantSpots)
+    )
+    # Retained runs are already on the receiving side; they only fill their rows.
+    for j, run in enumerate(retained[:firstRun]):
+        if runBlock is not None:
+            runBlock.write(j, run)
+        else:
+            sample.run_stack.append(run)
+
+    # Closest-point concordia ages of every perturbed concordant spot, solved for all runs at once.
+    concordantAges = calculations.concordant_ages(concordantUPbValues, concordantPbPbValues)
 
-    concordantUPbValues = np.stack([rng.normal(s.uPbValue, s.uPbStDev, stabilitySamples) for s in concordantSpots], axis=1)
-    concordantPbPbValues = np.stack([rng.normal(s.pbPbValue, s.pbPbStDev, stabilitySamples) for s in concordantSpots], axis=1)
-    discordantUPbValues = np.stack([rng.normal(s.uPbValue, s.uPbStDev, stabilitySamples) for s in discordantSpots], axis=1)
-    discordantPbPbValues = np.stack([rng.normal(s.pbPbValue, s.pbPbStDev, stabilitySamples) for s in discordantSpots], axis=1)
+    perturbed = (
+        concordantUPbValues,
+        concordantPbPbValues,
+        discordantUPbValues,
+        discordantPbPbValues,
+        concordantAges,
+    )
+    workers = _samplingWorkerCount(max(stabilitySamples - firstRun, 1))
+    monitor = ConvergenceMonitor(settings) if bool(getattr(settings, "earlyStopping", False)) else None
 
     per_run_times = []
     t0 = time.perf_counter()
-    for j in range(stabilitySamples):
+    with closing(_iterSampledRuns(settings, sample.name, perturbed, workers, firstRun)) as sampledRuns:
         if signals.halt():
             signals.cancelled()
             return False, "processing halted by user"
 
-        t_run = time.perf_counter()
-        run = MonteCarloRun(
-            j,
-            sample.name,
-            concordantUPbValues[j],
-            concordantPbPbValues[j],
-            discordantUPbValues[j],
-            discordantPbPbValues[j],
-            settings=settings,
-        )
-        _performSingleRun(settings, run)
-        per_run_times.append(time.perf_counter() - t_run)
+        for j, (run, elapsed) in enumerate(sampledRuns, start=firstRun):
+            if signals.halt():
+                signals.cancelled()
+                return False, "processing halted by user"
+
+            per_run_times.append(elapsed)
+
+            _publishRun(signals, sample, runBlock, j, run, (j + 1) / stabilitySamples)
 
-        progress = (j + 1) / stabilitySamples
-        sample.addMonteCarloRun(run)
-        signals.progress(ProgressType.SAMPLING, progress, sample.name, run)
+            n_done = j + 1
+            if monitor is not None and n_done < stabilitySamples and monitor.due(n_done):
+                if monitor.update(sample.run_stack):
+                    sample.early_stopped_at = n_done
+                    break
+
+    if bool(getattr(settings, "adaptiveRimAgeGrid", False)):
+        if not _refineRimAgeGrid(signals, sample, settings):
+            return False, "processing halted by user"
+        if sample.rim_age_grid is not None:
+            _republishRuns(signals, sample, _retainedRuns(sample))
 
     mc_elapsed = time.perf_counter() - t0
-    grid_len = len(settings.rimAges())
+    grid_len = len(_rimAgeGrid(sample))
     _write_runlog(
         dict(
             method="CDC",
             phase="MC",
             sample=sample.name,
             tier=_infer_tier(sample.name),
-            R=stabilitySamples,
+            R=len(sample.run_stack),
             n_grid=grid_len,
             elapsed_s=round(mc_elapsed, 3),
             per_run_median_s=round(float(np.median(per_run_times)), 4) if per_run_times else 0.0,
@@ -219,13 +536,165 @@ def _performRimAgeSampling(signals, sample):
             rss_peak_mb=round(_rss_mb(), 1),
             python=platform.python_version(),
             numpy=np.__version__,
+            R_requested=stabilitySamples,
+            convergence=monitor.trace_text() if monitor is not None else "",
+        )
+    )
+
+    sample.sampledWith = settings
+    _calculateOptimalAge(signals, sample, 1.0)
+    return True, None
+
+
+def _openRunStack(signals, sample, ages_y, n_runs, n_concordant, n_discordant):
+    """
+    Start the sample's run stack for `n_runs` runs over `ages_y`.
+
+    Over a process boundary, runs are written to a shared-memory block (which
+    is returned) and only row notifications are queued; otherwise each run
+    object is sent as is and None is returned.
+    """
+    if getattr(signals, "sharedRuns", False) and transport.available():
+        runBlock = transport.SharedRunBlock.create(
+            sample.name, ages_y, n_runs, n_concordant, n_discordant, config.HEATMAP_RESOLUTION
         )
+        sample.run_stack = runBlock.stack
+        signals.progress(ProgressType.SAMPLING, 0.0, sample.name, runBlock.handle)
+        return runBlock
+    sample.run_stack = RunStack(ages_y, n_runs)
+    return None
+
+
+def _publishRun(signals, sample, runBlock, j, run, progress):
+    """Add run `j` to the sample's stack and send it (or its row) on."""
+    if runBlock is not None:
+        runBlock.write(j, run)
+        payload = transport.RunRows(j, j + 1)
+    else:
+        sample.run_stack.append(run)
+        payload = run
+    sample.addMonteCarloRun(run)
+    signals.progress(ProgressType.SAMPLING, progress, sample.name, payload)
+
+
+def _republishRuns(signals, sample, runs):
+    """
+    Send `runs`, re-evaluated on the sample's rim-age grid, again in place of
+    the ones the receiver holds.
+    """
+    sample.monteCarloRuns = []
+    signals.progress(ProgressType.SAMPLING, 0.0, sample.name, RunGridChanged(sample.rim_age_grid))
+    runBlock = _openRunStack(
+        signals, sample, _rimAgeGrid(sample), len(runs), runs[0].concordant_uPb.size, runs[0].discordant_uPb.size
+    )
+    for j, run in enumerate(runs):
+        _publishRun(signals, sample, runBlock, j, run, (j + 1) / len(runs))
+
+
+def _evaluateMissingNodes(signals, settings, runs, store, ages_y):
+    """Evaluate every run at the ages in `ages_y` the store lacks; returns False if halted."""
+    missing = store.missing(ages_y)
+    if not missing.size:
+        return True
+    for run in runs:
+        if signals.halt():
+            signals.cancelled()
+            return False
+        run.samplePbLossAges(missing, settings.dissimilarityTest, settings.penaliseInvalidAges)
+    store.add(RunStack.from_runs(missing, runs))
+    return True
+
+
+def _regridRuns(signals, sample):
+    """
+    Re-evaluate the sample's retained runs on the settings' rim-age grid,
+    refined around the candidates of its surface if the grid is adaptive.
+
+    Grid nodes are looked up by age in the sample's node store; only ages not
+    evaluated before are computed. The runs are then republished and the
+    ensemble stage rebuilt.
+    """
+    sampleNameText = f" for '{sample.name}'" if sample.name else ""
+    signals.newTask("Re-evaluating the Pb-loss age grid" + sampleNameText + "...")
+
+    settings = sample.calculationSettings
+    runs = _retainedRuns(sample)
+    store = getattr(sample, "node_store", None)
+    if store is None or store.n_runs != len(runs):
+        store = NodeStore(len(runs), NODE_AGE_TOL_Y)
+    evaluated = getattr(sample, "rim_age_grid", None)
+    store.add(RunStack.from_runs(runs[0].rim_ages if evaluated is None else evaluated, runs))
+
+    grid = np.asarray(settings.rimAges(), float)
+    if not _evaluateMissingNodes(signals, settings, runs, store, grid):
+        return False, "processing halted by user"
+    stack = store.stack(grid)
+    sample.rim_age_grid = None
+    if bool(getattr(settings, "adaptiveRimAgeGrid", False)):
+        prefer_pen = bool(getattr(settings, "penaliseInvalidAges", False))
+        fine = _refinement_ages(stack, prefer_pen, float(getattr(settings, "adaptiveRimAgeStep", 0) or 0))
+        if fine.size:
+            grid = sample.rim_age_grid = np.union1d(grid, fine)
+            if not _evaluateMissingNodes(signals, settings, runs, store, grid):
+                return False, "processing halted by user"
+            stack = store.stack(grid)
+    sample.node_store = store
+    # The caller's sample keeps the store across re-grids, so later grids reuse these nodes too
+    signals.progress(ProgressType.SAMPLING, 0.0, sample.name, store)
+
+    for j, run in enumerate(runs):
+        run.rim_ages = grid
+        run.d_values = stack.D_raw[j]
+        run.p_values = stack.p[j]
+        run.scores = stack.D_pen[j]
+        run.invalid_counts = stack.invalid[j]
+        run._age_index = None
+        run.calculateOptimalAge()
+    MonteCarloRun.createHeatmapDataForRuns(
+        runs, settings.minimumRimAge, settings.maximumRimAge, config.HEATMAP_RESOLUTION
     )
+    _republishRuns(signals, sample, runs)
 
+    sample.sampledWith = settings
     _calculateOptimalAge(signals, sample, 1.0)
     return True, None
 
 
+def _rimAgeGrid(sample):
+    """Rim ages (YEARS) the sample's runs were evaluated on."""
+    grid = getattr(sample, "rim_age_grid", None)
+    if grid is None:
+        grid = sample.calculationSettings.rimAges()
+    return np.asarray(grid, float)
+
+
+def _refineRimAgeGrid(signals, sample, settings):
+    """
+    Evaluate every run on refined nodes around the candidate optima and peaks
+    of the coarse ensemble surface; the union becomes the sample's grid. The
+    caller republishes the runs. Returns False if halted.
+    """
+    prefer_pen = bool(getattr(settings, "penaliseInvalidAges", False))
+    step_y = float(getattr(settings, "adaptiveRimAgeStep", 0) or 0)
+    fine = _refinement_ages(sample.run_stack, prefer_pen, step_y)
+    if fine.size == 0:
+        return True
+
+    runs = _retainedRuns(sample)
+    for run in runs:
+        if signals.halt():
+            signals.cancelled()
+            return False
+        run.samplePbLossAges(fine, settings.dissimilarityTest, settings.penaliseInvalidAges)
+        run.calculateOptimalAge()
+    MonteCarloRun.createHeatmapDataForRuns(
+        runs, settings.minimumRimAge, settings.maximumRimAge, config.HEATMAP_RESOLUTION
+    )
+
+    sample.rim_age_grid = np.union1d(sample.run_stack.ages_y, fine)
+    return True
+
+
 def _calculateOptimalAge(signals, sample, progress):
     """Build the legacy single-age summary and the ensemble peak catalogue."""
     settings, runs = sample.calculationSettings, sample.monteCarloRuns
@@ -239,15 +708,18 @@ def _calculateOptimalAge(signals, sample, progress):
     prefer_pen = bool(getattr(settings, "penaliseInvalidAges", False))
     primary_which = "pen" if prefer_pen else "raw"
 
-    ages_y = np.asarray(settings.rimAges(), float)
+    ages_y = _rimAgeGrid(sample)
     ages_ma = ages_y / 1e6
-    smf, raw, pen = _build_surface_states(settings, runs, ages_y, ages_ma, abstain_on_monotonic)
+    stack = getattr(sample, "run_stack", None)
+    if stack is None or len(stack) != len(runs) or not np.array_equal(stack.ages_y, ages_y):
+        stack = sample.run_stack = RunStack.from_runs(ages_y, runs)
+    smf, raw, pen = _build_surface_states(settings, stack, ages_ma, abstain_on_monotonic)
     ui_surface, S_view = _initialise_surface_view_state(sample, settings, raw, pen, primary_which)
 
-    lower95, upper95, opt_all = _compute_optimal_age_ci(raw, pen, prefer_pen, runs)
+    lower95, upper95, opt_all = _compute_optimal_age_ci(raw, pen, prefer_pen, stack)
     optimalAge, S_optimal_curve, mean_primary = _compute_optimal_age(raw, pen, prefer_pen, ages_y)
     sample.legacy_surface_optimal_age = optimalAge
-    meanD, meanP, meanInv, meanSc = _compute_mean_stats(runs, primary_which, prefer_pen)
+    meanD, meanP, meanInv, meanSc = _compute_mean_stats(stack, primary_which, prefer_pen)
 
     if not bool(getattr(settings, "enable_ensemble_peak_picking", False)):
         _publish_legacy_only(
@@ -255,7 +727,7 @@ def _calculateOptimalAge(signals, sample, progress):
             sample,
             progress,
             settings,
-            runs,
+            stack,
             ages_ma,
             ages_y,
             S_optimal_curve,
@@ -271,6 +743,11 @@ def _calculateOptimalAge(signals, sample, progress):
         )
         return
 
+    # Per-run peaks are detected once per surface and shared with the runs.
+    for surf in (raw, pen):
+        surf.run_peaks = _surface_run_peaks(ages_ma, surf.S_runs)
+    MonteCarloRun.setPeaksForRuns(runs, raw.run_peaks, pen.run_peaks)
+
     for surf in (raw, pen):
         surf.rows = _build_global_catalogue_rows(
             sample.name,
@@ -283,6 +760,7 @@ def _calculateOptimalAge(signals, sample, progress):
             pickable=surf.pickable,
             optima_ma=surf.optima_ma,
             diagnostic_rows=surf.rejected,
+            run_peaks=surf.run_peaks,
         )
 
     if (not raw.rows) and (not pen.rows) and len(opt_all) > 0:
@@ -341,7 +819,7 @@ def _calculateOptimalAge(signals, sample, progress):
         sample,
         progress,
         settings,
-        runs,
+        stack,
         raw,
         pen,
         rows_for_ui,
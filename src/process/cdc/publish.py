@@ -19,12 +19,15 @@ from process.cdcConfig import (
     CATALOGUE_CSV_RAW,
     CDC_WRITE_OUTPUTS,
     KS_EXPORT_ROOT,
+    RUN_FIELDS,
     RUNLOG,
 )
 from process.cdcDiagnostics import (
     append_catalogue_rows as _append_catalogue_rows,
     export_legacy_ks as _export_legacy_ks,
+    finish_surface_store as _finish_surface_store,
     reset_csv as _reset_csv,
+    reset_surface_store as _reset_surface_store,
     write_npz_diagnostics as _write_npz_diagnostics,
 )
 from utils.peakHelpers import fmt_peak_stats
@@ -42,10 +45,15 @@ def reset_output_exports():
         CATALOGUE_CSV_RAW,
         "sample,peak_no,age_ma,ci_low,ci_high,support,support_low,support_high,stability_low,stability_high,age_mode,ci_method,ci_interpretation,stability_method",
     )
-    _reset_csv(
-        RUNLOG,
-        "method,phase,sample,tier,R,n_grid,elapsed_s,per_run_median_s,per_run_p95_s,rss_peak_mb,python,numpy",
-    )
+    _reset_csv(RUNLOG, ",".join(RUN_FIELDS))
+    _reset_surface_store()
+
+
+def finish_output_exports():
+    """Finalise batch-level outputs (the surface store index) when writing is enabled."""
+    if not CDC_WRITE_OUTPUTS:
+        return
+    _finish_surface_store()
 
 
 def _emit_summedKS(signals, sample, progress, ages_ma, y_curve, rows_for_ui):
@@ -114,7 +122,7 @@ def _public_interval_rows(rows: List[Dict]) -> List[Dict]:
 
 
 def _publish_legacy_only(
-    signals, sample, progress, settings, runs, ages_ma, ages_y,
+    signals, sample, progress, settings, stack, ages_ma, ages_y,
     S_optimal_curve, optimalAge, lower95, upper95, opt_all,
     meanD, meanP, meanInv, meanSc, mean_primary,
 ):
@@ -126,7 +134,7 @@ def _publish_legacy_only(
         _export_legacy_ks(
             sample,
             settings,
-            runs,
+            stack,
             ages_y,
             D_pen=mean_primary,
             ui_opt_years=optimalAge,
@@ -144,7 +152,7 @@ def _publish_legacy_only(
 
 
 def _publish_results(
-    signals, sample, progress, settings, runs, raw, pen,
+    signals, sample, progress, settings, stack, raw, pen,
     rows_for_ui, rejected_rows, ages_ma, ages_y, S_view,
     optimalAge, lower95, upper95, opt_all,
     meanD, meanP, meanInv, meanSc,
@@ -165,7 +173,7 @@ def _publish_results(
             sample_name=sample.name,
             ages_ma=ages_ma,
             ages_y=ages_y,
-            runs=runs,
+            run_stack=stack,
             S_runs_raw=raw.S_runs,
             S_runs_pen=pen.S_runs,
             Smed_raw=raw.Smed,
@@ -222,7 +230,7 @@ def _publish_results(
         _export_legacy_ks(
             sample,
             settings,
-            runs,
+            stack,
             ages_y,
             ui_opt_years=optimalAge,
             ui_low95_years=lower95,
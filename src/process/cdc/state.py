@@ -2,10 +2,45 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Dict, List
+from typing import Dict, List, Optional
 
 import numpy as np
 
+from process.ensemble_internal.curve import RunPeaks
+
+
+# Sample attributes that make up its results. A cache hit restores these and a
+# sample worker copies back these and nothing else: spots, their
+# classification and the caller's settings stay untouched.
+RESULT_STATE = frozenset({
+    "monteCarloRuns",
+    "run_stack",
+    "rim_age_grid",
+    "early_stopped_at",
+    "sampledWith",
+    "node_store",
+    "optimalAge",
+    "optimalAgeLowerBound",
+    "optimalAgeUpperBound",
+    "optimalAgeDValue",
+    "optimalAgePValue",
+    "optimalAgeNumberOfInvalidPoints",
+    "optimalAgeScore",
+    "_peak_catalogue",
+    "rejected_peak_candidates",
+    "peak_uncertainty_str",
+    "summedKS_ages_Ma",
+    "summedKS_goodness",
+    "summedKS_peaks_Ma",
+    "summedKS_ci_low_Ma",
+    "summedKS_ci_high_Ma",
+    "ensemble_abstain_reason",
+    "ensemble_surface_flags",
+    "legacy_surface_optimal_age",
+    "display_heatmap_ages_ma",
+    "display_heatmap_runs_S",
+})
+
 
 class ProgressType(Enum):
     CONCORDANCE = 0
@@ -25,4 +60,241 @@ class SurfaceState:
     optima_ma: np.ndarray
     rows: List[Dict] = field(default_factory=list)
     rejected: List[Dict] = field(default_factory=list)
+    run_peaks: Optional[RunPeaks] = None
+
+
+@dataclass
+class RunGridChanged:
+    """
+    Sent ahead of a sample's runs when they are sent again after being
+    re-evaluated: the receiver drops the runs it holds. `rim_age_grid` is the
+    grid the runs now cover (None: the settings grid).
+    """
+
+    rim_age_grid: Optional[np.ndarray] = None
+
+
+
+def _plateau_optimal_indices(values: np.ndarray) -> np.ndarray:
+    """
+    Row-wise plateau-aware argmin, matching `surfaces._findOptimalIndex`.
+
+    Rows with no finite value return -1.
+    """
+    vals = np.where(np.isfinite(values), values, np.inf)
+    n_rows, n = vals.shape
+    out = np.full(n_rows, -1, dtype=np.intp)
+    if n == 0:
+        return out
+
+    first = np.argmin(vals, axis=1)
+    min_vals = vals[np.arange(n_rows), first]
+    eq = vals == min_vals[:, None]
+
+    # The plateau is the contiguous run of minima that starts at the first minimum.
+    idx = np.arange(n)
+    after = (idx[None, :] > first[:, None]) & ~eq
+    end = np.where(after.any(axis=1), np.argmax(after, axis=1) - 1, n - 1)
+    start = first
+
+    interior = ((end != n - 1) & (start != 0)) | ((end == n - 1) & (start == 0))
+    chosen = np.where(interior, (start + end) // 2, np.where(start == 0, 0, n - 1))
+    ok = np.isfinite(min_vals)
+    out[ok] = chosen[ok]
+    return out
+
+
+class RunStack:
+    """
+    Run × grid matrices for one sample's Monte Carlo runs.
+
+    The sampling loop appends each run as one row; downstream stages read
+    slices of the filled rows instead of walking per-run statistics maps.
+    """
+
+    __slots__ = ("ages_y", "D_raw", "D_pen", "p", "invalid", "run_optima_y", "n_runs")
+
+    def __init__(self, ages_y, capacity: int):
+        self.ages_y = np.asarray(ages_y, float)
+        shape = (max(int(capacity), 0), self.ages_y.size)
+        self.D_raw = np.full(shape, np.nan, float)
+        self.D_pen = np.full(shape, np.nan, float)
+        self.p = np.full(shape, np.nan, float)
+        self.invalid = np.zeros(shape, np.int32)
+        # Optimum each run reported for itself (follows the run's primary channel).
+        self.run_optima_y = np.full(shape[0], np.nan, float)
+        self.n_runs = 0
+
+    @classmethod
+    def over(cls, ages_y, D_raw, D_pen, p, invalid, run_optima_y) -> "RunStack":
+        """Empty stack writing into caller-owned arrays (e.g. a shared-memory block)."""
+        stack = cls.__new__(cls)
+        stack.ages_y = ages_y
+        stack.D_raw, stack.D_pen, stack.p = D_raw, D_pen, p
+        stack.invalid = invalid
+        stack.run_optima_y = run_optima_y
+        stack.n_runs = 0
+        return stack
+
+    @classmethod
+    def from_runs(cls, ages_y, runs) -> "RunStack":
+        stack = cls(ages_y, len(runs))
+        for run in runs:
+            stack.append(run)
+        return stack
+
+    def __len__(self) -> int:
+        return self.n_runs
+
+    @property
+    def ages_ma(self) -> np.ndarray:
+        return self.ages_y / 1e6
+
+    def _grow(self, capacity: int) -> None:
+        extra = capacity - self.D_raw.shape[0]
+        pad = ((0, extra), (0, 0))
+        self.D_raw = np.pad(self.D_raw, pad, constant_values=np.nan)
+        self.D_pen = np.pad(self.D_pen, pad, constant_values=np.nan)
+        self.p = np.pad(self.p, pad, constant_values=np.nan)
+        self.invalid = np.pad(self.invalid, pad)
+        self.run_optima_y = np.pad(self.run_optima_y, (0, extra), constant_values=np.nan)
+
+    def append(self, run) -> None:
+        """Copy one run's per-node arrays into the next row."""
+        i = self.n_runs
+        if i >= self.D_raw.shape[0]:
+            self._grow(max(1, 2 * self.D_raw.shape[0]))
+
+        run_ages = np.asarray(run.rim_ages, float)
+        if run_ages.shape == self.ages_y.shape and np.array_equal(run_ages, self.ages_y):
+            cols = slice(None)
+            src = slice(None)
+        elif run_ages.size:
+            # Align on exact age matches; grid nodes the run did not sample stay NaN.
+            pos = np.minimum(np.searchsorted(run_ages, self.ages_y), run_ages.size - 1)
+            hit = run_ages[pos] == self.ages_y
+            cols = np.flatnonzero(hit)
+            src = pos[hit]
+        else:
+            cols = src = np.array([], np.intp)
+
+        self.D_raw[i, cols] = run.d_values[src]
+        self.D_pen[i, cols] = run.scores[src]
+        self.p[i, cols] = run.p_values[src]
+        self.invalid[i, cols] = run.invalid_counts[src]
+        opt = getattr(run, "optimal_pb_loss_age", None)
+        self.run_optima_y[i] = float(opt) if opt is not None else np.nan
+        self.n_runs = i + 1
+
+    def D(self, which: str = "pen") -> np.ndarray:
+        """Filled rows of the raw KS D (`which="raw"`) or penalised score matrix."""
+        return (self.D_raw if which == "raw" else self.D_pen)[: self.n_runs]
+
+    def goodness(self, which: str = "pen") -> np.ndarray:
+        """Run-wise CDC goodness curves (`1 - D`) for the filled rows."""
+        return 1.0 - self.D(which)
+
+    def optimal_indices(self, which: str = "pen") -> np.ndarray:
+        """Grid index of each run's plateau-aware optimum (-1 if none)."""
+        return _plateau_optimal_indices(self.D(which))
+
+    def optima_ma(self, which: str = "pen") -> np.ndarray:
+        """Each run's optimum age (Ma) on the `which` surface; NaN if undefined."""
+        idx = self.optimal_indices(which)
+        out = np.full(idx.size, np.nan, float)
+        ok = idx >= 0
+        out[ok] = self.ages_y[idx[ok]] / 1e6
+        return out
+
+    def first_argmin_optima_y(self, which: str = "pen") -> np.ndarray:
+        """Each run's first-minimum age (years), ignoring plateaus."""
+        d = self.D(which)
+        if d.size == 0:
+            return np.full(d.shape[0], np.nan, float)
+        d = np.where(np.isfinite(d), d, np.inf)
+        return self.ages_y[np.argmin(d, axis=1)]
+
+    def at_optima(self, which: str = "pen"):
+        """
+        Per-run (D_raw, p, invalid, D_pen) at each run's `which` optimum,
+        restricted to runs that have one.
+        """
+        idx = self.optimal_indices(which)
+        rows = np.flatnonzero(idx >= 0)
+        cols = idx[rows]
+        return (
+            self.D_raw[rows, cols],
+            self.p[rows, cols],
+            self.invalid[rows, cols],
+            self.D_pen[rows, cols],
+        )
+
+
+class NodeStore:
+    """
+    Per-run results at every rim age a sample's runs have been evaluated at.
+
+    Nodes are keyed by absolute age (YEARS); ages within `tol_y` of each other
+    are the same node. A new grid is served from stored nodes, so only the
+    ages not evaluated before need computing.
+    """
+
+    __slots__ = ("ages_y", "D_raw", "D_pen", "p", "invalid", "tol_y")
+
+    def __init__(self, n_runs: int, tol_y: float):
+        self.ages_y = np.array([], float)
+        shape = (max(int(n_runs), 0), 0)
+        self.D_raw = np.empty(shape, float)
+        self.D_pen = np.empty(shape, float)
+        self.p = np.empty(shape, float)
+        self.invalid = np.empty(shape, np.int32)
+        self.tol_y = float(tol_y)
+
+    @property
+    def n_runs(self) -> int:
+        return self.D_raw.shape[0]
+
+    def _lookup(self, ages_y):
+        """Column of the stored node matching each age, and whether there is one."""
+        ages_y = np.asarray(ages_y, float)
+        if self.ages_y.size == 0:
+            return np.zeros(ages_y.size, np.intp), np.zeros(ages_y.size, bool)
+        pos = np.clip(np.searchsorted(self.ages_y, ages_y), 1, max(self.ages_y.size - 1, 1))
+        lo = np.minimum(pos - 1, self.ages_y.size - 1)
+        hi = np.minimum(pos, self.ages_y.size - 1)
+        nearest = np.where(np.abs(self.ages_y[lo] - ages_y) <= np.abs(self.ages_y[hi] - ages_y), lo, hi)
+        return nearest, np.abs(self.ages_y[nearest] - ages_y) <= self.tol_y
+
+    def missing(self, ages_y) -> np.ndarray:
+        """The ages with no stored node."""
+        ages_y = np.asarray(ages_y, float)
+        return ages_y[~self._lookup(ages_y)[1]]
+
+    def add(self, stack: "RunStack") -> None:
+        """Store the filled rows of `stack` at the nodes not stored yet."""
+        if len(stack) != self.n_runs:
+            raise ValueError(f"stack has {len(stack)} runs, store has {self.n_runs}")
+        new = ~self._lookup(stack.ages_y)[1]
+        ages = np.concatenate([self.ages_y, stack.ages_y[new]])
+        order = np.argsort(ages, kind="stable")
+        self.ages_y = ages[order]
+        for name in ("D_raw", "D_pen", "p", "invalid"):
+            merged = np.concatenate([getattr(self, name), getattr(stack, name)[: len(stack), new]], axis=1)
+            setattr(self, name, merged[:, order])
 
+    def stack(self, ages_y) -> "RunStack":
+        """A full RunStack over `ages_y`, every age of which must be stored."""
+        ages_y = np.asarray(ages_y, float)
+        cols, hit = self._lookup(ages_y)
+        if not hit.all():
+            raise KeyError(f"{int((~hit).sum())} rim ages have not been evaluated")
+        stack = RunStack.over(
+            ages_y,
+            self.D_raw[:, cols],
+            self.D_pen[:, cols],
+            self.p[:, cols],
+            self.invalid[:, cols],
+            np.full(self.n_runs, np.nan, float),
+        )
+        stack.n_runs = self.n_runs
+        return stack
@@ -21,8 +21,8 @@ from process.cdcConfig import (
     FV_VALLEY_FRAC,
     SMOOTH_FRAC,
 )
-from process.cdc.state import SurfaceState
-from process.ensemble import build_ensemble_catalogue, robust_ensemble_curve
+from process.cdc.state import RunStack, SurfaceState
+from process.ensemble import RunPeaks, build_ensemble_catalogue, per_run_peaks_batch, robust_ensemble_curve
 def _findOptimalIndex(valuesToCompare):
     """
     Select the best index with the published plateau-aware tie handling.
@@ -79,94 +79,16 @@ def _is_effectively_monotonic(y_curve, delta):
     return turns <= int(MONO_MAX_TURNS)
 
 
-def _raw_optimum_age_ma(run) -> float:
-    """
-    Return the per-run RAW optimum age (Ma) from `_raw_statistics_by_pb_loss_age`.
-
-    Falls back to the penalised optimum if RAW data are unavailable.
-    """
-    stats_map = getattr(run, "_raw_statistics_by_pb_loss_age", None)
-    if isinstance(stats_map, dict) and stats_map:
-        ages = np.array(sorted(stats_map.keys()), float)
-        dvals = np.array([stats_map[a].test_statistics[0] for a in ages], float)
-        finite = np.isfinite(dvals)
-        if finite.any():
-            vals = np.where(finite, dvals, np.inf)
-            idx = _findOptimalIndex(vals.tolist())
-            return float(ages[idx] / 1e6)
-    return float(getattr(run, "optimal_pb_loss_age", np.nan) / 1e6)
-
-
-def _stack_goodness_from_stats_attr(runs, ages_y, stats_attr: str, which: str = "pen") -> np.ndarray:
-    """
-    Stack run-wise CDC goodness curves onto a common age grid.
-
-    `which="pen"` maps to the penalised score (`1 - score`).
-    `which="raw"` maps to the unpenalised KS goodness (`1 - D`).
-    """
-    ages_y = np.asarray(ages_y, float)
-    out = np.full((len(runs), ages_y.size), np.nan, float)
-    for i, run in enumerate(runs):
-        stats_map = getattr(run, stats_attr, None)
-        if not isinstance(stats_map, dict) or not stats_map:
-            stats_map = getattr(run, "statistics_by_pb_loss_age", None)
-        if not isinstance(stats_map, dict) or not stats_map:
-            continue
-        if which == "raw":
-            vals = np.array([1.0 - stats_map[float(a)].test_statistics[0] for a in ages_y], float)
-        else:
-            vals = np.array([1.0 - stats_map[float(a)].score for a in ages_y], float)
-        out[i, :] = vals
-    return out
-
-
-def _optimum_age_ma_from_stats_attr(run, stats_attr: str, which: str = "pen") -> float:
-    """
-    Return one run's optimum age (Ma) from a stats map attribute.
-
-    `which="pen"` uses the penalised score surface.
-    `which="raw"` uses the unpenalised KS D surface.
-    """
-    stats_map = getattr(run, stats_attr, None)
-    if not isinstance(stats_map, dict) or not stats_map:
-        stats_map = getattr(run, "statistics_by_pb_loss_age", None)
-    if not isinstance(stats_map, dict) or not stats_map:
-        return float("nan")
-    ages = np.array(sorted(stats_map.keys()), float)
-    if ages.size == 0:
-        return float("nan")
-    if which == "raw":
-        vals = np.array([stats_map[a].test_statistics[0] for a in ages], float)
-    else:
-        vals = np.array([stats_map[a].score for a in ages], float)
-    vals = np.where(np.isfinite(vals), vals, np.inf)
-    if not np.isfinite(vals).any():
-        return float("nan")
-    idx = _findOptimalIndex(vals.tolist())
-    return float(ages[idx] / 1e6)
-
-
-def _optimum_stat_from_stats_attr(run, stats_attr: str, which: str = "pen"):
-    """
-    Return the stats object at a run's optimum age from a stats map attribute.
-    """
-    stats_map = getattr(run, stats_attr, None)
-    if not isinstance(stats_map, dict) or not stats_map:
-        stats_map = getattr(run, "statistics_by_pb_loss_age", None)
-    if not isinstance(stats_map, dict) or not stats_map:
-        return None
-    ages = np.array(sorted(stats_map.keys()), float)
-    if ages.size == 0:
-        return None
-    if which == "raw":
-        vals = np.array([stats_map[a].test_statistics[0] for a in ages], float)
-    else:
-        vals = np.array([stats_map[a].score for a in ages], float)
-    vals = np.where(np.isfinite(vals), vals, np.inf)
-    if not np.isfinite(vals).any():
-        return None
-    idx = _findOptimalIndex(vals.tolist())
-    return stats_map[float(ages[idx])]
+def _surface_run_peaks(ages_ma: np.ndarray, S_runs: np.ndarray) -> RunPeaks:
+    """Per-run peaks of one global surface under the configured per-run gates."""
+    return per_run_peaks_batch(
+        ages_ma,
+        S_runs,
+        prom_frac=PER_RUN_PROM_FRAC,
+        min_dist=PER_RUN_MIN_DIST,
+        min_width_nodes=PER_RUN_MIN_WIDTH,
+        require_full_prom=False,
+    )
 
 
 def _build_global_catalogue_rows(
@@ -181,6 +103,7 @@ def _build_global_catalogue_rows(
     pickable: bool,
     optima_ma: np.ndarray,
     diagnostic_rows: Optional[List[Dict]] = None,
+    run_peaks: Optional[RunPeaks] = None,
 ):
     """Build ensemble rows for one global surface (raw or penalised)."""
     if (not pickable) or (Smed.size == 0):
@@ -208,6 +131,7 @@ def _build_global_catalogue_rows(
         per_run_require_full_prom=False,
         height_frac=0.0,
         optima_ma=optima_ma,
+        per_run_peaks_list=run_peaks,
         merge_per_hump=merge_nearby,
         merge_shoulders=merge_nearby,
         diagnostic_rows=diag_rows,
@@ -218,17 +142,14 @@ def _build_global_catalogue_rows(
     return rows
 
 
-def _compute_optimal_age_ci(raw, pen, prefer_pen, runs):
+def _compute_optimal_age_ci(raw, pen, prefer_pen, stack: RunStack):
     """
     Empirical 2.5/97.5 percentile stability interval for the optimal Pb-loss age.
     """
     optima_ma_primary = pen.optima_ma if prefer_pen else raw.optima_ma
     opt_all = np.sort(np.asarray(optima_ma_primary[np.isfinite(optima_ma_primary)] * 1e6, float))
     if opt_all.size == 0:
-        if prefer_pen:
-            opt_all = np.sort(np.asarray([r.optimal_pb_loss_age for r in runs], float))
-        else:
-            opt_all = np.sort(np.asarray([_raw_optimum_age_ma(r) * 1e6 for r in runs], float))
+        opt_all = np.sort(stack.run_optima_y[: len(stack)])
     n = opt_all.size
     if n:
         lower95 = float(opt_all[int(np.floor(0.025 * n))])
@@ -259,41 +180,32 @@ def _compute_optimal_age(raw, pen, prefer_pen, ages_y):
     return optimalAge, S_optimal_curve, mean_primary
 
 
-def _compute_mean_stats(runs, primary_which, prefer_pen):
+def _compute_mean_stats(stack: RunStack, primary_which, prefer_pen):
     """Mean D, p-value, invalid count and score at each run's own optimum."""
-    stats = [_optimum_stat_from_stats_attr(r, "_all_statistics_by_pb_loss_age", which=primary_which) for r in runs]
-    stats = [s for s in stats if s is not None]
-    if stats:
-        meanD = float(np.mean([s.test_statistics[0] for s in stats]))
-        pvals = np.asarray([s.test_statistics[1] for s in stats], float)
+    d_raw, pvals, invalid, d_pen = stack.at_optima(primary_which)
+    if d_raw.size:
+        meanD = float(np.mean(d_raw))
         p_ok = np.isfinite(pvals)
         meanP = float(np.mean(pvals[p_ok])) if np.any(p_ok) else float("nan")
-        meanInv = float(np.mean([s.number_of_invalid_ages for s in stats]))
-        if prefer_pen:
-            meanSc = float(np.mean([s.score for s in stats]))
-        else:
-            meanSc = float(np.mean([s.test_statistics[0] for s in stats]))
+        meanInv = float(np.mean(invalid))
+        meanSc = float(np.mean(d_pen if prefer_pen else d_raw))
     else:
         meanD = meanP = meanInv = meanSc = float("nan")
     return meanD, meanP, meanInv, meanSc
 
 
-def _build_surface_states(settings, runs, ages_y, ages_ma, abstain_on_monotonic):
+def _build_surface_states(settings, stack: RunStack, ages_ma, abstain_on_monotonic):
     """Build raw and penalised global surface states from the run stack."""
     smf = _smooth_frac_for_grid(ages_ma)
 
-    optima_raw = np.array(
-        [_optimum_age_ma_from_stats_attr(r, "_all_statistics_by_pb_loss_age", which="raw") for r in runs], float,
-    )
-    S_runs_raw = _stack_goodness_from_stats_attr(runs, ages_y, "_all_statistics_by_pb_loss_age", which="raw")
-    Smed_raw, Delta_raw, _ = robust_ensemble_curve(S_runs_raw, smooth_frac=smf)
+    optima_raw = stack.optima_ma("raw")
+    S_runs_raw = stack.goodness("raw")
+    Smed_raw, Delta_raw, _ = robust_ensemble_curve(S_runs_raw, smooth_frac=smf, age_grid=ages_ma)
     mono_raw = _is_effectively_monotonic(Smed_raw, Delta_raw)
 
-    optima_pen = np.array(
-        [_optimum_age_ma_from_stats_attr(r, "_all_statistics_by_pb_loss_age", which="pen") for r in runs], float,
-    )
-    S_runs_pen = _stack_goodness_from_stats_attr(runs, ages_y, "_all_statistics_by_pb_loss_age", which="pen")
-    Smed_pen, Delta_pen, _ = robust_ensemble_curve(S_runs_pen, smooth_frac=smf)
+    optima_pen = stack.optima_ma("pen")
+    S_runs_pen = stack.goodness("pen")
+    Smed_pen, Delta_pen, _ = robust_ensemble_curve(S_runs_pen, smooth_frac=smf, age_grid=ages_ma)
     mono_pen = _is_effectively_monotonic(Smed_pen, Delta_pen)
 
     raw = SurfaceState(
@@ -0,0 +1,203 @@
+"""
+Shared-memory transport of Monte Carlo runs out of the processing process.
+
+The sampling loop lays one sample's runs out as (R × ...) arrays in a single
+`multiprocessing.shared_memory` block and fills a row per finished run. Only
+a small handle (once) and `RunRows` notifications go through the signal
+queue; the receiving process attaches the block and builds each run over
+zero-copy row views.
+
+The block stays registered with the resource tracker the worker shares
+with the receiving process until the receiver has attached it and unlinked
+its name. A block that is never received (its worker crashed, or was
+terminated at shutdown) is therefore unlinked by the tracker once the
+application exits, instead of staying in /dev/shm. The mapping itself stays
+alive for as long as any view into it does.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:  # pragma: no cover - platforms without shared memory support
+    resource_tracker = shared_memory = None
+
+from model.monteCarloRun import MonteCarloRun, _KSSurface
+from process import calculations
+from process.cdc.state import RunStack
+
+
+def available() -> bool:
+    return shared_memory is not None
+
+
+def share_resource_tracker() -> None:
+    """
+    Start this process's resource tracker, so that worker processes started
+    from here register the blocks they create with it rather than with
+    trackers of their own. Call before starting the workers.
+    """
+    if resource_tracker is not None and os.name != "nt":
+        resource_tracker.ensure_running()
+
+
+class SharedRunBlockHandle(NamedTuple):
+    """Picklable description of a block: its name and the array dimensions."""
+
+    name: str
+    sample_name: str
+    n_runs: int
+    n_grid: int
+    n_concordant: int
+    n_discordant: int
+    resolution: int
+
+
+class RunRows(NamedTuple):
+    """Notification that rows `start <= i < stop` of a sample's block are filled."""
+
+    start: int
+    stop: int
+
+
+def _layout(handle: SharedRunBlockHandle):
+    """(field, dtype, shape) for every array in the block, in storage order."""
+    R, G = handle.n_runs, handle.n_grid
+    Nc, Nd = handle.n_concordant, handle.n_discordant
+    return (
+        ("ages_y", np.float64, (G,)),
+        ("D_raw", np.float64, (R, G)),
+        ("D_pen", np.float64, (R, G)),
+        ("p", np.float64, (R, G)),
+        ("run_optima_y", np.float64, (R,)),
+        ("concordant_uPb", np.float64, (R, Nc)),
+        ("concordant_pbPb", np.float64, (R, Nc)),
+        ("concordant_ages", np.float64, (R, Nc)),
+        ("discordant_uPb", np.float64, (R, Nd)),
+        ("discordant_pbPb", np.float64, (R, Nd)),
+        ("heatmap", np.float64, (R, handle.resolution)),
+        ("invalid", np.int32, (R, G)),
+        ("heatmap_len", np.int32, (R,)),
+    )
+
+
+def _nbytes(handle: SharedRunBlockHandle) -> int:
+    return sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, dtype, shape in _layout(handle))
+
+
+if shared_memory is not None:
+    class _SharedMemory(shared_memory.SharedMemory):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            if os.name != "nt":
+                # The mapping does not need the descriptor.
+                os.close(self._fd)
+                self._fd = -1
+
+        def __del__(self):
+            # Never close: numpy views do not pin the buffer, so closing would
+            # leave them dangling. They hold the mapping through `buf` and it
+            # is unmapped once the last of them is gone.
+            pass
+
+
+class SharedRunBlock:
+    """One sample's Monte Carlo runs laid out in a shared-memory block."""
+
+    def __init__(self, shm, handle: SharedRunBlockHandle):
+        self._shm = shm
+        self.handle = handle
+        offset = 0
+        for name, dtype, shape in _layout(handle):
+            arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            setattr(self, name, arr)
+            offset += arr.nbytes
+        self.ages_ma = self.ages_y / 1e6
+        self.stack = RunStack.over(
+            self.ages_y, self.D_raw, self.D_pen, self.p, self.invalid, self.run_optima_y
+        )
+
+    @classmethod
+    def create(cls, sample_name, ages_y, n_runs, n_concordant, n_discordant, resolution) -> "SharedRunBlock":
+        """Allocate a block for the worker side; its RunStack starts empty."""
+        ages_y = np.asarray(ages_y, float)
+        handle = SharedRunBlockHandle(
+            "", str(sample_name), int(n_runs), int(ages_y.size),
+            int(n_concordant), int(n_discordant), int(resolution),
+        )
+        # Stays registered with the resource tracker until the receiver unlinks it.
+        shm = _SharedMemory(create=True, size=max(_nbytes(handle), 1))
+        block = cls(shm, handle._replace(name=shm.name))
+        block.ages_y[:] = ages_y
+        block.ages_ma[:] = ages_y / 1e6
+        for name in ("D_raw", "D_pen", "p", "run_optima_y", "concordant_ages", "heatmap"):
+            getattr(block, name).fill(np.nan)
+        block.invalid.fill(0)
+        block.heatmap_len.fill(0)
+        return block
+
+    @classmethod
+    def attach(cls, handle: SharedRunBlockHandle) -> "SharedRunBlock":
+        """
+        Map an existing block and remove its name (which also unregisters it
+        from the resource tracker); the mapping stays valid.
+        """
+        shm = _SharedMemory(name=handle.name)
+        block = cls(shm, handle)
+        if os.name != "nt":
+            shm.unlink()
+        return block
+
+    def write(self, i: int, run) -> None:
+        """Copy run `i` into its row (grid results through the RunStack)."""
+        if i != self.stack.n_runs:
+            raise ValueError(f"run {i} written out of order (expected {self.stack.n_runs})")
+        self.stack.append(run)
+        self.concordant_uPb[i] = run.concordant_uPb
+        self.concordant_pbPb[i] = run.concordant_pbPb
+        ages = np.asarray(run.concordant_ages, float)
+        self.concordant_ages[i, : ages.size] = ages
+        self.discordant_uPb[i] = run.discordant_uPb
+        self.discordant_pbPb[i] = run.discordant_pbPb
+        column = np.asarray(run.heatmapColumnData if run.heatmapColumnData is not None else [], float)
+        n = min(column.size, self.heatmap.shape[1])
+        self.heatmap[i, :n] = column[:n]
+        self.heatmap_len[i] = n
+
+    def run(self, i: int, settings=None) -> MonteCarloRun:
+        """Build run `i` over views of its rows."""
+        run = MonteCarloRun(
+            i,
+            self.handle.sample_name,
+            self.concordant_uPb[i],
+            self.concordant_pbPb[i],
+            self.discordant_uPb[i],
+            self.discordant_pbPb[i],
+            settings=settings,
+            concordant_ages=self.concordant_ages[i],
+        )
+        run.rim_ages = self.ages_y
+        run.d_values = self.D_raw[i]
+        run.p_values = self.p[i]
+        run.scores = self.D_pen[i]
+        run.invalid_counts = self.invalid[i]
+        run.heatmapColumnData = self.heatmap[i, : self.heatmap_len[i]]
+
+        opt = float(self.run_optima_y[i])
+        hit = np.flatnonzero(self.ages_y == opt)
+        if hit.size:
+            run.optimal_pb_loss_age = opt
+            run.optimal_uPb = calculations.u238pb206_from_age(opt)
+            run.optimal_pbPb = calculations.pb207pb206_from_age(opt)
+            run._optimal_index = int(hit[0])
+        prefer_pen = bool(getattr(settings, "penaliseInvalidAges", True))
+        run.ks_surface = _KSSurface(self.ages_ma, run.scores if prefer_pen else run.d_values)
+        return run
+
+    def runs(self, rows: RunRows, settings=None):
+        return [self.run(i, settings) for i in range(rows.start, rows.stop)]
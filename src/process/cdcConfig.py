@@ -18,6 +18,13 @@ def _env_bool(name: str, default: str = "0") -> bool:
         return bool(int(default))
 
 
+def _env_int(name: str, default: str = "0") -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except Exception:
+        return int(default)
+
+
 # ====================== ENSEMBLE PARAMETERS  ======================
 # Fixed parameters for the CDC ensemble pipeline.
 # Not user-configurable. Nine of these were varied in the threshold
@@ -60,6 +67,24 @@ REV_TOL_X: float = 1e-6   # 238U/206Pb noise tolerance. Not swept.
 # --------------- Display ---------------
 CATALOGUE_SURFACE: str = "PEN"  # Default display surface ("PEN" or "RAW"). Default to PEN.
 
+# --------------- Adaptive rim-age grid ---------------
+# Only used when the calculation settings enable adaptiveRimAgeGrid.
+ADAPTIVE_GRID_HALF_WIDTH_NODES: int = 2   # Refined half-width around each candidate, in coarse nodes.
+ADAPTIVE_GRID_MAX_NODES: int = 2000       # Cap on refined nodes added per sample.
+
+# --------------- Rim-age node store ---------------
+NODE_AGE_TOL_Y: float = 1.0  # Rim ages (YEARS) this close are the same grid node when re-gridding runs.
+
+# --------------- Sequential early stopping ---------------
+# Only used when the calculation settings enable earlyStopping. Tolerances
+# are in (median) grid steps.
+EARLY_STOP_CHECK_EVERY: int = 50          # Runs between convergence checkpoints.
+EARLY_STOP_MIN_RUNS: int = 100            # Never stop before this many runs.
+EARLY_STOP_PATIENCE: int = 2              # Consecutive stable checkpoints required to stop.
+EARLY_STOP_AGE_TOL_STEPS: float = 1.0     # Max change of the optimal age between checkpoints.
+EARLY_STOP_BOUNDS_TOL_STEPS: float = 2.0  # Max change of each 95% stability bound.
+EARLY_STOP_PEAK_TOL_STEPS: float = 2.0    # Max shift of each catalogue peak (the peak count must not change).
+
 
 # ====================== OUTPUT / DIAGNOSTICS ======================
 
@@ -88,7 +113,33 @@ CATALOGUE_CSV_RAW: Path = BASE_CATALOGUE.with_name(BASE_CATALOGUE.name + "_np").
 RUNLOG: Path = _root / (f"runtime_log_{EXP_TAG}.csv" if EXP_TAG else "runtime_log.csv")
 DIAG_DIR: Path = _root / (f"diag_ks_{EXP_TAG}" if EXP_TAG else "diag_ks")
 
+# Layout of the per-sample surface diagnostics: "npz" writes compressed
+# archives to DIAG_DIR, "npy" an uncompressed memory-mappable store (one
+# directory of .npy arrays per sample plus a JSON index) to DIAG_STORE_DIR.
+CDC_DIAG_FORMAT: str = os.environ.get("CDC_DIAG_FORMAT", "npz").strip().lower()
+DIAG_STORE_DIR: Path = DIAG_DIR / "surfaces"
+
 RUN_FIELDS = [
     "method", "phase", "sample", "tier", "R", "n_grid", "elapsed_s",
     "per_run_median_s", "per_run_p95_s", "rss_peak_mb", "python", "numpy",
+    "R_requested", "convergence",
 ]
+
+
+# ====================== EXECUTION ======================
+
+# Worker processes for Monte Carlo sampling (1 = serial in the job process,
+# 0 = one per CPU). Results do not depend on the worker count.
+CDC_MC_WORKERS: int = _env_int("CDC_MC_WORKERS", "1")
+
+# Samples processed concurrently by processSamples (1 = one after another,
+# 0 = one per CPU). Results are published in input order either way.
+CDC_SAMPLE_WORKERS: int = _env_int("CDC_SAMPLE_WORKERS", "1")
+
+# On-disk cache of processed samples, keyed by the sample's spots, the
+# calculation settings, the seed and the code version (0 disables it).
+# Least recently used entries are evicted beyond CDC_RESULT_CACHE_MAX_MB.
+CDC_RESULT_CACHE: bool = _env_bool("CDC_RESULT_CACHE", "1")
+CDC_RESULT_CACHE_MAX_MB: int = _env_int("CDC_RESULT_CACHE_MAX_MB", "512")
+_cache_dir = os.environ.get("CDC_RESULT_CACHE_DIR", "").strip()
+CDC_RESULT_CACHE_DIR: Optional[Path] = Path(_cache_dir).expanduser() if _cache_dir else None  # None = user data dir
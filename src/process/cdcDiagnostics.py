@@ -13,14 +13,21 @@ from process import calculations
 from process.cdcConfig import (
     CATALOGUE_CSV_PEN,
     CATALOGUE_CSV_RAW,
+    CDC_DIAG_FORMAT,
     CDC_ENABLE_RUNLOG,
     CDC_WRITE_OUTPUTS,
     DIAG_DIR,
+    DIAG_STORE_DIR,
     KS_EXPORT_ROOT,
     RUN_FIELDS,
     RUNLOG,
 )
 from process.cdcTW import age_ma_from_pb207pb206, age_ma_from_u238pb206
+from process.cdcSurfaceStore import (
+    reset_store as _reset_store,
+    write_index as _write_store_index,
+    write_sample as _write_store_sample,
+)
 from process.cdcUtils import safe_prefix
 
 try:
@@ -57,6 +64,18 @@ def ensure_output_dirs() -> None:
     DIAG_DIR.mkdir(parents=True, exist_ok=True)
 
 
+def reset_surface_store() -> None:
+    """Start a fresh batch in the surface store when it is the diagnostics format."""
+    if CDC_WRITE_OUTPUTS and CDC_DIAG_FORMAT == "npy":
+        _reset_store(DIAG_STORE_DIR)
+
+
+def finish_surface_store() -> None:
+    """Index the samples written to the surface store during this batch."""
+    if CDC_WRITE_OUTPUTS and CDC_DIAG_FORMAT == "npy" and DIAG_STORE_DIR.is_dir():
+        _write_store_index(DIAG_STORE_DIR)
+
+
 def reset_csv(path: Path, header: str) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
     with Path(path).open("w", newline="") as fh:
@@ -71,10 +90,22 @@ def rss_mb() -> float:
     return ru / (1024 * 1024.0) if sys.platform == "darwin" else ru / 1024.0
 
 
+def _rotate_stale_runlog() -> None:
+    """Move aside a runlog whose header is not RUN_FIELDS (written by an older version)."""
+    try:
+        with RUNLOG.open(newline="") as fh:
+            header = fh.readline().rstrip("\r\n")
+    except FileNotFoundError:
+        return
+    if header != ",".join(RUN_FIELDS):
+        RUNLOG.replace(RUNLOG.with_name(f"{RUNLOG.stem}.old{RUNLOG.suffix}"))
+
+
 def write_runlog(row: dict) -> None:
     if not CDC_ENABLE_RUNLOG:
         return
     RUNLOG.parent.mkdir(parents=True, exist_ok=True)
+    _rotate_stale_runlog()
     write_header = not RUNLOG.exists()
     with RUNLOG.open("a", newline="") as fh:
         w = csv.DictWriter(fh, fieldnames=RUN_FIELDS, extrasaction="ignore")
@@ -137,7 +168,7 @@ def write_npz_diagnostics(
     sample_name: str,
     ages_ma: np.ndarray,
     ages_y: np.ndarray,
-    runs,
+    run_stack,
     S_runs_raw: np.ndarray,
     S_runs_pen: np.ndarray,
     Smed_raw: np.ndarray,
@@ -145,40 +176,56 @@ def write_npz_diagnostics(
     S_view: np.ndarray,
     rows_for_ui: Sequence[Dict],
 ) -> None:
-    """Write optional NPZ diagnostics for debugging and offline inspection."""
+    """
+    Write optional surface diagnostics for debugging and offline inspection:
+    compressed NPZ files, or a sample entry in the surface store when
+    CDC_DIAG_FORMAT is "npy".
+    """
     if not CDC_WRITE_OUTPUTS:
         return
     ensure_output_dirs()
     prefix = safe_prefix(sample_name)
 
-    np.savez_compressed(
-        DIAG_DIR / f"{prefix}_runs_S.npz",
+    def _peak_values(key, default_key=None):
+        if not rows_for_ui:
+            return np.array([], float)
+        return np.array([r.get(key, r[default_key] if default_key else float("nan")) for r in rows_for_ui], float)
+
+    runs = dict(
         age_Ma=ages_ma,
         S_runs_raw=S_runs_raw,
         S_runs_pen=S_runs_pen,
-        optima_Ma=np.array([r.optimal_pb_loss_age / 1e6 for r in runs], float),
+        optima_Ma=run_stack.run_optima_y[: len(run_stack)] / 1e6,
     )
-
-    np.savez_compressed(
-        DIAG_DIR / f"{prefix}_ensemble_surfaces.npz",
-        age_Ma=ages_ma,
+    surfaces = dict(
         Smed_raw=Smed_raw,
         Smed_pen=Smed_pen,
         S_view=S_view,
-        peaks_age_Ma=np.array([r["age_ma"] for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
-        peaks_ci_low=np.array([r["ci_low"] for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
-        peaks_ci_high=np.array([r["ci_high"] for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
-        peaks_support_low=np.array([r.get("support_low", r["ci_low"]) for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
-        peaks_support_high=np.array([r.get("support_high", r["ci_high"]) for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
-        peaks_stability_low=np.array([r.get("stability_low", r["ci_low"]) for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
-        peaks_stability_high=np.array([r.get("stability_high", r["ci_high"]) for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
-        peaks_support=np.array([r.get("support", float("nan")) for r in rows_for_ui], float) if rows_for_ui else np.array([], float),
+        peaks_age_Ma=_peak_values("age_ma"),
+        peaks_ci_low=_peak_values("ci_low"),
+        peaks_ci_high=_peak_values("ci_high"),
+        peaks_support_low=_peak_values("support_low", "ci_low"),
+        peaks_support_high=_peak_values("support_high", "ci_high"),
+        peaks_stability_low=_peak_values("stability_low", "ci_low"),
+        peaks_stability_high=_peak_values("stability_high", "ci_high"),
+        peaks_support=_peak_values("support"),
     )
 
+    if CDC_DIAG_FORMAT == "npy":
+        # One uncompressed entry; the per-run curves are kept as (R x G) stacks.
+        _write_store_sample(
+            DIAG_STORE_DIR,
+            sample_name,
+            dict(runs, **surfaces, D_raw=run_stack.D("raw"), D_pen=run_stack.D("pen")),
+        )
+        return
+
+    np.savez_compressed(DIAG_DIR / f"{prefix}_runs_S.npz", **runs)
+    np.savez_compressed(DIAG_DIR / f"{prefix}_ensemble_surfaces.npz", age_Ma=ages_ma, **surfaces)
+
     # Per-run exports (large; keep behind CDC_WRITE_OUTPUTS)
-    for r_idx, r in enumerate(runs, start=1):
-        d_raw = np.array([r.statistics_by_pb_loss_age[a].test_statistics[0] for a in ages_y], float)
-        d_pen = np.array([r.statistics_by_pb_loss_age[a].score for a in ages_y], float)
+    D_raw, D_pen = run_stack.D("raw"), run_stack.D("pen")
+    for r_idx, (d_raw, d_pen, opt_y) in enumerate(zip(D_raw, D_pen, run_stack.run_optima_y), start=1):
         np.savez_compressed(
             DIAG_DIR / f"{prefix}_{r_idx:03d}.npz",
             age_Ma=ages_ma,
@@ -186,7 +233,7 @@ def write_npz_diagnostics(
             D_pen=d_pen,
             S_raw=1.0 - d_raw,
             S_pen=1.0 - d_pen,
-            opt_Ma=float(r.optimal_pb_loss_age / 1e6),
+            opt_Ma=float(opt_y / 1e6),
         )
 
 
@@ -243,22 +290,10 @@ def _surface_optimum_years(d_curve: np.ndarray, ages_y: np.ndarray) -> float:
     return float(ages_y[int(np.nanargmin(d_curve))])
 
 
-def _run_optima_years(runs, ages_y: np.ndarray, which: str) -> np.ndarray:
-    vals = []
-    for r in runs:
-        if which == "pen":
-            vals.append(float(getattr(r, "optimal_pb_loss_age", np.nan)))
-            continue
-        d_by_age = np.array([r.statistics_by_pb_loss_age[a].test_statistics[0] for a in ages_y], float)
-        d_by_age = np.where(np.isfinite(d_by_age), d_by_age, np.inf)
-        vals.append(float(ages_y[int(np.nanargmin(d_by_age))]))
-    return np.asarray(vals, float)
-
-
 def export_legacy_ks(
     sample,
     settings,
-    runs,
+    run_stack,
     ages_y,
     D_raw=None,
     D_pen=None,
@@ -273,12 +308,12 @@ def export_legacy_ks(
     """Export legacy KS goodness curves and related diagnostic files."""
     if KS_EXPORT_ROOT is None:
         return
-    if not runs:
+    if run_stack is None or not len(run_stack):
         return
 
     # Only export once complete
     try:
-        if len(runs) < int(settings.monteCarloRuns):
+        if len(run_stack) < int(getattr(sample, "early_stopped_at", None) or settings.monteCarloRuns):
             return
     except Exception:
         pass
@@ -290,19 +325,13 @@ def export_legacy_ks(
 
     ages_y = np.asarray(ages_y, float)
     ages_ma = ages_y / 1e6
-    n_runs = len(runs)
+    n_runs = len(run_stack)
 
     # Compute curves if not supplied
     if D_raw is None:
-        D_raw = np.array(
-            [np.mean([r.statistics_by_pb_loss_age[a].test_statistics[0] for r in runs]) for a in ages_y],
-            dtype=float,
-        )
+        D_raw = np.mean(run_stack.D("raw"), axis=0)
     if D_pen is None:
-        D_pen = np.array(
-            [np.mean([r.statistics_by_pb_loss_age[a].score for r in runs]) for a in ages_y],
-            dtype=float,
-        )
+        D_pen = np.mean(run_stack.D("pen"), axis=0)
 
     # Goodness curves
     S_raw = 1.0 - D_raw
@@ -311,8 +340,8 @@ def export_legacy_ks(
     KS_EXPORT_ROOT.mkdir(parents=True, exist_ok=True)
 
     run_optima_by_tag = {
-        "raw": _run_optima_years(runs, ages_y, "raw"),
-        "pen": _run_optima_years(runs, ages_y, "pen"),
+        "raw": run_stack.first_argmin_optima_y("raw"),
+        "pen": run_stack.run_optima_y[:n_runs].copy(),
     }
 
     # Preserve caller-provided optima for the active channel when available.
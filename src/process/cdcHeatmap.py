@@ -1,71 +1,153 @@
 from __future__ import annotations
 
 import numpy as np
-import scipy as sp
+from scipy.special import erf
 
 from utils import config
 
+# Bins of the per-column median sketch over D* in [0, 1].
+SKETCH_BINS = 1024
 
-def calculateHeatmapData(signals, runs, settings, request_id=None):
-    """Aggregate per-run heatmap columns into a single probability heatmap."""
-    resolution = config.HEATMAP_RESOLUTION
+# Runs ingested per halt check in calculateHeatmapData.
+_RUN_CHUNK = 256
 
-    colData = [[] for _ in range(resolution)]
-    for run in runs:
-        if signals.halt():
-            return
-        if run is None:
-            continue
+
+class HeatmapAccumulator:
+    """
+    Streaming state behind the run-density heatmap.
+
+    Ingests one run's column vector (or a block of runs) at a time, keeping
+    per-column running moments and a histogram sketch for the median. Both
+    are mergeable, and `density` costs O(resolution²) regardless of how many
+    runs have been added.
+
+    The sketch keeps the count and the sum of the values in each of
+    `SKETCH_BINS` bins; the median is the mean of the bin(s) holding the
+    middle order statistics, which is exact whenever those bins hold one
+    distinct value.
+    """
+
+    def __init__(self, resolution: int = None):
+        self.resolution = int(config.HEATMAP_RESOLUTION if resolution is None else resolution)
+        self.count = np.zeros(self.resolution, np.int64)
+        self.mean = np.zeros(self.resolution, float)
+        self.m2 = np.zeros(self.resolution, float)
+        self.binCounts = np.zeros((self.resolution, SKETCH_BINS), np.int64)
+        self.binSums = np.zeros((self.resolution, SKETCH_BINS), float)
+
+    def addRun(self, run) -> None:
         row = getattr(run, "heatmapColumnData", None)
-        if row is None:
-            continue
-        for col in range(resolution):
-            if col >= len(row):
-                continue
-            v = row[col]
-            if v is None:
-                continue
-            vf = float(v)
-            if not np.isfinite(vf):
-                continue
-            colData[col].append(vf)
-
-    cache = {}
-    data = [[0 for _ in range(resolution)] for _ in range(resolution)]
-    prev_mean = None
-    prev_std = None
-    for col in range(resolution):
+        if row is not None:
+            self.addColumns([row])
+
+    def addRuns(self, runs) -> None:
+        rows = [getattr(run, "heatmapColumnData", None) for run in runs if run is not None]
+        self.addColumns([row for row in rows if row is not None])
+
+    def addColumns(self, rows) -> None:
+        """Add column vectors (each of length <= resolution; None/NaN entries are skipped)."""
+        res = self.resolution
+        block = np.full((len(rows), res), np.nan, float)
+        for i, row in enumerate(rows):
+            vals = np.array(row[:res], dtype=float)  # None -> NaN
+            block[i, : vals.size] = vals
+        if block.size == 0:
+            return
+
+        ok = np.isfinite(block)
+        n = ok.sum(axis=0)
+        filled = np.where(ok, block, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = filled.sum(axis=0) / n
+            m2 = (np.where(ok, block - mean, 0.0) ** 2).sum(axis=0)
+        self._mergeMoments(n, np.where(n > 0, mean, 0.0), np.where(n > 0, m2, 0.0))
+
+        cols = np.broadcast_to(np.arange(res), block.shape)[ok]
+        vals = block[ok]
+        flat = cols * SKETCH_BINS + _sketchBin(vals)
+        self.binCounts += np.bincount(flat, minlength=res * SKETCH_BINS).reshape(res, SKETCH_BINS)
+        self.binSums += np.bincount(flat, weights=vals, minlength=res * SKETCH_BINS).reshape(res, SKETCH_BINS)
+
+    def merge(self, other: "HeatmapAccumulator") -> None:
+        if other.resolution != self.resolution:
+            raise ValueError("Cannot merge heatmaps of different resolution")
+        self._mergeMoments(other.count, other.mean, other.m2)
+        self.binCounts += other.binCounts
+        self.binSums += other.binSums
+
+    def _mergeMoments(self, n_b, mean_b, m2_b) -> None:
+        # Chan et al. pairwise update of (count, mean, M2).
+        n_a = self.count
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            delta = mean_b - self.mean
+            mean = self.mean + delta * (n_b / n)
+            m2 = self.m2 + m2_b + delta ** 2 * (n_a * n_b / n)
+        self.mean = np.where(n > 0, mean, 0.0)
+        self.m2 = np.where(n > 0, m2, 0.0)
+        self.count = n
+
+    def std(self) -> np.ndarray:
+        """Population standard deviation per column (0 where empty)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(self.count > 0, self.m2 / self.count, 0.0)
+        return np.sqrt(np.maximum(var, 0.0))
+
+    def median(self) -> np.ndarray:
+        """Sketched median per column (NaN where empty)."""
+        cum = np.cumsum(self.binCounts, axis=1)
+        total = cum[:, -1]
+        rows = np.arange(self.resolution)
+
+        def _binMeanAt(rank):
+            # Bin holding the `rank`-th (1-based) smallest value of each column.
+            k = np.minimum((cum < rank[:, None]).sum(axis=1), SKETCH_BINS - 1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return self.binSums[rows, k] / self.binCounts[rows, k]
+
+        lo = _binMeanAt((total + 1) // 2)
+        hi = _binMeanAt(total // 2 + 1)
+        return np.where(total > 0, 0.5 * (lo + hi), np.nan)
+
+    def density(self) -> np.ndarray:
+        """
+        (resolution × resolution) heatmap: column j is the normal density of
+        column j's values (centred on the run median) integrated over each row.
+        Empty columns repeat the previous non-empty one, or N(0.5, 0) before
+        the first.
+        """
+        res = self.resolution
+        cols = np.arange(res)
+        source = np.maximum.accumulate(np.where(self.count > 0, cols, -1))
+        have = source >= 0
+        source = np.maximum(source, 0)
+
+        mean = np.where(have, self.median()[source], 0.5)
+        stdDev = np.where(have, self.std()[source], 0.0)
+        mean = np.clip(mean, 0.0, 1.0)
+        stdDev = np.where(stdDev < 10 ** -7, 0.0, stdDev)
+
+        edges = np.linspace(0, 1, res + 1)[:, None]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            smooth = 0.5 * (1.0 + erf((edges - mean) / (stdDev * np.sqrt(2.0))))
+        meanRow = np.where(mean >= 1.0, res - 1, (mean * res).astype(int))
+        step = (np.arange(res + 1)[:, None] >= meanRow).astype(float)
+        cdfs = np.where(stdDev > 0, smooth, step)
+        return np.diff(cdfs, axis=0)
+
+
+def _sketchBin(values):
+    return np.clip((np.asarray(values, float) * SKETCH_BINS).astype(np.int64), 0, SKETCH_BINS - 1)
+
+
+def calculateHeatmapData(signals, runs, settings, request_id=None):
+    """Aggregate per-run heatmap columns into a single probability heatmap."""
+    heatmap = HeatmapAccumulator(config.HEATMAP_RESOLUTION)
+    for start in range(0, len(runs), _RUN_CHUNK):
         if signals.halt():
             return
-        vals = np.asarray(colData[col], float)
-        vals = vals[np.isfinite(vals)]
-        if vals.size == 0:
-            if prev_mean is None:
-                mean, stdDev = 0.5, 0.0
-            else:
-                mean, stdDev = prev_mean, prev_std
-        else:
-            # Center each column on the run-median so the heatmap ridge aligns
-            # with the ensemble median curve used in the lower panel.
-            mean = float(np.median(vals))
-            stdDev = float(np.std(vals))
-        mean = float(np.clip(mean, 0.0, 1.0))
-        if stdDev < 10 ** -7:
-            stdDev = 0
-        prev_mean, prev_std = mean, stdDev
-
-        if (mean, stdDev) not in cache:
-            if stdDev == 0:
-                meanRow = (resolution - 1) if mean >= 1.0 else int(mean * resolution)
-                result = [1 if i >= meanRow else 0 for i in range(resolution + 1)]
-            else:
-                rv = sp.stats.norm(mean, stdDev)
-                result = rv.cdf(np.linspace(0, 1, resolution + 1))
-            cache[(mean, stdDev)] = result
-
-        cdfs = cache[(mean, stdDev)]
-        for row in range(resolution):
-            data[row][col] = cdfs[row + 1] - cdfs[row]
+        heatmap.addRuns(runs[start:start + _RUN_CHUNK])
+    data = heatmap.density()
 
     # Optional request_id lets the UI ignore stale async heatmap frames.
     if request_id is None:
@@ -0,0 +1,142 @@
+"""
+Uncompressed, memory-mappable store of CDC surface diagnostics.
+
+A store is one directory per batch. Each sample gets a subdirectory of raw
+`.npy` arrays (age_Ma, the (R x G) S_runs_raw / S_runs_pen / D_raw / D_pen
+stacks, optima_Ma, the median surfaces and the published peaks) and a
+`sample.json` describing them; `index.json` lists every sample of the batch.
+
+Arrays are read with `np.load(mmap_mode="r")`, so a reader only pages in the
+rows it touches and nothing is decompressed.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from process.cdcUtils import safe_prefix
+
+# Bump when the layout changes.
+_FORMAT = 1
+
+INDEX_NAME = "index.json"
+SAMPLE_META_NAME = "sample.json"
+
+
+def _write_json(path: Path, obj) -> None:
+    """Write `obj` to `path` atomically, so readers never see a partial file."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fh:
+            json.dump(obj, fh, indent=2)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _sample_dirs(root: Path) -> List[Path]:
+    return sorted(p.parent for p in Path(root).glob(f"*/{SAMPLE_META_NAME}"))
+
+
+def is_store(path: Path) -> bool:
+    """True if `path` is a surface store directory."""
+    path = Path(path)
+    return path.is_dir() and ((path / INDEX_NAME).is_file() or bool(_sample_dirs(path)))
+
+
+def reset_store(root: Path) -> None:
+    """Remove the samples and index of a previous batch from `root`."""
+    root = Path(root)
+    for sample_dir in _sample_dirs(root):
+        shutil.rmtree(sample_dir, ignore_errors=True)
+    (root / INDEX_NAME).unlink(missing_ok=True)
+
+
+def write_sample(root: Path, sample_name: str, arrays: Dict[str, np.ndarray]) -> Path:
+    """
+    Save `arrays` as `<root>/<prefix>/<name>.npy` and describe them in
+    `sample.json`, which is written last: a sample directory without it is
+    incomplete.
+    """
+    sample_dir = Path(root) / safe_prefix(sample_name)
+    sample_dir.mkdir(parents=True, exist_ok=True)
+    (sample_dir / SAMPLE_META_NAME).unlink(missing_ok=True)
+
+    described = {}
+    for name, value in arrays.items():
+        arr = np.ascontiguousarray(value)
+        np.save(sample_dir / f"{name}.npy", arr, allow_pickle=False)
+        described[name] = dict(shape=list(arr.shape), dtype=arr.dtype.str)
+
+    _write_json(
+        sample_dir / SAMPLE_META_NAME,
+        dict(format=_FORMAT, sample=str(sample_name), dir=sample_dir.name, arrays=described),
+    )
+    return sample_dir
+
+
+def _read_sample_metas(root: Path) -> List[dict]:
+    metas = []
+    for sample_dir in _sample_dirs(root):
+        try:
+            metas.append(json.loads((sample_dir / SAMPLE_META_NAME).read_text()))
+        except (OSError, ValueError):
+            continue
+    return metas
+
+
+def write_index(root: Path) -> Path:
+    """Collect the complete samples under `root` into `index.json`."""
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / INDEX_NAME
+    _write_json(path, dict(format=_FORMAT, samples=_read_sample_metas(root)))
+    return path
+
+
+class SurfaceStore:
+    """
+    Read access to a store. Without an `index.json` (e.g. an interrupted
+    batch) the samples are found from their `sample.json` files.
+    """
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        index = self.root / INDEX_NAME
+        if index.is_file():
+            metas = json.loads(index.read_text()).get("samples", [])
+        else:
+            metas = _read_sample_metas(self.root)
+        self._entries: Dict[str, dict] = {str(m["sample"]): m for m in metas}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, sample_name: str) -> bool:
+        return sample_name in self._entries
+
+    def samples(self) -> List[str]:
+        return list(self._entries)
+
+    def sample_dir(self, sample_name: str) -> Path:
+        return self.root / self._entries[sample_name]["dir"]
+
+    def arrays(self, sample_name: str) -> List[str]:
+        return list(self._entries[sample_name]["arrays"])
+
+    def shape(self, sample_name: str, name: str) -> tuple:
+        return tuple(self._entries[sample_name]["arrays"][name]["shape"])
+
+    def load(self, sample_name: str, name: str, mmap_mode="r") -> np.ndarray:
+        """Array `name` of a sample, memory-mapped read-only by default."""
+        if name not in self._entries[sample_name]["arrays"]:
+            raise KeyError(f"{sample_name!r} has no array {name!r}")
+        return np.load(self.sample_dir(sample_name) / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
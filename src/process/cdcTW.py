@@ -5,7 +5,7 @@ from __future__ import annotations
 
 import numpy as np
 
-from process import calculations
+from process import calculations, concordia
 from process.cdcConfig import REV_TOL_X, REV_TOL_Y
 
 # ======================  DECAY CONSTANTS & TW HELPERS  ======================
@@ -28,32 +28,15 @@ def age_ma_from_u238pb206(u: float) -> float:
 
 
 def age_ma_from_pb207pb206(v: float) -> float:
-    """Convert 207Pb/206Pb (TW y-axis) to age in Ma via bisection."""
+    """Convert 207Pb/206Pb (TW y-axis) to age in Ma via the concordia lookup table."""
     try:
         v = float(v)
         if not np.isfinite(v) or v <= 0.0:
             return float("nan")
 
-        lo, hi = 1e-9, 5000.0  # avoid 0/0 at t=0; 5000 Ma covers plausible Pb207/Pb206 solutions
-        def f(t):
-            num = np.expm1(LAMBDA_235 * t)
-            den = np.expm1(LAMBDA_238 * t)
-            if den == 0.0:
-                # limit t→0 of (e^{λ235 t}-1)/(e^{λ238 t}-1) = λ235/λ238
-                ratio = LAMBDA_235 / LAMBDA_238
-            else:
-                ratio = num / den
-            return ratio - (v * R_U)
-
-        flo = f(lo)
-        for _ in range(60):
-            mid = 0.5 * (lo + hi)
-            fm = f(mid)
-            if np.sign(fm) == np.sign(flo):
-                lo, flo = mid, fm
-            else:
-                hi = mid
-        return 0.5 * (lo + hi)
+        # Solutions are clamped to (0, 5000] Ma, which covers plausible Pb207/Pb206 values.
+        t = concordia.age_from_pb207pb206(v, clip=True) / 1e6
+        return float(min(max(t, 1e-9), 5000.0))
     except Exception:
         return float("nan")
 
@@ -84,3 +67,21 @@ def is_reverse_discordant(u: float, v: float, tol_y: float = REV_TOL_Y, tol_x: f
     except Exception:
         pass
     return False
+
+
+def reverse_discordant_flags(u, v, tol_y: float = REV_TOL_Y, tol_x: float = REV_TOL_X) -> np.ndarray:
+    """Array version of `is_reverse_discordant` for TW coordinates u (x) and v (y)."""
+    u = np.asarray(u, float)
+    v = np.asarray(v, float)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        ok = np.isfinite(u) & np.isfinite(v) & (u > 0.0) & (v > 0.0)
+
+        # Below-at-same-x
+        v_conc = concordia.pb207pb206_from_u238pb206(u)
+        below = np.isfinite(v_conc) & (v < (v_conc - tol_y))
+
+        # Left-of-at-same-y
+        t_ma = np.clip(concordia.age_from_pb207pb206(v, clip=True) / 1e6, 1e-9, 5000.0)
+        x_conc = concordia.u238pb206_from_age(t_ma * 1e6)
+        left = np.isfinite(x_conc) & (u < (x_conc - tol_x))
+    return ok & (below | left)
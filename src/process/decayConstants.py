@@ -0,0 +1,5 @@
+"""U decay constants (per year) and the present-day 238U/235U ratio."""
+
+U238_DECAY_CONSTANT = 1.55125*(10**-10)
+U235_DECAY_CONSTANT = 9.8485*(10**-10)
+U238U235_RATIO = 137.818
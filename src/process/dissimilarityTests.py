@@ -1,7 +1,12 @@
 from enum import Enum
 
+import numpy as np
 from scipy.stats import ks_2samp
 
+# (n1, n2, D) -> (statistic, p-value) of ks_2samp, shared by every batch.
+_KS_RESULTS = {}
+_KS_RESULTS_MAX = 2**16
+
 
 class DissimilarityTest(Enum):
     KOLMOGOROV_SMIRNOV = "Kolmogorov-Smirnov"
@@ -18,6 +23,14 @@ class DissimilarityTest(Enum):
                 return (1.0, 0.0)
             return ks_2samp(distribution1, distribution2)
 
+    def performBatch(self, sortedDistribution1, distributions2, withPValue=True):
+        """
+        Equivalent of `perform` for one sorted sample against every row of a
+        matrix, ignoring NaNs in each row. Returns (statistics, pValues, validCounts).
+        """
+        if self == DissimilarityTest.KOLMOGOROV_SMIRNOV:
+            return ks_2samp_batch(sortedDistribution1, distributions2, with_pvalue=withPValue)
+
     def getComparisonValue(self, statistic):
         if self == DissimilarityTest.KOLMOGOROV_SMIRNOV:
             d, p = statistic
@@ -27,3 +40,66 @@ class DissimilarityTest(Enum):
         if self == DissimilarityTest.KOLMOGOROV_SMIRNOV:
             d, p = statistic
             return p
+
+
+def ks_2samp_batch(sorted_distribution1, distributions2, with_pvalue=True):
+    """
+    Two-sided two-sample KS test of one sorted sample against every row of a matrix.
+
+    NaNs in `distributions2` are ignored row by row. Returns (D, p, n_valid)
+    arrays over the rows (p is None when `with_pvalue` is False). Rows with no
+    valid values, or an empty first sample, get D=1 and p=0 like `perform`.
+    Statistics and p-values are identical to per-row `ks_2samp` calls (without
+    p-values, D can differ from ks_2samp's rounded statistic in the last ulp).
+    """
+    c = np.asarray(sorted_distribution1, float)
+    X = np.atleast_2d(np.asarray(distributions2, float))
+    n1 = int(c.size)
+    n_rows, n_cols = X.shape
+    n_valid = np.sum(np.isfinite(X), axis=1)
+
+    D = np.ones(n_rows, float)
+    p = np.zeros(n_rows, float) if with_pvalue else None
+    ok = n_valid > 0
+    if n1 == 0 or n_cols == 0 or not ok.any():
+        return D, p, n_valid
+
+    Xs = np.sort(np.where(np.isfinite(X), X, np.nan), axis=1)
+    col = np.arange(n_cols)[None, :]
+    valid = col < n_valid[:, None]
+
+    # Second-sample ECDF counts at each of its own values, counting ties once.
+    is_end = np.ones(Xs.shape, bool)
+    is_end[:, :-1] = Xs[:, :-1] != Xs[:, 1:]
+    ends = np.where(is_end, col, n_cols)
+    count2 = np.minimum.accumulate(ends[:, ::-1], axis=1)[:, ::-1] + 1
+
+    # First-sample ECDF counts at, and just below, every second-sample value.
+    count1_left = np.searchsorted(c, Xs, side="left")
+    count1_right = np.searchsorted(c, Xs, side="right")
+    count1_next = np.full_like(count1_left, n1)
+    count1_next[:, :-1] = count1_left[:, 1:]
+    count1_next = np.where(col + 1 < n_valid[:, None], count1_next, n1)
+
+    # F1 - F2 is smallest at a second-sample value and largest just before the next one.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cdf2 = count2 / n_valid[:, None]
+        below = np.where(valid, count1_right / n1 - cdf2, np.inf)
+        above = np.where(valid, count1_next / n1 - cdf2, -np.inf)
+    maxS = np.maximum(np.max(above, axis=1), count1_left[:, 0] / n1)
+    minS = np.clip(-np.min(below, axis=1), 0, 1)
+    D = np.where(ok, np.maximum(minS, maxS), 1.0)
+
+    if with_pvalue:
+        # The p-value (and ks_2samp's rounded statistic) depends on a row only
+        # through (n1, n_valid, D), so ks_2samp runs once per distinct triple.
+        for i in np.flatnonzero(ok):
+            key = (n1, int(n_valid[i]), float(D[i]))
+            result = _KS_RESULTS.get(key)
+            if result is None:
+                if len(_KS_RESULTS) >= _KS_RESULTS_MAX:
+                    _KS_RESULTS.clear()
+                ks = ks_2samp(c, Xs[i, : key[1]])
+                result = _KS_RESULTS[key] = (float(ks.statistic), float(ks.pvalue))
+            D[i], p[i] = result
+    return D, p, n_valid
@@ -7,10 +7,12 @@ This module is retained so older callers keep working.
 from __future__ import annotations
 
 from process.ensemble_internal.catalogue import build_ensemble_catalogue
-from process.ensemble_internal.curve import per_run_peaks, robust_ensemble_curve
+from process.ensemble_internal.curve import RunPeaks, per_run_peaks, per_run_peaks_batch, robust_ensemble_curve
 
 __all__ = [
+    "RunPeaks",
     "build_ensemble_catalogue",
     "per_run_peaks",
+    "per_run_peaks_batch",
     "robust_ensemble_curve",
 ]
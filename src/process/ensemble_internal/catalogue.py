@@ -3,12 +3,12 @@
 from __future__ import annotations
 
 import warnings
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
 import numpy as np
 from scipy.ndimage import gaussian_filter1d
 
-from process.ensemble_internal.curve import per_run_peaks, robust_ensemble_curve
+from process.ensemble_internal.curve import RunPeaks, per_run_peaks_batch, robust_ensemble_curve
 from process.ensemble_internal.primitives import (
     _COARSE_SIGMA_GRID_FRAC,
     _DEGENERATE_CI_GRID_FRAC,
@@ -17,7 +17,10 @@ from process.ensemble_internal.primitives import (
     _basin_bounds_from_peaks,
     _crest_index,
     _estimate_window_support,
+    _is_uniform_grid,
+    _nearest_index,
     _parabolic_refine,
+    _parabolic_refine_rows,
     _support_window_edges,
     _step_from_grid,
     find_peaks,
@@ -29,6 +32,21 @@ _UNMATCHED_FINE_RESCUE_PROM_MULT = 1.5
 _UNMATCHED_FINE_RESCUE_PROM_FRAC = 0.15
 
 
+def _padded_peak_matrix(per_run_peaks_list, R: int) -> np.ndarray:
+    """(R × K) per-run peak ages, NaN-padded; runs beyond the list have none."""
+    rows = [
+        np.asarray(per_run_peaks_list[r], float).ravel()
+        if r < len(per_run_peaks_list) and per_run_peaks_list[r] is not None
+        else np.array([], float)
+        for r in range(R)
+    ]
+    K = max([row.size for row in rows] + [1])
+    P = np.full((R, K), np.nan, float)
+    for r, row in enumerate(rows):
+        P[r, : row.size] = row
+    return P
+
+
 def _score_candidate_peaks(
     pk,
     x,
@@ -53,6 +71,21 @@ def _score_candidate_peaks(
     """Per-run voting, support computation, and CI estimation for candidate peaks."""
     out: List[Dict] = []
 
+    # Votes are taken for all runs at once over the (R × G) surface and the
+    # (R × K) padded matrix of each run's own peaks.
+    S = np.asarray(S, float)[:R]
+    Y = sign * S
+    rows = np.arange(R)
+    P = _padded_peak_matrix(per_run_peaks_list, R)
+    P_idx = _nearest_index(x, np.where(np.isfinite(P), P, x[0]))
+    P_height = Y[rows[:, None], P_idx]
+    thr = run_gate[:R, 0] + float(f_r) * np.maximum(run_gate[:R, 1] - run_gate[:R, 0], 0.0)
+    have_optima = optima_ma is not None
+    if have_optima:
+        opt = np.full(R, np.nan, float)
+        n_opt = min(R, optima_ma.size)
+        opt[:n_opt] = optima_ma[:n_opt]
+
     for j_idx, j_c in enumerate(pk):
         j_ref = int(j_ref_all[j_idx])
         age_ref = float(age_ref_all[j_idx])
@@ -61,48 +94,27 @@ def _score_candidate_peaks(
         b = min(S.shape[1] - 2, int(right_bounds[j_idx]))
         lo_ma_win, hi_ma_win = float(x[a]), float(x[b])
 
-        f_r_eff = float(f_r)
-
-        votes: List[float] = []
-        direct_votes: List[float] = []
-        optima_for_peak: List[float] = []
-
-        for r in range(R):
-            y_r = sign * S[r]
-            pr_list = per_run_peaks_list[r] if r < len(per_run_peaks_list) else None
-            pr_list = np.asarray(pr_list, float) if pr_list is not None else np.array([], float)
-            cand = pr_list[(pr_list >= lo_ma_win) & (pr_list <= hi_ma_win)]
-
-            if cand.size == 0:
-                j_abs = int(a + np.argmax(y_r[a:b + 1]))
-                p5, p95 = run_gate[r, 0], run_gate[r, 1]
-                thr = p5 + f_r_eff * max(p95 - p5, 0.0)
-                if y_r[j_abs] < thr:
-                    continue
-                age_vote = float(_parabolic_refine(x, S[r], j_abs))
-            else:
-                j_choices = [int(np.argmin(np.abs(x - p))) for p in cand]
-                heights_r = [float(y_r[jj]) for jj in j_choices]
-                j_abs = int(j_choices[int(np.argmax(heights_r))])
-
-                p5, p95 = run_gate[r, 0], run_gate[r, 1]
-                thr = p5 + f_r_eff * max(p95 - p5, 0.0)
-                if y_r[j_abs] < thr:
-                    continue
-                age_vote = float(_parabolic_refine(x, S[r], j_abs))
-                direct_votes.append(age_vote)
-
-            if age_ref_all.size > 1:
-                nearest = int(np.argmin(np.abs(age_ref_all - age_vote)))
-                if nearest != j_idx:
-                    continue
-
-            votes.append(age_vote)
-
-            if optima_ma is not None and 0 <= r < optima_ma.size:
-                opt_val = float(optima_ma[r])
-                if np.isfinite(opt_val) and (lo_ma_win <= opt_val <= hi_ma_win):
-                    optima_for_peak.append(opt_val)
+        # A run votes at its highest own peak inside the window, else at the
+        # window's highest node; the node must clear the run's gate.
+        in_win = (P >= lo_ma_win) & (P <= hi_ma_win)
+        has_own = in_win.any(axis=1)
+        own = P_idx[rows, np.argmax(np.where(in_win, P_height, -np.inf), axis=1)]
+        j_abs = np.where(has_own, own, a + np.argmax(Y[:, a:b + 1], axis=1))
+        passed = ~(Y[rows, j_abs] < thr)
+        vote = _parabolic_refine_rows(x, S, j_abs)
+
+        # Votes nearer another candidate's reference age go to that candidate.
+        assigned = passed.copy()
+        if age_ref_all.size > 1:
+            nearest = np.argmin(np.abs(age_ref_all[None, :] - vote[:, None]), axis=1)
+            assigned &= nearest == j_idx
+
+        votes = vote[assigned]
+        direct_votes = vote[passed & has_own]
+        optima_for_peak = np.array([], float)
+        if have_optima:
+            opt_in = opt[assigned]
+            optima_for_peak = opt_in[np.isfinite(opt_in) & (opt_in >= lo_ma_win) & (opt_in <= hi_ma_win)]
 
         support = len(direct_votes) / float(R)
 
@@ -120,7 +132,7 @@ def _score_candidate_peaks(
             )
             continue
 
-        step = float(x[1] - x[0])
+        step = float(x[1] - x[0]) if _is_uniform_grid(x) else _step_from_grid(x, at=age_ref)
         if len(direct_votes) >= 3:
             lo_ci, hi_ci = np.nanpercentile(direct_votes, [2.5, 97.5])
         elif optima_ma is not None and len(optima_for_peak) >= 3:
@@ -223,7 +235,7 @@ def build_ensemble_catalogue(
     delta_min: float = 0.0,
     height_frac: float = 0.0,
     optima_ma: Optional[np.ndarray] = None,
-    per_run_peaks_list: Optional[List[np.ndarray]] = None,
+    per_run_peaks_list: Optional[Union[List[np.ndarray], RunPeaks]] = None,
     merge_per_hump: bool = True,
     merge_shoulders: bool = True,
     diagnostic_rows: Optional[List[Dict]] = None,
@@ -237,7 +249,7 @@ def build_ensemble_catalogue(
     R, G = S.shape
     sign = 1.0 if str(orientation).lower().startswith("max") else -1.0
 
-    S_med_s, Delta, _ = robust_ensemble_curve(S, smooth_frac=smooth_frac)
+    S_med_s, Delta, _ = robust_ensemble_curve(S, smooth_frac=smooth_frac, age_grid=x)
     if S_med_s.size == 0:
         return []
     if delta_min > 0.0 and Delta < delta_min:
@@ -457,27 +469,19 @@ def build_ensemble_catalogue(
         right_bounds[i] = boundary
         left_bounds[i + 1] = boundary
 
-    run_gate = np.empty((R, 2), float)
-    for r in range(R):
-        y_r = sign * S[r]
-        p5, p95 = np.nanpercentile(y_r, [5, 95])
-        run_gate[r, 0] = float(p5)
-        run_gate[r, 1] = float(p95)
+    run_gate = np.nanpercentile(sign * S[:R], [5, 95], axis=1).T
 
     if per_run_peaks_list is None:
-        per_run_peaks_list = []
-        for r in range(R):
-            y_r = sign * S[r]
-            pr = per_run_peaks(
-                x,
-                y_r,
-                prom_frac=float(per_run_prom_frac),
-                min_dist=int(per_run_min_dist),
-                min_width_nodes=int(per_run_min_width),
-                require_full_prom=bool(per_run_require_full_prom),
-                fallback_global_max=False,
-            )
-            per_run_peaks_list.append(np.asarray(pr, float))
+        per_run_peaks_list = per_run_peaks_batch(
+            x,
+            sign * S,
+            prom_frac=float(per_run_prom_frac),
+            min_dist=int(per_run_min_dist),
+            min_width_nodes=int(per_run_min_width),
+            require_full_prom=bool(per_run_require_full_prom),
+        )
+    if isinstance(per_run_peaks_list, RunPeaks):
+        per_run_peaks_list = per_run_peaks_list.as_list()
 
     optima_ma = np.asarray(optima_ma, float) if optima_ma is not None else None
     j_ref_all = np.array([_crest_index(S_med_s, int(jc), half_win=2) for jc in pk], int)
@@ -509,7 +513,6 @@ def build_ensemble_catalogue(
         d["sample"] = sample_name
 
     if diagnostic_rows is not None and pk_visual.size:
-        step = _step_from_grid(x)
         rough = float(np.nanmedian(np.abs(np.diff(y)))) if y.size >= 3 else 0.0
         diag_prom_thr = max(0.20 * prom_abs, 2.0 * rough, _EPS)
         diag_width_thr = max(1.0, 0.35 * float(w_min_nodes))
@@ -526,7 +529,7 @@ def build_ensemble_catalogue(
 
             j_ref = int(_crest_index(S_med_s, int(idx), half_win=2))
             age = float(_parabolic_refine(x, S_med_s, j_ref))
-            tol = max(0.51 * step, 1e-6)
+            tol = max(0.51 * _step_from_grid(x, at=age), 1e-6)
             if accepted_ages.size and np.any(np.isfinite(accepted_ages) & (np.abs(accepted_ages - age) <= tol)):
                 continue
             if existing_diag_ages.size and np.any(np.isfinite(existing_diag_ages) & (np.abs(existing_diag_ages - age) <= tol)):
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 import warnings
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 from scipy.ndimage import gaussian_filter1d
@@ -11,7 +11,10 @@ from scipy.ndimage import gaussian_filter1d
 from process.ensemble_internal.primitives import (
     _EPS,
     _crest_index,
+    _crest_index_rows,
+    _is_uniform_grid,
     _parabolic_refine,
+    _parabolic_refine_rows,
     find_peaks,
     peak_prominences,
     peak_widths,
@@ -95,13 +98,238 @@ def per_run_peaks(
     return refined, det
 
 
+class RunPeaks:
+    """
+    Per-run peaks of an (R × G) run stack in ragged form.
+
+    Run r's peaks are the slice `offsets[r]:offsets[r + 1]` of the flat
+    arrays, sorted by refined age: node index, refined age, prominence,
+    half-height width (nodes) and height.
+    """
+
+    __slots__ = ("offsets", "idx", "age_ma", "prom", "width", "height")
+
+    def __init__(self, offsets, idx, age_ma, prom, width, height):
+        self.offsets = offsets
+        self.idx = idx
+        self.age_ma = age_ma
+        self.prom = prom
+        self.width = width
+        self.height = height
+
+    @property
+    def n_runs(self) -> int:
+        return self.offsets.size - 1
+
+    def ages(self, r: int) -> np.ndarray:
+        """Refined peak ages (Ma) of run `r`."""
+        return self.age_ma[self.offsets[r]:self.offsets[r + 1]]
+
+    def as_list(self) -> List[np.ndarray]:
+        return [self.ages(r) for r in range(self.n_runs)]
+
+
+def _local_maxima_rows(Y: np.ndarray):
+    """Row and index of every local maximum, plateaus at their middle (as `find_peaks`)."""
+    R, G = Y.shape
+    cols = np.arange(G)
+    # First node after each node whose value differs from its predecessor's.
+    change = np.ones((R, G), bool)
+    change[:, 1:] = ~(Y[:, 1:] == Y[:, :-1])
+    nxt = np.where(change, cols, G - 1)
+    nxt = np.minimum.accumulate(nxt[:, ::-1], axis=1)[:, ::-1]
+    ahead = np.minimum(np.concatenate([nxt[:, 1:], np.full((R, 1), G - 1)], axis=1), G - 1)
+
+    rising = np.zeros((R, G), bool)
+    rising[:, 1:-1] = Y[:, :-2] < Y[:, 1:-1]
+    r, i = np.nonzero(rising)
+    ahead = ahead[r, i]
+    peak = Y[r, ahead] < Y[r, i]
+    r, i, ahead = r[peak], i[peak], ahead[peak]
+    return r, (i + ahead - 1) // 2
+
+
+def _range_tables(Z: np.ndarray, op) -> List[np.ndarray]:
+    """Sparse table: level k holds `op` over each run of 2**k nodes of every row."""
+    tables = [Z]
+    w = 1
+    while 2 * w <= Z.shape[1]:
+        prev = tables[-1]
+        tables.append(op(prev[:, :-w], prev[:, w:]))
+        w *= 2
+    return tables
+
+
+def _range_min(tables, rows, lo, hi) -> np.ndarray:
+    """Minimum of Z[row, lo:hi + 1] (non-empty ranges)."""
+    k = np.floor(np.log2(hi - lo + 1)).astype(np.intp)
+    w = np.left_shift(1, k)
+    out = np.empty(lo.size, float)
+    for level in np.unique(k):
+        at = k == level
+        t = tables[level]
+        out[at] = np.minimum(t[rows[at], lo[at]], t[rows[at], hi[at] + 1 - w[at]])
+    return out
+
+
+def _walk(tables, rows, pos, passes, left: bool) -> np.ndarray:
+    """
+    Move `pos` as far as every node passed over satisfies `passes`: leftwards
+    from the exclusive end `pos`, or rightwards from the start `pos`.
+    """
+    G = tables[0].shape[1]
+    pos = pos.copy()
+    for k in range(len(tables) - 1, -1, -1):
+        w = 1 << k
+        start = pos - w if left else pos
+        ok = (start >= 0) & (start + w <= G)
+        ok &= passes(tables[k][rows, np.where(ok, start, 0)])
+        pos = np.where(ok, pos - w if left else pos + w, pos)
+    return pos
+
+
+def _prominences_and_widths(Y: np.ndarray, rows: np.ndarray, idx: np.ndarray):
+    """`peak_prominences` and half-height `peak_widths` for peaks spread over the rows of `Y`."""
+    G = Y.shape[1]
+    # NaN stops every scan, like a higher node does.
+    Z = np.where(np.isnan(Y), np.inf, Y)
+    top = _range_tables(Z, np.maximum)
+    low = _range_tables(Z, np.minimum)
+    p = idx
+    h = Y[rows, p]
+
+    # Each side's base is its lowest node before the first higher one.
+    lb = _walk(top, rows, p, lambda v: v <= h, left=True)
+    rb = _walk(top, rows, p + 1, lambda v: v <= h, left=False) - 1
+    left_min = _range_min(low, rows, lb, p)
+    right_min = _range_min(low, rows, p, rb)
+    # The minimum nearest the peak on each side.
+    left_base = _walk(low, rows, p + 1, lambda v: v > left_min, left=True) - 1
+    right_base = _walk(low, rows, p, lambda v: v > right_min, left=False)
+    prom = h - np.maximum(left_min, right_min)
+
+    # Half-height crossings, interpolated between nodes.
+    height = h - prom * 0.5
+    lo = np.maximum(_walk(low, rows, p + 1, lambda v: v > height, left=True) - 1, left_base)
+    hi = np.minimum(_walk(low, rows, p, lambda v: v > height, left=False), right_base)
+    y_lo, y_hi = Y[rows, lo], Y[rows, hi]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        left_ip = np.where(
+            y_lo < height, lo + (height - y_lo) / (Y[rows, np.minimum(lo + 1, G - 1)] - y_lo), lo.astype(float)
+        )
+        right_ip = np.where(
+            y_hi < height, hi - (height - y_hi) / (Y[rows, np.maximum(hi - 1, 0)] - y_hi), hi.astype(float)
+        )
+    return prom, right_ip - left_ip
+
+
+def per_run_peaks_batch(
+    x: np.ndarray,
+    S_runs: np.ndarray,
+    *,
+    prom_frac: float = 0.07,
+    min_dist: int = 3,
+    min_width_nodes: int = 3,
+    require_full_prom: bool = True,
+) -> RunPeaks:
+    """
+    `per_run_peaks` for every row of the (R × G) stack `S_runs` at once.
+
+    Maxima, prominences and half-height widths are found for all rows in one
+    array pass. Rows with maxima closer than `min_dist` are re-detected with
+    `find_peaks`, whose height-ordered selection they need.
+    """
+    x = np.asarray(x, float)
+    Y = np.asarray(S_runs, float)
+    R = Y.shape[0] if Y.ndim == 2 else 0
+    if Y.ndim != 2 or x.size != Y.shape[1] or x.size < 3:
+        empty = np.array([], float)
+        return RunPeaks(np.zeros(R + 1, np.intp), np.array([], np.intp), empty, empty, empty, empty)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        q5, q95 = np.nanpercentile(Y, [5, 95], axis=1)
+    prom_thr = prom_frac * np.maximum(q95 - q5, _EPS)
+
+    rows, idx = _local_maxima_rows(Y)
+    distance = int(np.ceil(min_dist))
+    if distance > 1 and idx.size > 1:
+        close = (np.diff(idx) < distance) & (rows[1:] == rows[:-1])
+        redo = np.unique(rows[1:][close])
+        if redo.size:
+            keep = ~np.isin(rows, redo)
+            found = [find_peaks(Y[r], distance=min_dist)[0] for r in redo]
+            rows = np.concatenate([rows[keep]] + [np.full(pk.size, r, np.intp) for r, pk in zip(redo, found)])
+            idx = np.concatenate([idx[keep]] + found)
+            order = np.lexsort((idx, rows))
+            rows, idx = rows[order], idx[order]
+
+    prom, width = _prominences_and_widths(Y, rows, idx)
+    keep = (prom >= prom_thr[rows]) & (width >= float(min_width_nodes))
+    if require_full_prom:
+        keep &= (idx > 0) & (idx < (x.size - 1))
+    rows, idx, prom, width = rows[keep], idx[keep], prom[keep], width[keep]
+
+    pk_ref = _crest_index_rows(Y, idx, rows, half_win=2)
+    refined = _parabolic_refine_rows(x, Y, pk_ref, rows)
+    order = np.lexsort((refined, rows))
+    rows, idx, refined, prom, width = rows[order], idx[order], refined[order], prom[order], width[order]
+
+    offsets = np.zeros(R + 1, np.intp)
+    np.cumsum(np.bincount(rows, minlength=R), out=offsets[1:])
+    return RunPeaks(offsets, idx, refined, prom, width, Y[rows, idx])
+
+
+def _smooth_in_age(x: np.ndarray, y: np.ndarray, sigma_nodes: float) -> np.ndarray:
+    """
+    Gaussian-smooth `y` over the non-uniform grid `x` by age.
+
+    The kernel is `sigma_nodes` coarsest-grid steps wide, each node is weighted
+    by the width of its cell and the ends are mirrored half a step out, so
+    wherever the grid runs at its coarsest spacing the result is that of
+    `gaussian_filter1d(mode="reflect")` on the coarse grid alone.
+    """
+    dx = np.diff(x)
+    h = float(np.max(dx))
+    reach = int(4.0 * float(sigma_nodes) + 0.5) * h * (1.0 + 1e-9)
+    if not reach > 0.0:
+        return np.array(y, float)
+
+    left = x[x <= x[0] + reach]
+    right = x[x >= x[-1] - reach]
+    xe = np.concatenate([(2.0 * x[0] - dx[0]) - left[::-1], x, (2.0 * x[-1] + dx[-1]) - right[::-1]])
+    ye = np.concatenate([y[: left.size][::-1], y, y[y.size - right.size:][::-1]])
+    we = np.gradient(xe)
+
+    lo = np.searchsorted(xe, x - reach, side="left")
+    hi = np.searchsorted(xe, x + reach, side="right")
+    cols = lo[:, None] + np.arange(int(np.max(hi - lo)))
+    inside = cols < hi[:, None]
+    cols = np.minimum(cols, xe.size - 1)
+
+    d = (x[:, None] - xe[cols]) / (float(sigma_nodes) * h)
+    w = np.where(inside, np.exp(-0.5 * d * d) * we[cols], 0.0)
+    vals = ye[cols]
+    out = np.sum(w * np.where(inside, np.nan_to_num(vals), 0.0), axis=1) / np.sum(w, axis=1)
+    # NaNs spread over the kernel, as with gaussian_filter1d
+    out[np.any(inside & np.isnan(vals), axis=1)] = np.nan
+    return out
+
+
 def robust_ensemble_curve(
     S_runs: np.ndarray,
     smooth_frac: float = 0.01,
     *_,
+    age_grid: Optional[np.ndarray] = None,
     **__,
 ) -> Tuple[np.ndarray, float, float]:
-    """Return the lightly smoothed median ensemble curve and its dynamic range."""
+    """
+    Return the lightly smoothed median ensemble curve and its dynamic range.
+
+    On a non-uniform `age_grid` (an adaptively refined one) the smoothing
+    width is set in age, as on the uniform grid of the coarsest spacing, so
+    refined windows leave the curve elsewhere unchanged.
+    """
     S_runs = np.asarray(S_runs, float)
     if S_runs.ndim != 2 or S_runs.shape[1] < 3:
         return np.array([]), 0.0, 0.0
@@ -109,9 +337,15 @@ def robust_ensemble_curve(
     G = S_runs.shape[1]
     S_med = np.nanmedian(S_runs, axis=0)
 
-    sigma_nodes = float(smooth_frac) * float(G)
-    sigma_nodes = min(sigma_nodes, 2.0)
-    S_med_s = gaussian_filter1d(S_med, sigma=sigma_nodes, mode="reflect")
+    x = None if age_grid is None else np.asarray(age_grid, float)
+    if x is not None and x.size == G and not _is_uniform_grid(x) and np.all(np.diff(x) > 0.0):
+        G_coarse = float(x[-1] - x[0]) / float(np.max(np.diff(x))) + 1.0
+        sigma_nodes = min(float(smooth_frac) * G_coarse, 2.0)
+        S_med_s = _smooth_in_age(x, S_med, sigma_nodes)
+    else:
+        sigma_nodes = float(smooth_frac) * float(G)
+        sigma_nodes = min(sigma_nodes, 2.0)
+        S_med_s = gaussian_filter1d(S_med, sigma=sigma_nodes, mode="reflect")
 
     q5, q95 = np.nanpercentile(S_med_s, [5, 95])
     Delta = max(q95 - q5, _EPS)
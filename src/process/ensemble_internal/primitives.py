@@ -23,10 +23,23 @@ peak_widths = _peak_widths
 _EPS = 1e-12
 
 
-def _step_from_grid(x: np.ndarray) -> float:
+def _is_uniform_grid(x: np.ndarray) -> bool:
+    dx = np.diff(np.asarray(x, float))
+    return dx.size == 0 or bool(np.allclose(dx, dx[0], rtol=1e-6, atol=0.0))
+
+
+def _step_from_grid(x: np.ndarray, at: Optional[float] = None) -> float:
+    """
+    Grid spacing: the median step, or on a non-uniform grid the local
+    spacing around `at` (interpolated between neighbouring step midpoints).
+    """
     x = np.asarray(x, float)
     if x.size >= 2:
-        step = float(np.median(np.diff(x)))
+        dx = np.diff(x)
+        if at is not None and np.isfinite(at) and not _is_uniform_grid(x):
+            step = float(np.interp(float(at), 0.5 * (x[1:] + x[:-1]), dx))
+        else:
+            step = float(np.median(dx))
         if np.isfinite(step) and step > 0.0:
             return step
     return 1.0
@@ -87,7 +100,7 @@ def _append_diagnostic_peak(
 
     j_ref = _crest_index(y_ref, int(idx), half_win=2)
     age = float(_parabolic_refine(x, y_ref, j_ref))
-    step = _step_from_grid(x)
+    step = _step_from_grid(x, at=age)
     lo = float(ci_low) if ci_low is not None else max(float(x[0]), age - step)
     hi = float(ci_high) if ci_high is not None else min(float(x[-1]), age + step)
     tol = max(0.51 * step, 1e-6)
@@ -177,6 +190,50 @@ def _parabolic_refine(x: np.ndarray, y: np.ndarray, k: int) -> float:
     return float(min(max(xv, lo), hi))
 
 
+def _parabolic_refine_rows(x: np.ndarray, Y: np.ndarray, k: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    `_parabolic_refine(x, Y[rows[i]], k[i])` for every i; `rows` defaults to
+    one row of the (N × G) array `Y` per index.
+    """
+    x = np.asarray(x, float)
+    Y = np.asarray(Y, float)
+    k = np.asarray(k, np.intp)
+    rows = np.arange(k.size) if rows is None else np.asarray(rows, np.intp)
+    out = x[k].astype(float)
+    inner = (k > 0) & (k < Y.shape[1] - 1)
+    if not inner.any():
+        return out
+    sel = np.flatnonzero(inner)
+    ki, ri = k[sel], rows[sel]
+    # Squares as the scalar form takes them (float pow may differ from x * x in the last bit)
+    x_sq = np.array([float(v) ** 2 for v in x], float)
+    x0, x1, x2 = x[ki - 1], x[ki], x[ki + 1]
+    q0, q1, q2 = x_sq[ki - 1], x_sq[ki], x_sq[ki + 1]
+    y0, y1, y2 = Y[ri, ki - 1], Y[ri, ki], Y[ri, ki + 1]
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        denom = (x0 - x1) * (x0 - x2) * (x1 - x2)
+        a = (x2 * (y1 - y0) + x1 * (y0 - y2) + x0 * (y2 - y1)) / denom
+        b = (q2 * (y0 - y1) + q1 * (y2 - y0) + q0 * (y1 - y2)) / denom
+        xv = -b / (2.0 * a)
+    # min(max(xv, lo), hi) as the scalar form evaluates it, NaN vertices included
+    lo, hi = np.minimum(x0, x2), np.maximum(x0, x2)
+    xv = np.where(lo > xv, lo, xv)
+    xv = np.where(hi < xv, hi, xv)
+    flat = (np.abs(denom) <= _EPS) | (np.abs(a) < 1e-12)
+    out[sel] = np.where(flat, x1, xv)
+    return out
+
+
+def _nearest_index(x: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Index of the node of the ascending grid `x` nearest each value (lower node on ties)."""
+    x = np.asarray(x, float)
+    values = np.asarray(values, float)
+    pos = np.clip(np.searchsorted(x, values), 1, max(x.size - 1, 1))
+    lo = np.minimum(pos - 1, x.size - 1)
+    hi = np.minimum(pos, x.size - 1)
+    return np.where(np.abs(x[lo] - values) <= np.abs(x[hi] - values), lo, hi)
+
+
 def _crest_index(y: np.ndarray, k: int, half_win: int = 2) -> int:
     """Return a stable representative index for a local crest or flat top."""
     y = np.asarray(y, float)
@@ -190,3 +247,25 @@ def _crest_index(y: np.ndarray, k: int, half_win: int = 2) -> int:
     cand = np.where(np.isclose(seg, m, rtol=1e-12, atol=1e-15))[0]
     j_local = int(cand[len(cand) // 2])
     return int(a + j_local)
+
+
+def _crest_index_rows(Y: np.ndarray, k: np.ndarray, rows: np.ndarray, half_win: int = 2) -> np.ndarray:
+    """`_crest_index(Y[rows[i]], k[i], half_win)` for every i."""
+    Y = np.asarray(Y, float)
+    k = np.asarray(k, np.intp)
+    rows = np.asarray(rows, np.intp)
+    n = Y.shape[1]
+    a = np.maximum(1, k - int(half_win))
+    b = np.minimum(n - 2, k + int(half_win))
+    cols = a[:, None] + np.arange(2 * int(half_win) + 1)
+    inside = cols <= b[:, None]
+    seg = np.where(inside, Y[rows[:, None], np.minimum(cols, n - 1)], np.nan)
+    crest = np.isfinite(seg).any(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        m = np.nanmax(np.where(crest[:, None], seg, 0.0), axis=1)
+    cand = inside & np.isclose(seg, m[:, None], rtol=1e-12, atol=1e-15)
+    # The middle one of the candidates, as `cand[len(cand) // 2]`.
+    rank = np.cumsum(cand, axis=1)
+    j_local = np.argmax(cand & (rank == (rank[:, -1] // 2 + 1)[:, None]), axis=1)
+    return np.where(crest, a + j_local, k)
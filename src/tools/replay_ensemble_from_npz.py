@@ -3,7 +3,16 @@
 Replay CDC ensemble peak-picking from saved diagnostics NPZ files.
 
 This tool avoids expensive Monte Carlo re-runs by reusing saved run-surfaces
-(`*_runs_S.npz`) and rerunning only ensemble peak selection.
+(`*_runs_S.npz`, or a CDC_DIAG_FORMAT=npy surface store, whose arrays are
+memory-mapped rather than decompressed) and rerunning only ensemble peak
+selection.
+
+    replay_ensemble_from_npz.py --source DIR --out-dir OUT [--fp-values ...]
+    replay_ensemble_from_npz.py sweep --source DIR --out-dir OUT \
+        (--grid NAME=v1,v2,... | --lhs N --range NAME=lo:hi) [--jobs N]
+
+`sweep` evaluates a full grid or a Latin-hypercube design over the tested
+catalogue parameters (see `SWEEP_PARAMS`) and writes one tidy table.
 """
 
 from __future__ import annotations
@@ -12,10 +21,15 @@ import argparse
 import csv
 import io
 import json
+import itertools
+import os
 import re
+import sys
 import tarfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, Iterable, Iterator, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 
@@ -34,8 +48,9 @@ from process.cdcConfig import (
 )
 from process.cdc.filtering import _collapse_ci_clusters
 from process.cdc.surfaces import _smooth_frac_for_grid
+from process.cdcSurfaceStore import SurfaceStore, is_store
 from process.cdcUtils import infer_tier as _infer_tier
-from process.ensemble import build_ensemble_catalogue
+from process.ensemble import build_ensemble_catalogue, per_run_peaks_batch
 
 
 def _parse_float_list(text: str) -> List[float]:
@@ -46,7 +61,7 @@ def _parse_float_list(text: str) -> List[float]:
             continue
         vals.append(float(part))
     if not vals:
-        raise ValueError("No valid fp values supplied")
+        raise ValueError(f"No values supplied in {text!r}")
     return vals
 
 
@@ -56,46 +71,98 @@ def _fmt_list(vals: List[float], ndp: int = 4) -> str:
     return ";".join(f"{float(v):.{ndp}f}" for v in vals)
 
 
-def _iter_runs_npz(source: Path) -> Iterator[Tuple[str, str, Dict[str, np.ndarray]]]:
+# Arrays a replay reads from each *_runs_S.npz; other entries are never loaded.
+_NPZ_KEYS = ("age_Ma", "S_runs_raw", "S_runs_pen", "optima_Ma")
+
+
+def _iter_npz_sources(source: Path) -> Iterator[Tuple[str, str, object]]:
     """
-    Yield (sample_name, source_entry, arrays) for each *_runs_S.npz.
-    arrays keys: age_Ma, S_runs_raw, S_runs_pen, optima_Ma(optional)
+    Yield (sample_name, source_entry, payload) for each *_runs_S.npz, where
+    payload is the file's path (directories) or its bytes (.tar.gz). For a
+    surface store, payload is the sample's directory.
+
+    Archives are streamed: members are read in archive order as they are
+    decompressed, without listing the archive first.
     """
+    if is_store(source):
+        store = SurfaceStore(source)
+        for sample_name in store.samples():
+            sample_dir = store.sample_dir(sample_name)
+            yield sample_name, str(sample_dir), sample_dir
+        return
+
     if source.is_dir():
         for p in sorted(source.rglob("*_runs_S.npz")):
             if p.name.startswith("._"):
                 continue
-            sample = p.name[: -len("_runs_S.npz")]
-            # Manuscript archives are trusted local artifacts; allow pickle for older NPZ payloads.
-            with np.load(p, allow_pickle=True) as z:
-                out = {k: np.array(z[k]) for k in z.files}
-            yield sample, str(p), out
+            yield p.name[: -len("_runs_S.npz")], str(p), p
         return
 
     if source.is_file() and source.suffixes[-2:] == [".tar", ".gz"]:
-        with tarfile.open(source, "r:gz") as tf:
-            members = [
-                m
-                for m in tf.getmembers()
-                if m.isfile()
-                and m.name.endswith("_runs_S.npz")
-                and (not Path(m.name).name.startswith("._"))
-            ]
-            for m in sorted(members, key=lambda x: x.name):
-                sample = Path(m.name).name[: -len("_runs_S.npz")]
+        with tarfile.open(source, "r|gz") as tf:
+            for m in tf:
+                name = Path(m.name).name
+                if not (m.isfile() and name.endswith("_runs_S.npz")) or name.startswith("._"):
+                    continue
                 fh = tf.extractfile(m)
                 if fh is None:
                     continue
-                buf = io.BytesIO(fh.read())
-                # Manuscript archives are trusted local artifacts; allow pickle for older NPZ payloads.
-                with np.load(buf, allow_pickle=True) as z:
-                    out = {k: np.array(z[k]) for k in z.files}
-                yield sample, m.name, out
+                yield name[: -len("_runs_S.npz")], m.name, fh.read()
         return
 
     raise ValueError("source must be a directory or a .tar.gz file")
 
 
+def _load_runs_npz(payload, allow_pickle: bool = True) -> Dict[str, np.ndarray]:
+    """
+    The replay arrays of one NPZ (a path or its bytes), or memory-mapped
+    from a surface store sample directory.
+    arrays keys: age_Ma, S_runs_raw, S_runs_pen, optima_Ma(optional)
+    """
+    if isinstance(payload, Path) and payload.is_dir():
+        return {
+            k: np.load(payload / f"{k}.npy", mmap_mode="r", allow_pickle=False)
+            for k in _NPZ_KEYS
+            if (payload / f"{k}.npy").is_file()
+        }
+    fh = io.BytesIO(payload) if isinstance(payload, (bytes, bytearray)) else payload
+    # Manuscript archives are trusted local artifacts; pickle is allowed by default for older NPZ payloads.
+    with np.load(fh, allow_pickle=allow_pickle) as z:
+        return {k: np.array(z[k]) for k in _NPZ_KEYS if k in z.files}
+
+
+def _iter_runs_npz(source: Path, allow_pickle: bool = True) -> Iterator[Tuple[str, str, Dict[str, np.ndarray]]]:
+    """Yield (sample_name, source_entry, arrays) for each *_runs_S.npz."""
+    for sample_name, source_entry, payload in _iter_npz_sources(source):
+        yield sample_name, source_entry, _load_runs_npz(payload, allow_pickle)
+
+
+def _bounded_map(fn, tasks: Iterable, jobs: int) -> Iterator:
+    """
+    Yield fn(task) for every task, in task order, on `jobs` worker processes.
+
+    At most 2 * jobs tasks (and their payloads) are in flight: the task
+    iterator is only advanced as results are taken, so a fast reader cannot
+    run ahead of the workers.
+    """
+    if jobs <= 1:
+        for task in tasks:
+            yield fn(task)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending: deque = deque()
+        for task in tasks:
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fn, task))
+        while pending:
+            yield pending.popleft().result()
+
+
+def _jobs(args: argparse.Namespace) -> int:
+    return max(int(args.jobs or os.cpu_count() or 1), 1)
+
+
 def _postprocess_rows(
     rows: List[Dict],
     ages_ma: np.ndarray,
@@ -165,97 +232,112 @@ def _postprocess_rows(
     return rows
 
 
-def run(args: argparse.Namespace) -> int:
-    source = Path(args.source).expanduser()
-    out_dir = Path(args.out_dir).expanduser()
-    out_dir.mkdir(parents=True, exist_ok=True)
+def _replay_task(task) -> Tuple[List[Dict], List[Dict]]:
+    """Load one sample's surfaces and replay the catalogue at every fp value."""
+    args, fp_values, sample_name, source_entry, payload = task
+    arr = _load_runs_npz(payload, allow_pickle=bool(args.allow_pickle))
+    ages_ma = np.asarray(arr["age_Ma"], float)
+    s_raw = np.asarray(arr["S_runs_raw"], float)
+    s_pen = np.asarray(arr["S_runs_pen"], float)
+    optima_ma = np.asarray(arr["optima_Ma"], float) if "optima_Ma" in arr else None
+    smf = _smooth_frac_for_grid(ages_ma)
+    tier = _infer_tier(sample_name)
 
-    fp_values = _parse_float_list(args.fp_values)
-    sample_rx = re.compile(args.sample_regex) if args.sample_regex else None
+    s_runs = s_pen if args.surface == "pen" else s_raw
 
-    peaks_rows: List[Dict] = []
     summary_rows: List[Dict] = []
-    n_inputs = 0
-
-    for sample_name, source_entry, arr in _iter_runs_npz(source):
-        if sample_rx and not sample_rx.search(sample_name):
-            continue
-
-        n_inputs += 1
-        ages_ma = np.asarray(arr["age_Ma"], float)
-        s_raw = np.asarray(arr["S_runs_raw"], float)
-        s_pen = np.asarray(arr["S_runs_pen"], float)
-        optima_ma = np.asarray(arr["optima_Ma"], float) if "optima_Ma" in arr else None
-        smf = _smooth_frac_for_grid(ages_ma)
-        tier = _infer_tier(sample_name)
-
-        for fp in fp_values:
-            s_runs = s_pen if args.surface == "pen" else s_raw
-            rows = build_ensemble_catalogue(
-                sample_name,
-                tier,
-                ages_ma,
-                s_runs,
-                orientation="max",
-                smooth_frac=smf,
-                f_d=float(args.fd),
-                f_p=float(fp),
-                f_v=float(args.fv),
-                f_w=float(args.fw),
-                w_min_nodes=int(args.w_min_nodes),
-                support_min=float(args.support_min),
-                r_min=int(args.r_min),
-                f_r=float(args.f_r),
-                per_run_prom_frac=float(args.per_run_prom_frac),
-                per_run_min_dist=int(args.per_run_min_dist),
-                per_run_min_width=int(args.per_run_min_width),
-                per_run_require_full_prom=bool(args.per_run_require_full_prom),
-                delta_min=float(args.delta_min),
-                height_frac=float(args.height_frac),
-                optima_ma=optima_ma,
-            ) or []
-
-            rows = _postprocess_rows(
-                rows,
-                ages_ma,
-                support_min=float(args.support_min),
-                collapse_overlap=bool(args.collapse_overlap),
-                max_ci_frac=float(args.max_ci_frac),
+    peaks_rows: List[Dict] = []
+    for fp in fp_values:
+        rows = build_ensemble_catalogue(
+            sample_name,
+            tier,
+            ages_ma,
+            s_runs,
+            orientation="max",
+            smooth_frac=smf,
+            f_d=float(args.fd),
+            f_p=float(fp),
+            f_v=float(args.fv),
+            f_w=float(args.fw),
+            w_min_nodes=int(args.w_min_nodes),
+            support_min=float(args.support_min),
+            r_min=int(args.r_min),
+            f_r=float(args.f_r),
+            per_run_prom_frac=float(args.per_run_prom_frac),
+            per_run_min_dist=int(args.per_run_min_dist),
+            per_run_min_width=int(args.per_run_min_width),
+            per_run_require_full_prom=bool(args.per_run_require_full_prom),
+            delta_min=float(args.delta_min),
+            height_frac=float(args.height_frac),
+            optima_ma=optima_ma,
+        ) or []
+
+        rows = _postprocess_rows(
+            rows,
+            ages_ma,
+            support_min=float(args.support_min),
+            collapse_overlap=bool(args.collapse_overlap),
+            max_ci_frac=float(args.max_ci_frac),
+        )
+
+        ages = [float(r["age_ma"]) for r in rows]
+        cis = [f"{float(r['ci_low']):.4f}-{float(r['ci_high']):.4f}" for r in rows]
+        sup = [float(r.get("support", float("nan"))) for r in rows]
+
+        summary_rows.append(
+            dict(
+                sample=sample_name,
+                source_entry=source_entry,
+                surface=args.surface,
+                fp=float(fp),
+                n_runs=int(s_runs.shape[0]),
+                n_grid=int(s_runs.shape[1]),
+                n_peaks=len(rows),
+                peak_ages_ma=_fmt_list(ages, 4),
+                peak_ci_ma=";".join(cis),
+                peak_support=_fmt_list(sup, 4),
             )
+        )
 
-            ages = [float(r["age_ma"]) for r in rows]
-            cis = [f"{float(r['ci_low']):.4f}-{float(r['ci_high']):.4f}" for r in rows]
-            sup = [float(r.get("support", float("nan"))) for r in rows]
-
-            summary_rows.append(
+        for r in rows:
+            peaks_rows.append(
                 dict(
                     sample=sample_name,
                     source_entry=source_entry,
                     surface=args.surface,
                     fp=float(fp),
-                    n_runs=int(s_runs.shape[0]),
-                    n_grid=int(s_runs.shape[1]),
-                    n_peaks=len(rows),
-                    peak_ages_ma=_fmt_list(ages, 4),
-                    peak_ci_ma=";".join(cis),
-                    peak_support=_fmt_list(sup, 4),
+                    peak_no=int(r.get("peak_no", 0)),
+                    age_ma=float(r["age_ma"]),
+                    ci_low_ma=float(r["ci_low"]),
+                    ci_high_ma=float(r["ci_high"]),
+                    support=float(r.get("support", float("nan"))),
                 )
             )
+    return summary_rows, peaks_rows
 
-            for r in rows:
-                peaks_rows.append(
-                    dict(
-                        sample=sample_name,
-                        source_entry=source_entry,
-                        surface=args.surface,
-                        fp=float(fp),
-                        peak_no=int(r.get("peak_no", 0)),
-                        age_ma=float(r["age_ma"]),
-                        ci_low_ma=float(r["ci_low"]),
-                        ci_high_ma=float(r["ci_high"]),
-                        support=float(r.get("support", float("nan"))),
-                    )
-                )
+
+def run(args: argparse.Namespace) -> int:
+    source = Path(args.source).expanduser()
+    out_dir = Path(args.out_dir).expanduser()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    fp_values = _parse_float_list(args.fp_values)
+    sample_rx = re.compile(args.sample_regex) if args.sample_regex else None
+
+    peaks_rows: List[Dict] = []
+    summary_rows: List[Dict] = []
+    n_inputs = 0
+
+    # The archive is read sequentially here; loading and replaying run in the workers.
+    tasks = (
+        (args, fp_values, sample_name, source_entry, payload)
+        for sample_name, source_entry, payload in _iter_npz_sources(source)
+        if not (sample_rx and not sample_rx.search(sample_name))
+    )
+    for sample_summary, sample_peaks in _bounded_map(_replay_task, tasks, _jobs(args)):
+        n_inputs += 1
+        summary_rows.extend(sample_summary)
+        peaks_rows.extend(sample_peaks)
 
     summary_csv = out_dir / "replay_summary.csv"
     peaks_csv = out_dir / "replay_peaks.csv"
@@ -310,16 +392,251 @@ def run(args: argparse.Namespace) -> int:
     return 0
 
 
-def build_parser() -> argparse.ArgumentParser:
-    ap = argparse.ArgumentParser(
-        description="Replay CDC ensemble peak-picking from saved *_runs_S.npz surfaces."
+# Tested cdcConfig parameters a sweep can vary: name -> (args attribute, type).
+SWEEP_PARAMS: Dict[str, Tuple[str, type]] = {
+    "PER_RUN_PROM_FRAC": ("per_run_prom_frac", float),
+    "PER_RUN_MIN_DIST": ("per_run_min_dist", int),
+    "PER_RUN_MIN_WIDTH": ("per_run_min_width", int),
+    "FD_DIST_FRAC": ("fd", float),
+    "FP_PROM_FRAC": ("fp", float),
+    "FS_SUPPORT": ("support_min", float),
+    "RMIN_RUNS": ("r_min", int),
+    "FV_VALLEY_FRAC": ("fv", float),
+    "ENS_DELTA_MIN": ("delta_min", float),
+}
+
+# Parameters the per-run peak detection depends on; points sharing them share peaks.
+_PEAK_PARAMS = ("PER_RUN_PROM_FRAC", "PER_RUN_MIN_DIST", "PER_RUN_MIN_WIDTH")
+
+SWEEP_FIELDS = (
+    ["sample", "source_entry", "surface", "point"]
+    + list(SWEEP_PARAMS)
+    + ["n_runs", "n_grid", "n_peaks", "peak_no", "age_ma", "ci_low_ma", "ci_high_ma", "support"]
+)
+
+
+def _sweep_name(text: str) -> str:
+    name = str(text).strip().upper()
+    if name not in SWEEP_PARAMS:
+        raise ValueError(f"Unknown sweep parameter {text!r}; choose from {', '.join(SWEEP_PARAMS)}")
+    return name
+
+
+def _parse_assignment(text: str) -> Tuple[str, str]:
+    name, sep, value = str(text).partition("=")
+    if not sep:
+        raise ValueError(f"Expected NAME=VALUES, got {text!r}")
+    return _sweep_name(name), value
+
+
+def _grid_design(specs: List[str]) -> List[Dict[str, float]]:
+    """Full factorial design from `NAME=v1,v2,...` specs."""
+    axes = {}
+    for spec in specs:
+        name, values = _parse_assignment(spec)
+        cast = SWEEP_PARAMS[name][1]
+        axes[name] = [cast(v) for v in _parse_float_list(values)]
+    return [dict(zip(axes, combo)) for combo in itertools.product(*axes.values())]
+
+
+def _lhs_design(specs: List[str], n_points: int, seed: int) -> List[Dict[str, float]]:
+    """Latin-hypercube design of `n_points` over `NAME=lo:hi` ranges (integers rounded)."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for spec in specs:
+        name, bounds = _parse_assignment(spec)
+        lo, sep, hi = bounds.partition(":")
+        if not sep:
+            raise ValueError(f"Expected NAME=lo:hi, got {spec!r}")
+        lo, hi = float(lo), float(hi)
+        # One point per stratum, strata in random order.
+        u = (rng.permutation(n_points) + rng.random(n_points)) / n_points
+        values = lo + (hi - lo) * u
+        cast = SWEEP_PARAMS[name][1]
+        columns[name] = [cast(round(v)) if cast is int else float(v) for v in values]
+    return [{name: col[i] for name, col in columns.items()} for i in range(n_points)]
+
+
+def _point_params(args: argparse.Namespace, point: Dict[str, float]) -> Dict[str, float]:
+    """Every sweep parameter at `point`; unswept ones come from the command line."""
+    params = {}
+    for name, (attr, cast) in SWEEP_PARAMS.items():
+        params[name] = cast(point.get(name, getattr(args, attr)))
+    return params
+
+
+def _catalogue_kwargs(args: argparse.Namespace, params: Dict[str, float]) -> Dict:
+    return dict(
+        orientation="max",
+        f_d=float(params["FD_DIST_FRAC"]),
+        f_p=float(params["FP_PROM_FRAC"]),
+        f_v=float(params["FV_VALLEY_FRAC"]),
+        f_w=float(args.fw),
+        w_min_nodes=int(args.w_min_nodes),
+        support_min=float(params["FS_SUPPORT"]),
+        r_min=int(params["RMIN_RUNS"]),
+        f_r=float(args.f_r),
+        per_run_prom_frac=float(params["PER_RUN_PROM_FRAC"]),
+        per_run_min_dist=int(params["PER_RUN_MIN_DIST"]),
+        per_run_min_width=int(params["PER_RUN_MIN_WIDTH"]),
+        per_run_require_full_prom=bool(args.per_run_require_full_prom),
+        delta_min=float(params["ENS_DELTA_MIN"]),
+        height_frac=float(args.height_frac),
+    )
+
+
+def _sweep_task(task) -> List[Dict]:
+    """
+    Evaluate a group of design points that share per-run peak parameters on
+    one sample's surface: peaks are detected once, then every point reuses them.
+    """
+    args, sample_name, source_entry, ages_ma, s_runs, optima_ma, points = task
+    tier = _infer_tier(sample_name)
+    smf = _smooth_frac_for_grid(ages_ma)
+    first = points[0][1]
+    run_peaks = per_run_peaks_batch(
+        ages_ma,
+        s_runs,
+        prom_frac=float(first["PER_RUN_PROM_FRAC"]),
+        min_dist=int(first["PER_RUN_MIN_DIST"]),
+        min_width_nodes=int(first["PER_RUN_MIN_WIDTH"]),
+        require_full_prom=bool(args.per_run_require_full_prom),
     )
-    ap.add_argument("--source", required=True, help="Directory or .tar.gz containing *_runs_S.npz files")
-    ap.add_argument("--out-dir", required=True, help="Output directory for replay CSV/JSON files")
+
+    out: List[Dict] = []
+    for point_no, params in points:
+        rows = build_ensemble_catalogue(
+            sample_name,
+            tier,
+            ages_ma,
+            s_runs,
+            smooth_frac=smf,
+            optima_ma=optima_ma,
+            per_run_peaks_list=run_peaks,
+            **_catalogue_kwargs(args, params),
+        ) or []
+        rows = _postprocess_rows(
+            rows,
+            ages_ma,
+            support_min=float(params["FS_SUPPORT"]),
+            collapse_overlap=bool(args.collapse_overlap),
+            max_ci_frac=float(args.max_ci_frac),
+        )
+        base = dict(
+            sample=sample_name,
+            source_entry=source_entry,
+            surface=args.surface,
+            point=point_no,
+            **params,
+            n_runs=int(s_runs.shape[0]),
+            n_grid=int(s_runs.shape[1]),
+            n_peaks=len(rows),
+        )
+        # A point without peaks still gets a row, with peak_no 0.
+        nan = float("nan")
+        for r in rows or [None]:
+            out.append(
+                dict(
+                    base,
+                    peak_no=int(r.get("peak_no", 0)) if r else 0,
+                    age_ma=float(r["age_ma"]) if r else nan,
+                    ci_low_ma=float(r["ci_low"]) if r else nan,
+                    ci_high_ma=float(r["ci_high"]) if r else nan,
+                    support=float(r.get("support", nan)) if r else nan,
+                )
+            )
+    return out
+
+
+def _sweep_tasks(args, design, source: Path) -> Iterator[tuple]:
+    """One task per (sample, per-run peak parameters, chunk of points)."""
+    sample_rx = re.compile(args.sample_regex) if args.sample_regex else None
+    groups: Dict[tuple, List[Tuple[int, Dict[str, float]]]] = {}
+    for point_no, point in enumerate(design):
+        params = _point_params(args, point)
+        groups.setdefault(tuple(params[name] for name in _PEAK_PARAMS), []).append((point_no, params))
+    chunk = max(int(args.chunk_size), 1)
+
+    for sample_name, source_entry, arr in _iter_runs_npz(source, allow_pickle=bool(args.allow_pickle)):
+        if sample_rx and not sample_rx.search(sample_name):
+            continue
+        ages_ma = np.asarray(arr["age_Ma"], float)
+        s_runs = np.asarray(arr["S_runs_pen" if args.surface == "pen" else "S_runs_raw"], float)
+        optima_ma = np.asarray(arr["optima_Ma"], float) if "optima_Ma" in arr else None
+        for points in groups.values():
+            for start in range(0, len(points), chunk):
+                yield args, sample_name, source_entry, ages_ma, s_runs, optima_ma, points[start:start + chunk]
+
+
+def run_sweep(args: argparse.Namespace) -> int:
+    source = Path(args.source).expanduser()
+    out_dir = Path(args.out_dir).expanduser()
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    if bool(args.grid) == bool(args.lhs):
+        raise ValueError("Give either --grid or --lhs (with --range)")
+    if args.lhs:
+        if not args.range:
+            raise ValueError("--lhs needs at least one --range NAME=lo:hi")
+        design = _lhs_design(args.range, int(args.lhs), int(args.seed))
+    else:
+        design = _grid_design(args.grid)
+
+    results_csv = out_dir / "sweep_results.csv"
+    meta_json = out_dir / "sweep_meta.json"
+    n_rows = 0
+    samples = set()
+
+    with results_csv.open("w", newline="") as fh:
+        w = csv.DictWriter(fh, fieldnames=SWEEP_FIELDS)
+        w.writeheader()
+
+        def emit(rows):
+            nonlocal n_rows
+            w.writerows(rows)
+            fh.flush()
+            n_rows += len(rows)
+            samples.update(r["sample"] for r in rows)
+
+        for rows in _bounded_map(_sweep_task, _sweep_tasks(args, design, source), _jobs(args)):
+            emit(rows)
+
+    meta = dict(
+        source=str(source),
+        n_points=len(design),
+        n_samples_processed=len(samples),
+        n_result_rows=n_rows,
+        design=design,
+        args=vars(args),
+    )
+    meta_json.write_text(json.dumps(meta, indent=2))
+
+    print(f"Wrote {results_csv}")
+    print(f"Wrote {meta_json}")
+    print(f"Swept {len(design)} points over {len(samples)} samples")
+    return 0
+
+
+def _add_source_args(ap: argparse.ArgumentParser) -> None:
+    ap.add_argument(
+        "--source",
+        required=True,
+        help="Directory or .tar.gz containing *_runs_S.npz files, or a surface store directory",
+    )
+    ap.add_argument("--out-dir", required=True, help="Output directory for CSV/JSON files")
     ap.add_argument("--surface", choices=("pen", "raw"), default="pen", help="Surface to pick on")
-    ap.add_argument("--fp-values", default=f"{FP_PROM_FRAC}", help="Comma-separated fp values (e.g. 0.10,0.07,0.05)")
     ap.add_argument("--sample-regex", default="", help="Optional regex to filter sample names")
+    ap.add_argument("--jobs", type=int, default=0, help="Worker processes (default: CPU count)")
+    ap.add_argument(
+        "--no-pickle",
+        dest="allow_pickle",
+        action="store_false",
+        default=True,
+        help="Load NPZ files without pickle support (object arrays are refused)",
+    )
 
+
+def _add_catalogue_args(ap: argparse.ArgumentParser) -> None:
     ap.add_argument("--delta-min", type=float, default=ENS_DELTA_MIN)
     ap.add_argument("--fd", type=float, default=FD_DIST_FRAC)
     ap.add_argument("--fv", type=float, default=FV_VALLEY_FRAC)
@@ -348,12 +665,46 @@ def build_parser() -> argparse.ArgumentParser:
         help="Disable CI-overlap collapse post-filter",
     )
     ap.add_argument("--max-ci-frac", type=float, default=0.50, help="Drop peaks with CI width above this fraction of grid span")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        description="Replay CDC ensemble peak-picking from saved *_runs_S.npz surfaces."
+    )
+    _add_source_args(ap)
+    ap.add_argument("--fp-values", default=f"{FP_PROM_FRAC}", help="Comma-separated fp values (e.g. 0.10,0.07,0.05)")
+    _add_catalogue_args(ap)
+    return ap
+
+
+def build_sweep_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(
+        prog="replay_ensemble_from_npz.py sweep",
+        description="Sweep the tested catalogue parameters over saved *_runs_S.npz surfaces.",
+    )
+    _add_source_args(ap)
+    ap.add_argument(
+        "--grid",
+        action="append",
+        default=[],
+        metavar="NAME=v1,v2,...",
+        help=f"Full-grid axis (repeatable); NAME is one of {', '.join(SWEEP_PARAMS)}",
+    )
+    ap.add_argument("--lhs", type=int, default=0, metavar="N", help="Latin-hypercube design of N points over --range")
+    ap.add_argument("--range", action="append", default=[], metavar="NAME=lo:hi", help="Latin-hypercube range (repeatable)")
+    ap.add_argument("--seed", type=int, default=0, help="Latin-hypercube seed")
+    ap.add_argument("--chunk-size", type=int, default=32, help="Design points per task")
+    ap.add_argument("--fp", type=float, default=FP_PROM_FRAC)
+    _add_catalogue_args(ap)
     return ap
 
 
-def main() -> int:
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv[:1] == ["sweep"]:
+        return run_sweep(build_sweep_parser().parse_args(argv[1:]))
     ap = build_parser()
-    args = ap.parse_args()
+    args = ap.parse_args(argv)
     return run(args)
 
 
@@ -1,8 +1,18 @@
+import atexit
+import importlib
+import threading
+import time
 import traceback
 from enum import Enum
-from multiprocessing import Process, Queue, Value
+from multiprocessing import Array, Process, Queue
+from queue import Empty
 
-from PyQt5.QtCore import pyqtSignal, QThread
+from PyQt5.QtCore import QThread
+
+from model.monteCarloRun import MonteCarloRun
+from process.cdc import transport
+from process.cdc.state import ProgressType
+from utils import config
 
 
 class SignalType(Enum):
@@ -14,37 +24,126 @@ class SignalType(Enum):
     SKIPPED = 6,
 
 
+class CancellationToken():
+    """
+    Cancellation flag of one job.
+
+    Jobs share one array inherited by every worker process; a job is cancelled
+    when its slot holds its own id, so slots are reused without being reset.
+    Job ids start at 1 because empty slots hold 0.
+    """
+    def __init__(self, cancelled, jobId):
+        self._cancelled = cancelled
+        self.jobId = jobId
+
+    def _slot(self):
+        return self.jobId % len(self._cancelled)
+
+    def cancel(self):
+        self._cancelled[self._slot()] = self.jobId
+
+    def isCancelled(self):
+        return self._cancelled[self._slot()] == self.jobId
+
+
 """
-An object that the child process uses to send information to the PyQT thread
+An object that the child process uses to send information to the PyQT thread.
+
+Progress is coalesced over a short time window: bare (kind, fraction) updates
+keep only the latest fraction, and Monte Carlo run payloads are batched into a
+list per sample. Pending updates are flushed when the window elapses, before
+any other message (so ordering is preserved) and at task boundaries;
+completion, cancellation and errors are always delivered immediately.
 """
 class ProcessSignals():
-    def __init__(self):
-        self.queue = Queue()
-        self._halt = Value('i', 0)
+    def __init__(self, window=None, queue=None, token=None, jobId=None):
+        self.queue = Queue() if queue is None else queue
+        # A standalone token of its own (job ids start at 1; empty slots hold 0)
+        self.token = CancellationToken(Array('q', 1), 1) if token is None else token
+        # Messages are tagged with the job id when they share a pool's result queue
+        self.jobId = jobId
+        # Monte Carlo runs are published through shared memory where available
+        self.sharedRuns = transport.available()
+        self.window = config.PROGRESS_COALESCE_WINDOW if window is None else float(window)
+        self._pendingFractions = {}
+        self._pendingRuns = None
+        self._lastFlush = time.monotonic()
 
     def newTask(self, *args):
-        self.queue.put((SignalType.NEW_TASK, *args))
+        self._send((SignalType.NEW_TASK, *args))
 
     def progress(self, *args):
-        self.queue.put((SignalType.PROGRESS, *args))
+        if self.window > 0 and self._coalesce(args):
+            if time.monotonic() - self._lastFlush >= self.window:
+                self.flush()
+            return
+        self._send((SignalType.PROGRESS, *args))
 
     def completed(self, *args):
-        self.queue.put((SignalType.COMPLETED, *args))
+        self._send((SignalType.COMPLETED, *args))
 
     def cancelled(self, *args):
-        self.queue.put((SignalType.CANCELLED, *args))
+        self._send((SignalType.CANCELLED, *args))
 
     def errored(self, *args):
-        self.queue.put((SignalType.ERRORED, *args))
+        self._send((SignalType.ERRORED, *args))
 
     def halt(self):
-        return self._halt.value == 1
+        if self._pendingFractions or self._pendingRuns:
+            if time.monotonic() - self._lastFlush >= self.window:
+                self.flush()
+        return self.token.isCancelled()
 
     def setHalt(self):
-        self._halt.value = 1
+        self.token.cancel()
 
     def skipped(self, sample_name, skip_reason):
-        self.queue.put((SignalType.SKIPPED, sample_name, skip_reason))
+        self._send((SignalType.SKIPPED, sample_name, skip_reason))
+
+    def _put(self, message):
+        self.queue.put(message if self.jobId is None else (self.jobId, *message))
+
+    def _send(self, message):
+        self.flush()
+        self._put(message)
+
+    def _coalesce(self, args):
+        """Hold a progress update back if it can be merged; False if it must be sent."""
+        if not args or not isinstance(args[0], ProgressType):
+            return False
+        if len(args) == 2:
+            self._pendingFractions[args[0]] = args[1]
+            return True
+        if args[0] is not ProgressType.SAMPLING or len(args) != 4:
+            return False
+
+        _, fraction, sampleName, payload = args
+        if not isinstance(payload, (MonteCarloRun, transport.RunRows)):
+            return False
+        if self._pendingRuns is not None and self._pendingRuns[0] != sampleName:
+            self.flush()
+        if self._pendingRuns is None:
+            self._pendingRuns = (sampleName, fraction, [])
+        payloads = self._pendingRuns[2]
+        last = payloads[-1] if payloads else None
+        if isinstance(payload, transport.RunRows) and isinstance(last, transport.RunRows) \
+                and last.stop == payload.start:
+            payloads[-1] = transport.RunRows(last.start, payload.stop)
+        else:
+            payloads.append(payload)
+        self._pendingRuns = (sampleName, fraction, payloads)
+        return True
+
+    def flush(self):
+        """Send any coalesced progress now."""
+        for kind, fraction in self._pendingFractions.items():
+            self._put((SignalType.PROGRESS, kind, fraction))
+        self._pendingFractions = {}
+        if self._pendingRuns is not None:
+            sampleName, fraction, payloads = self._pendingRuns
+            self._put((SignalType.PROGRESS, ProgressType.SAMPLING, fraction, sampleName, payloads))
+            self._pendingRuns = None
+        self._lastFlush = time.monotonic()
 
 
 # Can't be part of AsyncTask as this function must be picklable under windows:
@@ -57,51 +156,90 @@ def wrappedJobFn(jobFn, processSignals, *args):
         processSignals.errored(e)
 
 
-class AsyncTask(QThread):
+def _workerMain(jobQueue, resultQueue, cancelled, running, index):
     """
-    Runs a job in a separate process and forwards messages from the job to the
-    main thread through a pyqtSignal.
+    Loop of one pool process: run queued jobs until the None sentinel.
+    `running[index]` holds the id of the job in progress (0 when idle), so the
+    pool can tell which job a dead process took with it.
     """
-    msg_from_job = pyqtSignal(object)
-    running = True
+    for name in _PREWARMED_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
 
-    def __init__(self, pyqtSignals, jobFn, *args):
-        super().__init__()
-        self.jobFn = jobFn
-        self.args = args
+    while True:
+        job = jobQueue.get()
+        if job is None:
+            return
+        jobId, jobFn, args = job
+        running[index] = jobId
+        signals = ProcessSignals(queue=resultQueue, token=CancellationToken(cancelled, jobId), jobId=jobId)
+        if signals.halt():
+            # Halted before it started: still tell the GUI it was cancelled
+            signals.cancelled()
+        else:
+            wrappedJobFn(jobFn, signals, *args)
+        signals.flush()
+        # End-of-job marker, sent whether or not the job reported completion
+        resultQueue.put((jobId, None))
+        running[index] = 0
+
+
+# Imported by each pool process on start so the first job does not pay for it
+_PREWARMED_MODULES = ("numpy", "scipy.stats", "process.processing", "process.cdcHeatmap")
+
+# Number of cancellation slots; must exceed the number of jobs alive at once
+_CANCELLATION_SLOTS = 1024
+
+# Seconds between checks that the pool processes are still alive
+_WORKER_CHECK_INTERVAL = 0.5
+
+
+class PoolJob():
+    """Handle of a job submitted to a WorkerPool."""
+    def __init__(self, pool, jobId, pyqtSignals):
+        self.jobId = jobId
         self.pyqtSignals = pyqtSignals
-        self.processSignals = ProcessSignals()
+        self.token = CancellationToken(pool._cancelled, jobId)
+        self.finished = False
+        self.discarded = False
 
-    def run(self):
-        self.running = True
+    def isRunning(self):
+        return not self.finished
 
-        p = Process(target=wrappedJobFn, args=(self.jobFn, self.processSignals, *self.args))
-        p.start()
-        while self.running:
-            self._processOutput(self.processSignals.queue.get())
+    def halt(self):
+        """Ask the job to stop; its remaining messages (e.g. CANCELLED) are still delivered."""
+        self.token.cancel()
+
+    def discard(self):
+        """Stop the job and drop anything it still sends."""
+        self.discarded = True
+        self.token.cancel()
 
     def _processOutput(self, output):
         if output[0] is SignalType.NEW_TASK:
             self.pyqtSignals.processingNewTask.emit(output[1])
 
         if output[0] is SignalType.PROGRESS:
-            self.pyqtSignals.processingProgress.emit(output[1:])
+            args = output[1:]
+            if args and isinstance(args[-1], transport.SharedRunBlockHandle):
+                # Map the block here so the main thread only receives views
+                args = args[:-1] + (transport.SharedRunBlock.attach(args[-1]),)
+            self.pyqtSignals.processingProgress.emit(args)
             return
 
         if output[0] is SignalType.COMPLETED:
             self.pyqtSignals.processingCompleted.emit(output[1:])
-            self.running = False
             return
 
         if output[0] is SignalType.CANCELLED:
             self.pyqtSignals.processingCancelled.emit()
-            self.running = False
             return
 
         if output[0] is SignalType.ERRORED:
             error = output[1] if len(output) > 1 else RuntimeError("Unknown processing error")
             self.pyqtSignals.processingErrored.emit(error)
-            self.running = False
             return
 
         if output[0] is SignalType.SKIPPED:
@@ -110,5 +248,144 @@ class AsyncTask(QThread):
             self.pyqtSignals.processingSkipped.emit(sample_name, skip_reason)
             return
 
-    def halt(self):
-        self.processSignals.setHalt()
+
+class _ResultDispatcher(QThread):
+    """
+    Forwards messages from the pool's result queue to each job's pyqtSignals,
+    and replaces pool processes that die.
+    """
+    def __init__(self, pool):
+        super().__init__()
+        self.pool = pool
+
+    def run(self):
+        lastCheck = time.monotonic()
+        while True:
+            try:
+                message = self.pool._results.get(timeout=_WORKER_CHECK_INTERVAL)
+            except Empty:
+                message = ()
+            if message is None:
+                return
+            if message:
+                self.pool._dispatch(message)
+            if not message or time.monotonic() - lastCheck >= _WORKER_CHECK_INTERVAL:
+                self.pool._replaceDeadWorkers()
+                lastCheck = time.monotonic()
+
+
+class WorkerPool():
+    """
+    Long-lived processes that run jobs submitted from the GUI.
+
+    The processes are started once (importing the processing modules up
+    front) and reused for every job. Each job gets an id and a cancellation
+    token; messages of discarded jobs are dropped instead of reaching the GUI.
+    A process that dies (e.g. killed for running out of memory) errors the
+    job it was running and is replaced.
+    """
+    _shared = None
+
+    def __init__(self, processes=None):
+        self.processes = config.WORKER_POOL_PROCESSES if processes is None else int(processes)
+        self._jobsQueue = Queue()
+        self._results = Queue()
+        self._cancelled = Array('q', _CANCELLATION_SLOTS)
+        self._running = Array('q', max(1, self.processes))
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._nextJobId = 1
+        self._workers = []
+        self._dispatcher = None
+        self._closing = False
+
+    @classmethod
+    def shared(cls):
+        """The application's pool, started on first use."""
+        if cls._shared is None:
+            cls._shared = cls()
+            cls._shared.start()
+        return cls._shared
+
+    def start(self):
+        # Blocks a worker creates but never delivers are then unlinked at exit
+        transport.share_resource_tracker()
+        self._workers = [self._startWorker(index) for index in range(max(1, self.processes))]
+        self._dispatcher = _ResultDispatcher(self)
+        self._dispatcher.start()
+        atexit.register(self.shutdown)
+
+    def _startWorker(self, index):
+        # Not daemonic: jobs may start process pools of their own
+        worker = Process(
+            target=_workerMain,
+            args=(self._jobsQueue, self._results, self._cancelled, self._running, index),
+        )
+        worker.start()
+        return worker
+
+    def _replaceDeadWorkers(self):
+        """Error the job of each pool process that has died, and start a new process in its place."""
+        lost = []
+        with self._lock:
+            if self._closing:
+                return
+            for index, worker in enumerate(self._workers):
+                if worker.is_alive():
+                    continue
+                job = self._jobs.pop(self._running[index], None)
+                self._running[index] = 0
+                if job is not None:
+                    lost.append((job, worker.exitcode))
+                self._workers[index] = self._startWorker(index)
+        for job, exitcode in lost:
+            if not job.discarded:
+                error = RuntimeError(f"The processing worker exited unexpectedly (exit code {exitcode})")
+                job.pyqtSignals.processingErrored.emit(error)
+            job.finished = True
+
+    def submit(self, pyqtSignals, jobFn, *args):
+        with self._lock:
+            jobId = self._nextJobId
+            self._nextJobId += 1
+            job = PoolJob(self, jobId, pyqtSignals)
+            self._jobs[jobId] = job
+        self._jobsQueue.put((jobId, jobFn, args))
+        return job
+
+    def _dispatch(self, message):
+        jobId, output = message[0], message[1:]
+        with self._lock:
+            job = self._jobs.get(jobId)
+            if job is not None and output[0] is None:
+                job.finished = True
+                del self._jobs[jobId]
+                return
+        if output[0] is None:
+            return
+        if job is None or job.discarded:
+            if output[0] is SignalType.PROGRESS and isinstance(output[-1], transport.SharedRunBlockHandle):
+                # Unlink the block even though nobody will read it
+                transport.SharedRunBlock.attach(output[-1])
+            return
+        job._processOutput(output)
+
+    def shutdown(self):
+        if not self._workers:
+            return
+        with self._lock:
+            self._closing = True
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.discard()
+        for _ in self._workers:
+            self._jobsQueue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=5)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        self._results.put(None)
+        self._dispatcher.wait()
+        if WorkerPool._shared is self:
+            WorkerPool._shared = None
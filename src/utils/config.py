@@ -69,3 +69,14 @@ PREDICTION_COLOUR_1 = tuple(v/255.0 for v in PREDICTION_COLOUR_255[0:3])
 OPTIMAL_COLOUR_1 = tuple(v/255.0 for v in OPTIMAL_COLOUR_255[0:3])
 
 HEATMAP_RESOLUTION = 100
+
+################
+## Processing ##
+################
+
+# Window (seconds) over which the processing process coalesces progress messages;
+# 0 sends every message as soon as it is produced
+PROGRESS_COALESCE_WINDOW = 0.1
+
+# Long-lived processes that run processing and heatmap jobs
+WORKER_POOL_PROCESSES = 2
@@ -1,9 +1,7 @@
 import numpy as np
 from PyQt5.QtCore import pyqtSignal, QObject
-from controller.signals import ProcessingSignals
-from process import processing
+from process.cdcHeatmap import HeatmapAccumulator
 from utils import config
-from utils.asynchronous import AsyncTask
 
 _MARKER_STYLE = dict(
     marker="v", s=60, facecolors="none",
@@ -39,10 +37,11 @@ class HeatmapAxis:
         self._curve_vals = None
         self._curve_line = None
 
-        self.processingSignals = ProcessingSignals()
-        self.processingSignals.processingProgress.connect(self._plotRuns)
+        # Streaming heatmap state; runs are ingested once as they arrive
+        self._heatmap = None
+        self._heatmapRuns = None
+        self._heatmapSeen = 0
         self._plot_seq = 0
-        self._worker = None
 
         self.clearAll()
 
@@ -87,6 +86,7 @@ class HeatmapAxis:
             self._curve_vals = None
             self._peaks_ma = None
             self._boundary_rows = []
+            self._heatmap = None
 
     def _draw_curve_overlay(self):
         """Draw cached ensemble curve on heatmap in matching coordinates."""
@@ -128,23 +128,17 @@ class HeatmapAxis:
             self.axis.scatter(xs, ys, zorder=32, **_BOUNDARY_STYLE)
 
     def plotRuns(self, runs, settings):
-        # Cancel any in-flight heatmap worker before starting a new one.
-        if self._worker is not None:
-            try:
-                if self._worker.isRunning():
-                    self._worker.halt()
-            except Exception:
-                pass
+        # Only runs added since the last refresh are ingested; a different or
+        # shrunk run list (e.g. after re-processing) starts a fresh heatmap.
+        if self._heatmap is None or runs is not self._heatmapRuns or len(runs) < self._heatmapSeen:
+            self._heatmap = HeatmapAccumulator(config.HEATMAP_RESOLUTION)
+            self._heatmapRuns = runs
+            self._heatmapSeen = 0
+        self._heatmap.addRuns(runs[self._heatmapSeen:])
+        self._heatmapSeen = len(runs)
+
         self._plot_seq += 1
-        seq = int(self._plot_seq)
-        self._worker = AsyncTask(
-            self.processingSignals,
-            processing.calculateHeatmapData,
-            runs,
-            settings,
-            seq,
-        )
-        self._worker.start()
+        self._plotRuns((self._plot_seq, self._heatmap.density(), settings))
 
     def _plotRuns(self, args):
         if not isinstance(args, tuple):
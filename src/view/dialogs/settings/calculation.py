@@ -20,6 +20,7 @@ class LeadLossCalculationSettingsDialog(AbstractSettingsDialog):
         super().__init__(defaultSettings, *args, **kwargs)
         self.setWindowTitle("Calculation settings")
         self._onDiscordanceTypeChanged()
+        self._syncAdaptiveGridControls()
         self._syncPeakControls()
         self._alignLabels()
 
@@ -64,11 +65,26 @@ class LeadLossCalculationSettingsDialog(AbstractSettingsDialog):
         self.minimumRimAgeInput = AgeInput(validation=self._validate, defaultValue=defaults.minimumRimAge)
         self.maximumRimAgeInput = AgeInput(validation=self._validate, defaultValue=defaults.maximumRimAge)
         self.rimAgesSampledInput = IntInput(validation=self._validate, defaultValue=defaults.rimAgesSampled)
+        self.nestedRimAgeGridCB = QCheckBox(self)
+        self.nestedRimAgeGridCB.setChecked(bool(getattr(defaults, "nestedRimAgeGrid", False)))
+        self.nestedRimAgeGridCB.setToolTip("Round the number of samples up to 2^k + 1 so that denser grids reuse every node of coarser ones")
+        self.nestedRimAgeGridCB.stateChanged.connect(self._validate)
+        self.adaptiveRimAgeGridCB = QCheckBox(self)
+        self.adaptiveRimAgeGridCB.setChecked(bool(getattr(defaults, "adaptiveRimAgeGrid", False)))
+        self.adaptiveRimAgeGridCB.setToolTip("Refine the grid around candidate optima and peaks of the coarse surface")
+        self.adaptiveRimAgeGridCB.stateChanged.connect(self._onAdaptiveGridChanged)
+        self.adaptiveRimAgeStepInput = AgeInput(
+            validation=self._validate, defaultValue=getattr(defaults, "adaptiveRimAgeStep", 2 * 10**6)
+        )
+        self.adaptiveRimAgeStepLabel = QLabel("Refined spacing")
 
         form = QFormLayout()
         form.addRow(QLabel("Minimum"), self.minimumRimAgeInput)
         form.addRow("Maximum", self.maximumRimAgeInput)
         form.addRow("Number of samples", self.rimAgesSampledInput)
+        form.addRow("Nested grid", self.nestedRimAgeGridCB)
+        form.addRow("Adaptive grid", self.adaptiveRimAgeGridCB)
+        form.addRow(self.adaptiveRimAgeStepLabel, self.adaptiveRimAgeStepInput)
         self._registerFormLayoutForAlignment(form)
 
         box = QGroupBox("Time of radiogenic-Pb loss"); box.setLayout(form)
@@ -94,9 +110,19 @@ class LeadLossCalculationSettingsDialog(AbstractSettingsDialog):
     def _initMonteCarloSettings(self):
         defaults = self.defaultSettings
         self.monteCarloRunsInput = IntInput(defaults.monteCarloRuns, self._validate)
+        self.earlyStoppingCB = QCheckBox(self)
+        self.earlyStoppingCB.setChecked(bool(getattr(defaults, "earlyStopping", False)))
+        self.earlyStoppingCB.setToolTip("Stop sampling before the requested number of runs once the summary has converged")
+        self.earlyStoppingCB.stateChanged.connect(self._validate)
+        self.useResultCacheCB = QCheckBox(self)
+        self.useResultCacheCB.setChecked(bool(getattr(defaults, "useResultCache", True)))
+        self.useResultCacheCB.setToolTip("Restore samples processed before with the same data and settings instead of sampling them again")
+        self.useResultCacheCB.stateChanged.connect(self._validate)
 
         form = QFormLayout()
         form.addRow("Runs", self.monteCarloRunsInput)
+        form.addRow("Stop once converged", self.earlyStoppingCB)
+        form.addRow("Reuse cached results", self.useResultCacheCB)
         self._registerFormLayoutForAlignment(form)
 
         box = QGroupBox("Monte Carlo sampling"); box.setLayout(form)
@@ -128,6 +154,15 @@ class LeadLossCalculationSettingsDialog(AbstractSettingsDialog):
         self.discordanceEllipseSigmasLabel.setVisible(not perc)
         self.discordanceEllipseSigmasRB.setVisible(not perc)  # set True when not perc
 
+    def _syncAdaptiveGridControls(self):
+        adaptive = self.adaptiveRimAgeGridCB.isChecked()
+        self.adaptiveRimAgeStepLabel.setEnabled(adaptive)
+        self.adaptiveRimAgeStepInput.setEnabled(adaptive)
+
+    def _onAdaptiveGridChanged(self):
+        self._syncAdaptiveGridControls()
+        self._validate()
+
     def _syncPeakControls(self):
         pass
 
@@ -152,10 +187,16 @@ class LeadLossCalculationSettingsDialog(AbstractSettingsDialog):
         s.minimumRimAge  = self.minimumRimAgeInput.value()
         s.maximumRimAge  = self.maximumRimAgeInput.value()
         s.rimAgesSampled = self.rimAgesSampledInput.value()
+        s.nestedRimAgeGrid = self.nestedRimAgeGridCB.isChecked()
+        s.adaptiveRimAgeGrid = self.adaptiveRimAgeGridCB.isChecked()
+        if s.adaptiveRimAgeGrid:
+            s.adaptiveRimAgeStep = self.adaptiveRimAgeStepInput.value()
 
         s.dissimilarityTest   = self.dissimilarityTestRB.selection()
         s.penaliseInvalidAges = self.penaliseInvalidAgesCB.isChecked()
         s.monteCarloRuns      = self.monteCarloRunsInput.value()
+        s.earlyStopping       = self.earlyStoppingCB.isChecked()
+        s.useResultCache      = self.useResultCacheCB.isChecked()
 
         s.enable_ensemble_peak_picking = self.enableEnsembleCB.isChecked()
 
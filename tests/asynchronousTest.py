@@ -0,0 +1,216 @@
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+from pathlib import Path
+from queue import Empty
+
+from process.cdc.state import ProgressType
+from process.cdc import transport
+from process.cdc.transport import RunRows
+from utils.asynchronous import ProcessSignals, SignalType, WorkerPool
+
+
+def _drain(signals):
+    out = []
+    while True:
+        try:
+            out.append(signals.queue.get(timeout=0.5))
+        except Empty:
+            return out
+
+
+class ProcessSignalsCoalescingTest(unittest.TestCase):
+    def test_fractions_keep_latest_value_until_task_boundary(self):
+        signals = ProcessSignals(window=60.0)
+        for i in range(1, 6):
+            signals.progress(ProgressType.CONCORDANCE, i / 10)
+        signals.newTask("Sampling...")
+
+        self.assertEqual(
+            _drain(signals),
+            [(SignalType.PROGRESS, ProgressType.CONCORDANCE, 0.5), (SignalType.NEW_TASK, "Sampling...")],
+        )
+
+    def test_run_rows_are_merged_and_flushed_before_other_messages(self):
+        signals = ProcessSignals(window=60.0)
+        for j in range(4):
+            signals.progress(ProgressType.SAMPLING, (j + 1) / 4, "4A", RunRows(j, j + 1))
+        signals.progress(ProgressType.OPTIMAL, 1.0, "4A", (1.0,))
+        signals.completed()
+
+        self.assertEqual(
+            _drain(signals),
+            [
+                (SignalType.PROGRESS, ProgressType.SAMPLING, 1.0, "4A", [RunRows(0, 4)]),
+                (SignalType.PROGRESS, ProgressType.OPTIMAL, 1.0, "4A", (1.0,)),
+                (SignalType.COMPLETED,),
+            ],
+        )
+
+    def test_zero_window_sends_every_message(self):
+        signals = ProcessSignals(window=0)
+        self.assertFalse(signals.halt())
+        signals.progress(ProgressType.SAMPLING, 0.5, "4A", RunRows(0, 1))
+        signals.progress(ProgressType.SAMPLING, 1.0, "4A", RunRows(1, 2))
+
+        self.assertEqual(
+            _drain(signals),
+            [
+                (SignalType.PROGRESS, ProgressType.SAMPLING, 0.5, "4A", RunRows(0, 1)),
+                (SignalType.PROGRESS, ProgressType.SAMPLING, 1.0, "4A", RunRows(1, 2)),
+            ],
+        )
+
+
+class _Recorder:
+    def __init__(self, name, calls):
+        self._name, self._calls = name, calls
+
+    def emit(self, *args):
+        self._calls.append((self._name, args))
+
+
+class _RecordingSignals:
+    def __init__(self):
+        self.calls = []
+        for name in ("processingNewTask", "processingProgress", "processingCompleted",
+                     "processingCancelled", "processingErrored", "processingSkipped"):
+            setattr(self, name, _Recorder(name, self.calls))
+
+
+def _countingJob(signals, n):
+    for i in range(n):
+        signals.progress("count", i)
+    signals.completed(n)
+
+
+def _jobUntilHalted(signals):
+    while not signals.halt():
+        time.sleep(0.01)
+    signals.cancelled()
+
+
+def _jobUntilKilled(signals):
+    signals.progress("pid", os.getpid())
+    while not signals.halt():
+        time.sleep(0.01)
+
+
+def _waitFor(job, timeout=30.0):
+    end = time.monotonic() + timeout
+    while job.isRunning() and time.monotonic() < end:
+        time.sleep(0.01)
+
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(processes=1)
+        self.pool.start()
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_jobs_reuse_the_pool_and_deliver_in_order(self):
+        first, second = _RecordingSignals(), _RecordingSignals()
+        jobs = [self.pool.submit(first, _countingJob, 3), self.pool.submit(second, _countingJob, 1)]
+        for job in jobs:
+            _waitFor(job)
+
+        self.assertEqual(
+            first.calls,
+            [("processingProgress", (("count", 0),)), ("processingProgress", (("count", 1),)),
+             ("processingProgress", (("count", 2),)), ("processingCompleted", ((3,),))],
+        )
+        self.assertEqual(second.calls[-1], ("processingCompleted", ((1,),)))
+
+    def test_halted_job_reports_cancellation_and_discarded_job_is_dropped(self):
+        halted, discarded = _RecordingSignals(), _RecordingSignals()
+        job = self.pool.submit(halted, _jobUntilHalted)
+        time.sleep(0.2)
+        job.halt()
+        _waitFor(job)
+        self.assertEqual(halted.calls, [("processingCancelled", ())])
+
+        job = self.pool.submit(discarded, _jobUntilHalted)
+        job.discard()
+        _waitFor(job)
+        self.assertFalse(job.isRunning())
+        self.assertEqual(discarded.calls, [])
+
+    @unittest.skipUnless(hasattr(signal, "SIGKILL"), "needs SIGKILL")
+    def test_killed_worker_errors_its_job_and_is_replaced(self):
+        killed, after = _RecordingSignals(), _RecordingSignals()
+        job = self.pool.submit(killed, _jobUntilKilled)
+        end = time.monotonic() + 30.0
+        while not killed.calls and time.monotonic() < end:
+            time.sleep(0.01)
+        self.assertEqual(killed.calls[0][0], "processingProgress")
+        os.kill(killed.calls[0][1][0][1], signal.SIGKILL)
+
+        _waitFor(job)
+        self.assertFalse(job.isRunning())
+        self.assertEqual([name for name, _ in killed.calls[1:]], ["processingErrored"])
+        self.assertIsInstance(killed.calls[1][1][0], RuntimeError)
+
+        # The single pool process was replaced, so later jobs still run
+        job = self.pool.submit(after, _countingJob, 1)
+        _waitFor(job)
+        self.assertEqual(after.calls[-1], ("processingCompleted", ((1,),)))
+
+
+# Runs in a fresh interpreter: a pool job creates a run block and its worker
+# dies before the handle is sent, then the application shuts the pool down.
+_CRASHING_POOL_SCRIPT = textwrap.dedent("""
+    import os, sys
+    sys.path.insert(0, sys.argv[1])
+    from process.cdc import transport
+    from utils.asynchronous import WorkerPool
+
+    class Signals:
+        def __getattr__(self, name):
+            return self
+
+        def emit(self, *args):
+            pass
+
+    def crashAfterCreatingBlock(signals, path):
+        block = transport.SharedRunBlock.create("4A", [1.0e6, 2.0e6], 2, 1, 1, 4)
+        with open(path, "w") as fh:
+            fh.write(block.handle.name)
+        os._exit(1)
+
+    if __name__ == "__main__":
+        pool = WorkerPool(processes=1)
+        pool.start()
+        pool.submit(Signals(), crashAfterCreatingBlock, sys.argv[2])
+        while not os.path.exists(sys.argv[2]):
+            pass
+        pool.shutdown()
+""")
+
+
+class SharedRunBlockCleanupTest(unittest.TestCase):
+    @unittest.skipUnless(transport.available() and os.path.isdir("/dev/shm"), "needs POSIX shared memory")
+    def test_block_of_a_crashed_worker_is_unlinked_at_exit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            script, name_file = Path(tmp) / "crash.py", Path(tmp) / "block_name"
+            script.write_text(_CRASHING_POOL_SCRIPT)
+            src = str(Path(__file__).resolve().parents[1] / "src")
+            subprocess.run([sys.executable, str(script), src, str(name_file)], timeout=120,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            segment = Path("/dev/shm") / name_file.read_text().lstrip("/")
+
+        # The resource tracker unlinks it once the application's processes are gone
+        end = time.monotonic() + 10.0
+        while segment.exists() and time.monotonic() < end:
+            time.sleep(0.05)
+        self.assertFalse(segment.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
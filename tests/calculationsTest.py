@@ -1,6 +1,18 @@
 import unittest
 
-from process.calculations import concordant_age, u238pb206_from_age, pb207pb206_from_age
+import numpy as np
+
+from process import concordia
+from process.calculations import (
+    DISCORDANT_AGE_RTOL,
+    age_from_pb207pb206,
+    concordant_age,
+    concordant_ages,
+    discordant_age,
+    discordant_ages,
+    u238pb206_from_age,
+    pb207pb206_from_age,
+)
 from utils.stringUtils import round_to_sf
 
 
@@ -13,5 +25,60 @@ class EllipseTests(unittest.TestCase):
 
         self.assertAlmostEqual(t, round_to_sf(concordant_age(uPb, pbPb), 7))
 
+    def testDiscordantAgesMatchScalarSolver(self):
+        rng = np.random.default_rng(3)
+        upper = rng.uniform(1500e6, 4000e6, 40)
+        lower = rng.uniform(100e6, 1500e6, 40)
+        frac = rng.uniform(0.1, 0.9, 40)
+        uPb = np.array([u238pb206_from_age(a) for a in upper])
+        pbPb = np.array([pb207pb206_from_age(a) for a in upper])
+        uPb += (np.array([u238pb206_from_age(a) for a in lower]) - uPb) * frac + rng.normal(0, 0.05, 40)
+        pbPb += (np.array([pb207pb206_from_age(a) for a in lower]) - pbPb) * frac + rng.normal(0, 0.003, 40)
+        rimAges = np.linspace(1e6, 2000e6, 25)
+
+        batched = discordant_ages(rimAges, uPb, pbPb)
+
+        self.assertEqual(batched.shape, (rimAges.size, uPb.size))
+        for g, rimAge in enumerate(rimAges):
+            x1 = u238pb206_from_age(rimAge)
+            y1 = pb207pb206_from_age(rimAge)
+            for n in range(uPb.size):
+                expected = discordant_age(x1, y1, uPb[n], pbPb[n])
+                if expected is None:
+                    self.assertTrue(np.isnan(batched[g, n]))
+                else:
+                    self.assertLessEqual(abs(batched[g, n] - expected), 10 * DISCORDANT_AGE_RTOL * expected)
+
+    def testConcordantAgesMatchScalarSolver(self):
+        rng = np.random.default_rng(5)
+        ages = rng.uniform(50e6, 4500e6, (6, 8))
+        uPb = np.vectorize(u238pb206_from_age)(ages) * (1 + rng.normal(0, 0.02, ages.shape))
+        pbPb = np.vectorize(pb207pb206_from_age)(ages) * (1 + rng.normal(0, 0.02, ages.shape))
+        uPb[0, 0] = np.nan
+
+        batched = concordant_ages(uPb, pbPb)
+
+        self.assertEqual(batched.shape, ages.shape)
+        self.assertTrue(np.isnan(batched[0, 0]))
+        for index in np.ndindex(ages.shape):
+            if index == (0, 0):
+                continue
+            expected = concordant_age(uPb[index], pbPb[index])
+            self.assertLessEqual(abs(batched[index] - expected), 1e-7 * expected)
+
+    def testPb207Pb206AgeInverse(self):
+        ages = np.geomspace(10e6, 4500e6, 200)
+        ratios = np.array([pb207pb206_from_age(a) for a in ages])
+
+        batched = concordia.age_from_pb207pb206(ratios)
+
+        self.assertTrue(np.all(np.abs(batched - ages) <= 1e-9 * ages))
+        for age, ratio in zip(ages[::20], ratios[::20]):
+            self.assertAlmostEqual(age_from_pb207pb206(float(ratio)) / age, 1.0, places=9)
+        self.assertTrue(np.isnan(concordia.age_from_pb207pb206(-1.0)))
+        self.assertEqual(concordia.age_from_pb207pb206(1e3, clip=True), concordia.TABLE_MAX_AGE)
+        with self.assertRaises(ValueError):
+            age_from_pb207pb206(0.01)
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,137 @@
+import unittest
+
+import numpy as np
+import scipy as sp
+
+from model.monteCarloRun import heatmapColumns
+from process.cdcHeatmap import HeatmapAccumulator
+
+
+def _reference_density(rows, resolution):
+    """The per-column median/std/normal-CDF heatmap, computed from all values."""
+    data = np.zeros((resolution, resolution))
+    prev = None
+    for col in range(resolution):
+        vals = np.asarray([r[col] for r in rows if col < len(r) and r[col] is not None], float)
+        vals = vals[np.isfinite(vals)]
+        if vals.size == 0:
+            mean, std = (0.5, 0.0) if prev is None else prev
+        else:
+            mean, std = float(np.median(vals)), float(np.std(vals))
+        mean = float(np.clip(mean, 0.0, 1.0))
+        if std < 1e-7:
+            std = 0
+        prev = (mean, std)
+        if std == 0:
+            meanRow = (resolution - 1) if mean >= 1.0 else int(mean * resolution)
+            cdfs = np.asarray([1 if i >= meanRow else 0 for i in range(resolution + 1)], float)
+        else:
+            cdfs = sp.stats.norm(mean, std).cdf(np.linspace(0, 1, resolution + 1))
+        data[:, col] = np.diff(cdfs)
+    return data
+
+
+class HeatmapAccumulatorTest(unittest.TestCase):
+    def _rows(self, rng, n_runs, resolution):
+        rows = []
+        for _ in range(n_runs):
+            row = np.clip(rng.normal(np.linspace(0.2, 0.9, resolution), 0.05), 0.0, 1.0).tolist()
+            row[3] = float("nan")
+            row[10:14] = [0.75] * 4          # constant columns use the step CDF
+            row[20] = None
+            rows.append(row[: resolution - 2])  # trailing columns stay empty
+        return rows
+
+    def test_density_matches_full_recompute(self):
+        rng = np.random.default_rng(11)
+        resolution = 40
+        rows = self._rows(rng, 51, resolution)
+
+        heatmap = HeatmapAccumulator(resolution)
+        for row in rows:
+            heatmap.addColumns([row])
+
+        expected = _reference_density(rows, resolution)
+        self.assertTrue(np.allclose(heatmap.density(), expected, atol=0.005))
+        self.assertTrue(np.allclose(heatmap.density()[:, 10:14], expected[:, 10:14]))
+        self.assertTrue(np.allclose(heatmap.density().sum(axis=0), expected.sum(axis=0), atol=1e-3))
+
+    def test_merged_halves_equal_single_pass(self):
+        rng = np.random.default_rng(5)
+        resolution = 30
+        rows = self._rows(rng, 40, resolution)
+
+        whole = HeatmapAccumulator(resolution)
+        whole.addColumns(rows)
+        first, second = HeatmapAccumulator(resolution), HeatmapAccumulator(resolution)
+        first.addColumns(rows[:17])
+        second.addColumns(rows[17:])
+        first.merge(second)
+
+        self.assertTrue(np.array_equal(first.count, whole.count))
+        self.assertTrue(np.allclose(first.std(), whole.std()))
+        self.assertTrue(np.allclose(first.median(), whole.median(), equal_nan=True))
+        self.assertTrue(np.allclose(first.density(), whole.density()))
+
+    def test_empty_heatmap_uses_midpoint_step(self):
+        data = HeatmapAccumulator(10).density()
+        self.assertEqual(data.shape, (10, 10))
+        self.assertTrue(np.all(data[4] == 1.0))
+        self.assertEqual(data.sum(), 10.0)
+
+
+def _reference_columns(ages, values, minAge, maxAge, resolution):
+    """Column-by-column scan with nearest non-empty neighbours."""
+    values = np.where(np.isfinite(values), np.clip(values, 0.0, 1.0), np.nan)
+    value_by_age = dict(zip(ages.tolist(), values.tolist()))
+    ageInc = (maxAge - minAge) / resolution
+    colAges = [[] for _ in range(resolution)]
+    for age in ages.tolist():
+        col = (resolution - 1) if age == maxAge else int((age - minAge) // ageInc)
+        colAges[col].append(age)
+
+    colData = []
+    for col in range(resolution):
+        prev = nxt = col
+        while prev > 0 and not colAges[prev]:
+            prev -= 1
+        while nxt < resolution - 1 and not colAges[nxt]:
+            nxt += 1
+        if not colAges[prev] or not colAges[nxt]:
+            continue
+        if prev != nxt:
+            prevStat = value_by_age[max(colAges[prev])]
+            nextStat = value_by_age[min(colAges[nxt])]
+            value = ((nxt - col) * prevStat + (col - prev) * nextStat) / (nxt - prev)
+        else:
+            vals = np.asarray([value_by_age[a] for a in colAges[col]], float)
+            vals = vals[np.isfinite(vals)]
+            value = float(np.mean(vals)) if vals.size else float("nan")
+        colData.append(value)
+    return np.asarray(colData, float)
+
+
+class HeatmapColumnsTest(unittest.TestCase):
+    def test_matches_column_scan(self):
+        rng = np.random.default_rng(3)
+        minAge, maxAge = 1.0e6, 2000.0e6
+        cases = [
+            np.linspace(minAge, maxAge, 200),                     # includes maxAge
+            np.linspace(minAge, maxAge, 23),                      # wide gaps
+            np.sort(rng.uniform(300e6, 1500e6, 40)),              # leading/trailing empty columns
+            np.linspace(minAge, maxAge, 640),                     # several ages per column
+        ]
+        for ages in cases:
+            values = rng.uniform(-0.1, 1.1, (5, ages.size))
+            values[:, rng.integers(0, ages.size, 4)] = np.nan
+            values[1] = np.nan
+            out = heatmapColumns(ages, values, minAge, maxAge, 100)
+            for r in range(values.shape[0]):
+                expected = _reference_columns(ages, values[r], minAge, maxAge, 100)
+                single = heatmapColumns(ages, values[r], minAge, maxAge, 100)
+                self.assertTrue(np.allclose(single, expected, equal_nan=True, rtol=0, atol=1e-12))
+                self.assertTrue(np.allclose(out[r], expected, equal_nan=True, rtol=0, atol=1e-12))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,13 @@
+import copy
+import csv
+import os
+import pickle
+import tempfile
+import time
 import unittest
 from collections import defaultdict
 from pathlib import Path
+from unittest import mock
 
 import numpy as np
 
@@ -11,6 +18,10 @@ from model.settings.calculation import (
     LeadLossCalculationSettings,
 )
 from model.spot import Spot
+from process import cdcDiagnostics
+from process.cdc import cache, transport
+from process.cdc import pipeline as cdc_pipeline
+from process.cdc.state import NodeStore, RunGridChanged, RunStack
 from process.cdc_pipeline import ProgressType, processSamples
 from utils import config
 from utils import csvUtils
@@ -47,7 +58,11 @@ class _HarnessSignals:
             return
         if kind == ProgressType.SAMPLING:
             sample_name, run = args[2:]
-            self._samples[sample_name].addMonteCarloRun(run)
+            if isinstance(run, RunGridChanged):
+                self._samples[sample_name].monteCarloRuns = []
+                self._samples[sample_name].rim_age_grid = run.rim_age_grid
+            elif not isinstance(run, NodeStore):
+                self._samples[sample_name].addMonteCarloRun(run)
             return
         if kind == ProgressType.OPTIMAL:
             sample_name, payload = args[2:]
@@ -61,6 +76,37 @@ class _HarnessSignals:
                 sample.summedKS_goodness = np.asarray(payload[1], float)
 
 
+class _SamplingKeptBySampleSignals(_HarnessSignals):
+    # The pipeline adds runs to the sample it processes; don't add them twice.
+    def progress(self, *args):
+        if args[0] != ProgressType.SAMPLING:
+            super().progress(*args)
+
+
+class _ApplicationRelay:
+    # Delivers a job's signals to the application the way the worker pool does: pickled.
+    def __init__(self, app):
+        self._app = app
+
+    def newTask(self, *args):
+        self._app.onProcessingNewTask(*args)
+
+    def progress(self, *args):
+        self._app.onProcessingProgress(pickle.loads(pickle.dumps(args)))
+
+    def halt(self):
+        return False
+
+    def cancelled(self, *args):
+        pass
+
+    def skipped(self, *args):
+        pass
+
+    def completed(self, *args):
+        pass
+
+
 def _repo_root() -> Path:
     return Path(__file__).resolve().parents[1]
 
@@ -210,6 +256,473 @@ class CDCPipelineRegressionTest(unittest.TestCase):
         expected_heatmap = np.asarray(first_run.heatmapColumnData, float)
         self.assertTrue(np.allclose(observed_heatmap, expected_heatmap, equal_nan=True))
 
+    def test_adaptive_grid_refines_around_candidates(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=8)[0]
+        sample.calculationSettings.adaptiveRimAgeGrid = True
+        sample.calculationSettings.adaptiveRimAgeStep = 2.0e6
+        coarse = np.asarray(sample.calculationSettings.rimAges(), float)
+
+        sample = _run_pipeline([sample])["4A"]
+
+        grid = np.asarray(sample.rim_age_grid, float)
+        self.assertGreater(grid.size, coarse.size)
+        self.assertTrue(np.all(np.isin(coarse, grid)))
+        self.assertFalse(np.allclose(np.diff(grid), np.diff(grid)[0]))
+        self.assertTrue(np.array_equal(sample.run_stack.ages_y, grid))
+        self.assertEqual(len(sample.summedKS_ages_Ma), grid.size)
+        self.assertTrue(np.isfinite(sample.optimalAge))
+        for run in sample.monteCarloRuns:
+            self.assertTrue(np.array_equal(run.rim_ages, grid))
+
+    def test_early_stopping_ends_sampling_once_converged(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=200)[0]
+        sample.calculationSettings.earlyStopping = True
+
+        sample = _run_pipeline([sample])["4A"]
+
+        self.assertIsNotNone(sample.early_stopped_at)
+        self.assertLess(sample.early_stopped_at, 200)
+        self.assertEqual(sample.calculationSettings.monteCarloRuns, 200)
+        self.assertEqual(len({id(run) for run in sample.monteCarloRuns}), sample.early_stopped_at)
+        self.assertTrue(np.isfinite(sample.optimalAge))
+        self.assertGreater(len(sample.peak_catalogue or []), 0)
+
+    def test_runlog_rows_match_header_of_existing_runlog(self):
+        with tempfile.TemporaryDirectory() as root:
+            runlog = Path(root) / "runlog.csv"
+            runlog.write_text("method,phase,sample\ncdc,e2e_runtime,4A\n")
+            with mock.patch.object(cdcDiagnostics, "RUNLOG", runlog), \
+                    mock.patch.object(cdcDiagnostics, "CDC_ENABLE_RUNLOG", True):
+                cdcDiagnostics.write_runlog(dict(method="cdc", sample="4A", R_requested=200, convergence="0.1;0.05"))
+                cdcDiagnostics.write_runlog(dict(method="cdc", sample="4B"))
+
+            with runlog.open(newline="") as fh:
+                rows = list(csv.DictReader(fh))
+            self.assertEqual(list(rows[0]), cdcDiagnostics.RUN_FIELDS)
+            self.assertEqual([row["sample"] for row in rows], ["4A", "4B"])
+            self.assertEqual(rows[0]["convergence"], "0.1;0.05")
+            self.assertEqual((Path(root) / "runlog.old.csv").read_text(), "method,phase,sample\ncdc,e2e_runtime,4A\n")
+
+    def test_result_cache_replays_processed_sample(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        with tempfile.TemporaryDirectory() as root:
+            result_cache = cache.ResultCache(Path(root), 64 * 2**20)
+            with mock.patch.object(cache, "default_cache", return_value=result_cache):
+                first = _run_pipeline(_build_samples(csv_path, sample_filter={"4A"}, mc_runs=12))["4A"]
+                self.assertEqual(len(list(Path(root).glob("*.pkl"))), 1)
+
+                sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=12)[0]
+                signals = _HarnessSignals([sample])
+                sampled = []
+                relay_progress = signals.progress
+
+                def progress(*args):
+                    if args[0] == ProgressType.SAMPLING:
+                        sampled.append(args[3])
+                    relay_progress(*args)
+
+                signals.progress = progress
+                spots = sample.spots
+                with mock.patch.object(cdc_pipeline, "_processSampleUncached") as uncached:
+                    processSamples(signals, [sample])
+                uncached.assert_not_called()
+                self.assertIs(sample.spots, spots)
+
+        self.assertEqual(len(sampled), 12)
+        self.assertEqual(sample.optimalAge, first.optimalAge)
+        self.assertEqual(
+            [row["age_ma"] for row in sample.peak_catalogue],
+            [row["age_ma"] for row in first.peak_catalogue],
+        )
+        self.assertTrue(np.array_equal(sample.summedKS_goodness, first.summedKS_goodness))
+
+    def test_result_cache_key_and_eviction(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=12)[0]
+        key = cache.sample_key(sample, 1)
+        self.assertEqual(cache.sample_key(sample, 1), key)
+        self.assertNotEqual(cache.sample_key(sample, 2), key)
+        sample.calculationSettings.merge_nearby_peaks = not sample.calculationSettings.merge_nearby_peaks
+        self.assertNotEqual(cache.sample_key(sample, 1), key)
+
+        # Turning the cache off changes neither the key nor which runs can be kept.
+        key = cache.sample_key(sample, 1)
+        previous = copy.deepcopy(sample.calculationSettings)
+        sample.calculationSettings.useResultCache = False
+        self.assertEqual(cache.sample_key(sample, 1), key)
+        self.assertTrue(sample.calculationSettings.reusesRunsOf(previous))
+        with mock.patch.object(cache, "CDC_RESULT_CACHE", True):
+            self.assertIsNone(cache.default_cache(sample.calculationSettings))
+
+        # A frozen build has no sources to hash; a rebuilt executable still changes the key.
+        with tempfile.TemporaryDirectory() as root:
+            executable = Path(root) / "LeadLoss"
+            executable.write_bytes(b"build 1")
+            with mock.patch.object(cache.sys, "frozen", True, create=True), \
+                    mock.patch.object(cache.sys, "executable", str(executable)):
+                cache.code_version.cache_clear()
+                first_build = cache.code_version()
+                executable.write_bytes(b"build 22")
+                cache.code_version.cache_clear()
+                self.assertNotEqual(cache.code_version(), first_build)
+            cache.code_version.cache_clear()
+
+        with tempfile.TemporaryDirectory() as root:
+            result_cache = cache.ResultCache(Path(root), 10**9)
+            for age, name in enumerate(("c", "b", "a")):
+                result_cache.store(name, sample, [], (True, None))
+                stamp = time.time() - 100 * (age + 1)
+                os.utime(Path(root) / f"{name}.pkl", (stamp, stamp))
+            size = (Path(root) / "a.pkl").stat().st_size
+            result_cache.load("a")  # now the most recently used
+
+            result_cache.max_bytes = 2 * size
+            result_cache.evict()
+            self.assertEqual(sorted(p.stem for p in Path(root).glob("*.pkl")), ["a", "c"])
+
+    def test_catalogue_only_change_rebuilds_from_retained_runs(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        sample = _run_pipeline(_build_samples(csv_path, sample_filter={"4A"}, mc_runs=12))["4A"]
+        runs = list(sample.monteCarloRuns)
+
+        settings = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=12)[0].calculationSettings
+        settings.merge_nearby_peaks = False
+        settings.catalogue_surface = "RAW"
+        self.assertEqual(settings.changedFields(sample.calculationSettings), {"merge_nearby_peaks", "catalogue_surface"})
+        self.assertTrue(settings.reusesRunsOf(sample.calculationSettings))
+
+        sample.clearCatalogue()
+        sample.startCalculation(settings)
+        with mock.patch.object(cdc_pipeline, "_performRimAgeSampling") as sampling, \
+                mock.patch.object(cdc_pipeline, "_write_runlog") as runlog:
+            processSamples(_HarnessSignals([sample]), [sample])
+        sampling.assert_not_called()
+        self.assertEqual(sample.monteCarloRuns, runs)
+        e2e = [call.args[0] for call in runlog.call_args_list if call.args[0]["phase"] == "e2e_runtime"]
+        self.assertEqual(len(e2e), 1)
+        self.assertEqual(e2e[0]["R"], 12)
+        self.assertEqual(e2e[0]["n_grid"], sample.run_stack.ages_y.size)
+
+        fresh = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=12)[0]
+        fresh.calculationSettings.merge_nearby_peaks = False
+        fresh.calculationSettings.catalogue_surface = "RAW"
+        fresh = _run_pipeline([fresh])["4A"]
+        self.assertEqual(sample.optimalAge, fresh.optimalAge)
+        self.assertEqual(
+            [row["age_ma"] for row in sample.peak_catalogue],
+            [row["age_ma"] for row in fresh.peak_catalogue],
+        )
+
+        settings = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=24)[0].calculationSettings
+        self.assertFalse(settings.reusesRunsOf(sample.calculationSettings))
+
+    def test_topping_up_runs_matches_sampling_all_runs(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=6)[0]
+        processSamples(_SamplingKeptBySampleSignals([sample]), [sample])
+        first_runs = list(sample.monteCarloRuns)
+
+        settings = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=12)[0].calculationSettings
+        self.assertTrue(settings.extendsRunsOf(sample.calculationSettings))
+        self.assertFalse(settings.reusesRunsOf(sample.calculationSettings))
+        sample.clearCatalogue()
+        sample.startCalculation(settings)
+        with mock.patch.object(cdc_pipeline, "_calculateConcordantAges") as classify:
+            processSamples(_SamplingKeptBySampleSignals([sample]), [sample])
+        classify.assert_not_called()
+
+        full = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=12)[0]
+        processSamples(_SamplingKeptBySampleSignals([full]), [full])
+
+        self.assertEqual(sample.monteCarloRuns[:6], first_runs)
+        self.assertEqual([run.run_number for run in sample.monteCarloRuns], list(range(12)))
+        for topped, drawn in zip(sample.monteCarloRuns, full.monteCarloRuns):
+            self.assertTrue(np.array_equal(topped.discordant_uPb, drawn.discordant_uPb))
+            self.assertTrue(np.array_equal(topped.scores, drawn.scores))
+        self.assertEqual(sample.optimalAge, full.optimalAge)
+        self.assertEqual(
+            [row["age_ma"] for row in sample.peak_catalogue],
+            [row["age_ma"] for row in full.peak_catalogue],
+        )
+
+    def test_regridding_runs_reuses_evaluated_nodes(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=6)[0]
+        processSamples(_SamplingKeptBySampleSignals([sample]), [sample])
+        coarse = sample.calculationSettings.rimAges()
+
+        settings = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=6)[0].calculationSettings
+        settings.rimAgesSampled = 399  # every other node is one of the 200 already evaluated
+        self.assertTrue(settings.regridsRunsOf(sample.calculationSettings))
+        self.assertFalse(settings.extendsRunsOf(sample.calculationSettings))
+        sample.clearCatalogue()
+        sample.startCalculation(settings)
+
+        evaluated = []
+        sampleAges = cdc_pipeline.MonteCarloRun.samplePbLossAges
+
+        def recordingSampleAges(run, ages, *args):
+            evaluated.append(np.asarray(ages, float))
+            return sampleAges(run, ages, *args)
+
+        with mock.patch.object(cdc_pipeline, "_performRimAgeSampling") as sampling, \
+                mock.patch.object(cdc_pipeline.MonteCarloRun, "samplePbLossAges", recordingSampleAges):
+            processSamples(_SamplingKeptBySampleSignals([sample]), [sample])
+        sampling.assert_not_called()
+        self.assertEqual(len(evaluated), 6)
+        for ages in evaluated:
+            self.assertEqual(ages.size, 199)
+            self.assertFalse(np.isin(ages, coarse).any())
+
+        full = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=6)[0]
+        full.calculationSettings.rimAgesSampled = 399
+        processSamples(_SamplingKeptBySampleSignals([full]), [full])
+
+        self.assertEqual(len(sample.monteCarloRuns), 6)
+        for regridded, drawn in zip(sample.monteCarloRuns, full.monteCarloRuns):
+            self.assertTrue(np.allclose(regridded.rim_ages, drawn.rim_ages, rtol=0, atol=1.0))
+            self.assertTrue(np.allclose(regridded.scores, drawn.scores, equal_nan=True))
+            self.assertEqual(regridded.optimal_pb_loss_age, drawn.optimal_pb_loss_age)
+        self.assertEqual(sample.run_stack.ages_y.size, 399)
+        self.assertEqual(sample.optimalAge, full.optimalAge)
+        self.assertEqual(
+            [row["age_ma"] for row in sample.peak_catalogue],
+            [row["age_ma"] for row in full.peak_catalogue],
+        )
+
+    def test_application_regrids_reuse_nodes_after_narrowing_and_widening(self):
+        from application import LeadLossApplication
+        from model.model import LeadLossModel
+
+        sample = _build_samples(_fixture("cases1to4_synth_TW.csv"), sample_filter={"4A"}, mc_runs=4)[0]
+        wide = sample.calculationSettings
+        narrow = copy.deepcopy(wide)
+        narrow.minimumRimAge, narrow.maximumRimAge = 500.0e6, 1500.0e6
+
+        app = LeadLossApplication.__new__(LeadLossApplication)
+        app.signals = mock.MagicMock()
+        app.processing_signals = mock.MagicMock()
+        app.view = mock.MagicMock()
+        app.model = LeadLossModel(mock.MagicMock())
+        app.model.samples, app.model.samplesByName = [sample], {sample.name: sample}
+        app.workerPool = mock.MagicMock()
+        app.workerPool.submit.side_effect = lambda signals, fn, samples: fn(_ApplicationRelay(app), samples)
+
+        evaluated = []
+        sampleAges = cdc_pipeline.MonteCarloRun.samplePbLossAges
+
+        def recordingSampleAges(run, ages, *args):
+            evaluated.append(np.asarray(ages, float).size)
+            return sampleAges(run, ages, *args)
+
+        def process(settings):
+            del evaluated[:]
+            app.view.getCalculationSettings.side_effect = lambda samples, default, callback: callback(
+                copy.deepcopy(settings)
+            )
+            app.processSample(sample)
+            self.assertEqual(len(sample.monteCarloRuns), 4)
+            self.assertTrue(np.array_equal(sample.monteCarloRuns[0].rim_ages, settings.rimAges()))
+            return list(evaluated)
+
+        with mock.patch("application.Settings"), \
+                mock.patch.object(cdc_pipeline.MonteCarloRun, "samplePbLossAges", recordingSampleAges):
+            process(wide)
+            self.assertTrue(process(narrow))
+            for settings in (wide, narrow, wide):
+                self.assertEqual(process(settings), [])
+        self.assertIsNotNone(sample.node_store)
+        self.assertTrue(np.isfinite(sample.optimalAge))
+
+    def test_application_holds_adaptively_refined_runs(self):
+        from application import LeadLossApplication
+        from model.model import LeadLossModel
+
+        sample = _build_samples(_fixture("cases1to4_synth_TW.csv"), sample_filter={"4A"}, mc_runs=4)[0]
+        adaptive = sample.calculationSettings
+        adaptive.adaptiveRimAgeGrid = True
+        adaptive.adaptiveRimAgeStep = 2.0e6
+
+        app = LeadLossApplication.__new__(LeadLossApplication)
+        app.signals = mock.MagicMock()
+        app.processing_signals = mock.MagicMock()
+        app.view = mock.MagicMock()
+        app.model = LeadLossModel(mock.MagicMock())
+        app.model.samples, app.model.samplesByName = [sample], {sample.name: sample}
+        app.workerPool = mock.MagicMock()
+        processed = []
+
+        def submit(signals, fn, samples):
+            processed.extend(samples)
+            fn(_ApplicationRelay(app), samples)
+
+        app.workerPool.submit.side_effect = submit
+
+        def process(settings):
+            del processed[:]
+            app.view.getCalculationSettings.side_effect = lambda samples, default, callback: callback(
+                copy.deepcopy(settings)
+            )
+            app.processSample(sample)
+            grid = np.asarray(processed[0].rim_age_grid, float)
+            self.assertTrue(np.array_equal(sample.rim_age_grid, grid))
+            self.assertEqual(len(sample.monteCarloRuns), 4)
+            for run in sample.monteCarloRuns:
+                self.assertTrue(np.array_equal(run.rim_ages, grid))
+            self.assertTrue(np.isfinite(sample.optimalAge))
+            return grid
+
+        with mock.patch("application.Settings"):
+            grid = process(adaptive)
+            self.assertGreater(grid.size, adaptive.rimAgeCount())
+
+            # A catalogue-only change rebuilds from the refined runs the application holds
+            catalogue = copy.deepcopy(adaptive)
+            catalogue.merge_nearby_peaks = not adaptive.merge_nearby_peaks
+            self.assertTrue(catalogue.reusesRunsOf(adaptive))
+            with mock.patch.object(cdc_pipeline, "_performRimAgeSampling") as sampling:
+                self.assertTrue(np.array_equal(process(catalogue), grid))
+            sampling.assert_not_called()
+
+            # Switching refinement off re-grids from nodes already evaluated
+            coarse = copy.deepcopy(catalogue)
+            coarse.adaptiveRimAgeGrid = False
+            self.assertTrue(coarse.regridsRunsOf(catalogue))
+            with mock.patch.object(cdc_pipeline.MonteCarloRun, "samplePbLossAges") as evaluate:
+                app.view.getCalculationSettings.side_effect = lambda samples, default, callback: callback(
+                    copy.deepcopy(coarse)
+                )
+                app.processSample(sample)
+            evaluate.assert_not_called()
+            self.assertIsNone(sample.rim_age_grid)
+            self.assertEqual(len(sample.monteCarloRuns), 4)
+            for run in sample.monteCarloRuns:
+                self.assertTrue(np.array_equal(run.rim_ages, coarse.rimAges()))
+
+    def test_nested_grid_and_node_store(self):
+        settings = LeadLossCalculationSettings()
+        settings.nestedRimAgeGrid = True
+        for requested, nodes in ((2, 2), (3, 3), (100, 129), (129, 129), (200, 257)):
+            settings.rimAgesSampled = requested
+            self.assertEqual(settings.rimAgeCount(), nodes)
+        coarse = settings.rimAges()
+        settings.rimAgesSampled = 300
+        self.assertTrue(np.isin(coarse, settings.rimAges()).all())
+
+        ages = np.array([1.0e6, 2.0e6, 3.0e6])
+        stack = RunStack.over(
+            ages,
+            np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]),
+            np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]]),
+            np.full((2, 3), 0.5),
+            np.zeros((2, 3), np.int32),
+            np.full(2, np.nan),
+        )
+        stack.n_runs = 2
+        store = NodeStore(2, tol_y=1.0)
+        store.add(stack)
+        self.assertTrue(np.array_equal(store.missing([1.5e6, 2.0e6 + 0.5, 4.0e6]), [1.5e6, 4.0e6]))
+        view = store.stack([3.0e6, 1.0e6 - 0.5])
+        self.assertTrue(np.array_equal(view.D_raw, [[0.3, 0.1], [0.6, 0.4]]))
+        self.assertEqual(len(view), 2)
+        with self.assertRaises(KeyError):
+            store.stack([1.5e6])
+        with self.assertRaises(ValueError):
+            store.add(RunStack(ages, 3))
+
+    def test_parallel_sampling_matches_serial(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+
+        results = {}
+        for workers in (1, 3):
+            sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=12)[0]
+            with mock.patch.object(cdc_pipeline, "CDC_MC_WORKERS", workers):
+                results[workers] = _run_pipeline([sample])["4A"]
+
+        serial, parallel = results[1], results[3]
+        self.assertEqual(
+            [r.run_number for r in parallel.monteCarloRuns],
+            [r.run_number for r in serial.monteCarloRuns],
+        )
+        for a, b in zip(serial.monteCarloRuns, parallel.monteCarloRuns):
+            self.assertTrue(np.array_equal(a.d_values, b.d_values))
+            self.assertTrue(np.array_equal(a.scores, b.scores))
+            self.assertEqual(a.optimal_pb_loss_age, b.optimal_pb_loss_age)
+        self.assertEqual(serial.optimalAge, parallel.optimalAge)
+        self.assertEqual(
+            [row["age_ma"] for row in serial.peak_catalogue],
+            [row["age_ma"] for row in parallel.peak_catalogue],
+        )
+
+    def test_shared_memory_runs_match_published_runs(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        sample = _build_samples(csv_path, sample_filter={"4A"}, mc_runs=6)[0]
+        signals = _HarnessSignals([sample])
+        signals.sharedRuns = True
+        received = []
+
+        def progress(*args):
+            if args[0] == ProgressType.SAMPLING:
+                payload = args[3]
+                if isinstance(payload, transport.SharedRunBlockHandle):
+                    received.append(transport.SharedRunBlock.attach(payload))
+                else:
+                    self.assertIsInstance(payload, transport.RunRows)
+                    received.extend(received[0].runs(payload, sample.calculationSettings))
+                return
+            _HarnessSignals.progress(signals, *args)
+
+        signals.progress = progress
+        processSamples(signals, [sample])
+
+        block, runs = received[0], received[1:]
+        self.assertEqual(len(runs), 6)
+        for original, run in zip(sample.monteCarloRuns, runs):
+            self.assertEqual(run.run_number, original.run_number)
+            self.assertTrue(np.shares_memory(run.d_values, block.D_raw))
+            self.assertTrue(np.array_equal(run.d_values, original.d_values))
+            self.assertTrue(np.array_equal(run.scores, original.scores))
+            self.assertTrue(np.array_equal(run.invalid_counts, original.invalid_counts))
+            self.assertTrue(np.array_equal(run.concordant_ages, original.concordant_ages))
+            self.assertTrue(np.array_equal(run.discordant_uPb, original.discordant_uPb))
+            self.assertEqual(run.optimal_pb_loss_age, original.optimal_pb_loss_age)
+            self.assertEqual(run.optimal_statistic.score, original.optimal_statistic.score)
+
+    def test_concurrent_samples_publish_in_input_order(self):
+        csv_path = _fixture("cases1to4_synth_TW.csv")
+        names = {"1C", "2A", "4A"}
+
+        serial = _run_pipeline(_build_samples(csv_path, sample_filter=names, mc_runs=12))
+
+        samples = _build_samples(csv_path, sample_filter=names, mc_runs=12)
+        signals = _HarnessSignals(samples)
+        published = []
+        relay_progress = signals.progress
+
+        def progress(*args):
+            if args[0] == ProgressType.OPTIMAL:
+                published.append(args[2])
+            relay_progress(*args)
+
+        signals.progress = progress
+        spots = {sample.name: (sample.spots, sample.validSpots, sample.calculationSettings) for sample in samples}
+        processSamples(signals, samples, workers=3)
+
+        self.assertEqual(published, [s.name for s in samples])
+        for sample in samples:
+            callerSpots, callerValidSpots, callerSettings = spots[sample.name]
+            self.assertIs(sample.spots, callerSpots)
+            self.assertIs(sample.validSpots, callerValidSpots)
+            self.assertIs(sample.calculationSettings, callerSettings)
+            self.assertEqual(sample.optimalAge, serial[sample.name].optimalAge)
+            self.assertEqual(
+                [row["age_ma"] for row in sample.peak_catalogue],
+                [row["age_ma"] for row in serial[sample.name].peak_catalogue],
+            )
+            self.assertTrue(np.array_equal(sample.summedKS_goodness, serial[sample.name].summedKS_goodness))
+
 
 if __name__ == "__main__":
     unittest.main()
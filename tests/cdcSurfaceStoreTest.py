@@ -0,0 +1,60 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from process.cdcSurfaceStore import SurfaceStore, is_store, reset_store, write_index, write_sample
+
+
+class SurfaceStoreTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name) / "surfaces"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, name, n_runs=5, n_grid=11):
+        arrays = dict(
+            age_Ma=np.linspace(0.0, 100.0, n_grid),
+            S_runs_pen=np.arange(n_runs * n_grid, dtype=float).reshape(n_runs, n_grid),
+            peaks_age_Ma=np.array([], float),
+        )
+        write_sample(self.root, name, arrays)
+        return arrays
+
+    def test_samples_round_trip_memory_mapped(self):
+        a = self._write("Sample A", n_runs=5)
+        b = self._write("Sample/B", n_runs=3)
+        write_index(self.root)
+
+        self.assertTrue(is_store(self.root))
+        store = SurfaceStore(self.root)
+        self.assertEqual(store.samples(), ["Sample A", "Sample/B"])
+        self.assertEqual(store.shape("Sample/B", "S_runs_pen"), (3, 11))
+
+        S = store.load("Sample A", "S_runs_pen")
+        self.assertIsInstance(S, np.memmap)
+        self.assertFalse(S.flags.writeable)
+        np.testing.assert_array_equal(S[2:4], a["S_runs_pen"][2:4])
+        np.testing.assert_array_equal(store.load("Sample/B", "S_runs_pen"), b["S_runs_pen"])
+        self.assertEqual(store.load("Sample A", "peaks_age_Ma").size, 0)
+        with self.assertRaises(KeyError):
+            store.load("Sample A", "D_raw")
+
+    def test_unindexed_batch_is_found_and_reset(self):
+        self._write("S1")
+        # An interrupted sample: arrays but no sample.json.
+        (self.root / "S2").mkdir()
+        np.save(self.root / "S2" / "age_Ma.npy", np.zeros(3))
+
+        self.assertEqual(SurfaceStore(self.root).samples(), ["S1"])
+
+        reset_store(self.root)
+        self.assertFalse(is_store(self.root))
+        self.assertEqual(len(SurfaceStore(self.root)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
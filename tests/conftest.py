@@ -1,7 +1,11 @@
 from pathlib import Path
+import os
 import sys
 
 
 SRC = Path(__file__).resolve().parents[1] / "src"
 if str(SRC) not in sys.path:
     sys.path.insert(0, str(SRC))
+
+# Keep test runs independent of (and out of) the user's result cache.
+os.environ.setdefault("CDC_RESULT_CACHE", "0")
@@ -0,0 +1,29 @@
+import unittest
+
+import numpy as np
+from scipy.stats import ks_2samp
+
+from process.dissimilarityTests import DissimilarityTest
+
+
+class BatchedKolmogorovSmirnovTest(unittest.TestCase):
+    def test_batch_matches_per_row_ks_2samp(self):
+        rng = np.random.default_rng(0)
+        concordant = np.sort(np.round(rng.normal(1000.0, 300.0, 37)))
+        discordant = np.round(rng.normal(1100.0, 400.0, (30, 45)))
+        discordant[rng.random(discordant.shape) < 0.3] = np.nan
+        discordant[0, :] = np.nan
+
+        dvals, pvals, counts = DissimilarityTest.KOLMOGOROV_SMIRNOV.performBatch(concordant, discordant)
+
+        self.assertEqual((dvals[0], pvals[0], counts[0]), (1.0, 0.0, 0))
+        for row in range(1, discordant.shape[0]):
+            valid = discordant[row][np.isfinite(discordant[row])]
+            expected = ks_2samp(concordant, valid)
+            self.assertEqual(counts[row], valid.size)
+            self.assertEqual(dvals[row], expected.statistic)
+            self.assertEqual(pvals[row], expected.pvalue)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -94,5 +94,19 @@ class EllipseTests(unittest.TestCase):
             pbPbError=0.05,
             ellipseSigmas=2))
 
+    def testBatchedMatchesScalar(self):
+        examples = [
+            (0.8, 0.1, 1, 0.05), (1.1, 0.1, 1, 0.05), (0.5, 0.1, 1, 0.05),
+            (0.8, 0.1, 1, 0), (1.1, 0.1, 1, 0), (0.5, 0.1, 1, 0),
+            (1, 0.1, 0.5, 0.05), (1, 0.1, 1.5, 0.05), (1, 0.1, 0.3, 0.05),
+            (1, 0, 0.5, 0.05), (1, 0, 1.5, 0.05), (1, 0, 0.3, 0.05),
+        ]
+        uPb, uPbError, pbPb, pbPbError = (list(column) for column in zip(*examples))
+
+        batched = calculations.areConcordantErrorEllipses(uPb, uPbError, pbPb, pbPbError, 2)
+
+        expected = [calculations.isConcordantErrorEllipse(*example, 2) for example in examples]
+        self.assertEqual(list(batched), expected)
+
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -5,7 +5,8 @@ import numpy as np
 from process.cdc.filtering import _recompute_winner_support
 from process.cdc.guards import _single_crest_fallback_row, _snap_rows_to_curve
 from process.cdc.surfaces import _is_effectively_monotonic
-from process.ensemble import build_ensemble_catalogue
+from process.ensemble import build_ensemble_catalogue, per_run_peaks, per_run_peaks_batch, robust_ensemble_curve
+from process.ensemble_internal.primitives import _nearest_index, _parabolic_refine, _parabolic_refine_rows
 
 
 class EnsembleCatalogueTests(unittest.TestCase):
@@ -191,5 +192,64 @@ class EnsembleCatalogueTests(unittest.TestCase):
             for r in diagnostics
         ))
 
+    def test_row_refinement_matches_scalar_refinement(self):
+        rng = np.random.default_rng(7)
+        x = np.sort(rng.uniform(1.0, 2000.0, 60))
+        Y = rng.normal(size=(200, x.size))
+        Y[5] = 1.0  # flat run: vertex falls back to the node
+        Y[6, 10:13] = np.nan
+        k = rng.integers(0, x.size, 200)
+        k[6] = 11
+
+        rows = _parabolic_refine_rows(x, Y, k)
+        scalar = np.array([_parabolic_refine(x, Y[i], int(k[i])) for i in range(Y.shape[0])])
+        self.assertTrue(np.array_equal(rows, scalar, equal_nan=True))
+
+        values = np.concatenate([x, rng.uniform(-10.0, 2010.0, 100), 0.5 * (x[:-1] + x[1:])])
+        expected = [int(np.argmin(np.abs(x - v))) for v in values]
+        self.assertEqual(_nearest_index(x, values).tolist(), expected)
+
+    def test_batched_run_peaks_match_per_run_peaks(self):
+        rng = np.random.default_rng(11)
+        ages = np.linspace(1.0, 2000.0, 150)
+        base = 0.6 * np.exp(-0.5 * ((ages - 600.0) / 90.0) ** 2) + 0.4 * np.exp(-0.5 * ((ages - 1400.0) / 60.0) ** 2)
+        runs = base + rng.normal(0.0, 0.04, (40, ages.size))
+        runs[:10] = np.round(runs[:10], 2)  # flat tops
+        runs[3, 70:74] = np.nan
+        gates = dict(prom_frac=0.06, min_dist=3, min_width_nodes=3, require_full_prom=False)
+
+        batch = per_run_peaks_batch(ages, runs, **gates)
+        self.assertEqual(batch.n_runs, runs.shape[0])
+        for r in range(runs.shape[0]):
+            refined, details = per_run_peaks(ages, runs[r], return_details=True, **gates)
+            self.assertTrue(np.array_equal(batch.ages(r), refined, equal_nan=True))
+            ordered = sorted(details, key=lambda d: d["idx"])
+            got = sorted(range(batch.offsets[r], batch.offsets[r + 1]), key=lambda i: batch.idx[i])
+            self.assertEqual([d["prom"] for d in ordered], batch.prom[got].tolist())
+            self.assertEqual([d["width_nodes"] for d in ordered], batch.width[got].tolist())
+
+
+    def test_refined_grid_leaves_coarse_region_median_curve_unchanged(self):
+        coarse = np.linspace(500.0, 4500.0, 100)
+        refined = np.union1d(coarse, np.arange(1900.0, 2100.0, 2.0))
+        shifts = np.random.default_rng(4).normal(0.0, 15.0, 9)
+
+        def runs(ages):
+            return np.vstack([
+                0.5 + 0.3 * np.exp(-0.5 * ((ages - 2000.0 - s) / 60.0) ** 2)
+                + 0.2 * np.exp(-0.5 * ((ages - 1000.0 + s) / 60.0) ** 2)
+                for s in shifts
+            ])
+
+        S_coarse, _, sigma_coarse = robust_ensemble_curve(runs(coarse), smooth_frac=0.01, age_grid=coarse)
+        S_refined, _, sigma_refined = robust_ensemble_curve(runs(refined), smooth_frac=0.01, age_grid=refined)
+
+        self.assertAlmostEqual(sigma_refined, sigma_coarse)
+        # Beyond the kernel's reach of the refined window the curve is the coarse one
+        far = (coarse < 1700.0) | (coarse > 2300.0)
+        at_coarse = np.searchsorted(refined, coarse)
+        np.testing.assert_allclose(S_refined[at_coarse][far], S_coarse[far], rtol=0, atol=1e-12)
+        np.testing.assert_allclose(S_refined[at_coarse], S_coarse, rtol=0, atol=0.01)
+
 if __name__ == "__main__":
     unittest.main()